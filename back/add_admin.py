@@ -19,6 +19,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.db.database import engine
 from app.db.models import Profile
+from app.invalidation import publish
 
 # Контекст для хэширования паролей (такой же как в auth.py)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -63,6 +64,7 @@ async def add_admin() -> None:
                     # Делаем существующего пользователя админом
                     existing_user.is_admin = True
                     await session.commit()
+                    await publish("profile", existing_user.id)
                     print(f"✅ Пользователь {email} теперь администратор!")
                 return
 
@@ -77,6 +79,7 @@ async def add_admin() -> None:
 
             session.add(admin_user)
             await session.commit()
+            await publish("profile", admin_user.id)
 
             print(f"✅ Администратор {email} успешно создан!")
             if full_name:
@@ -129,6 +132,7 @@ async def add_user() -> None:
 
             session.add(new_user)
             await session.commit()
+            await publish("profile", new_user.id)
 
             print(f"✅ Пользователь {email} успешно создан!")
             if full_name:
@@ -164,6 +168,8 @@ async def create_users_batch() -> None:
             session.add(admin_user)
             session.add(regular_user)
             await session.commit()
+            await publish("profile", admin_user.id)
+            await publish("profile", regular_user.id)
 
             print(f"✅ Администратор reflaxess@gmail.com создан! ID: {admin_user.id}")
             print(f"✅ Пользователь asd@asd.ru создан! ID: {regular_user.id}")
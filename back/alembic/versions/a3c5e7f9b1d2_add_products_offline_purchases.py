@@ -0,0 +1,30 @@
+"""add_products_offline_purchases
+
+Revision ID: a3c5e7f9b1d2
+Revises: e414e6ff0bfd
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c5e7f9b1d2"
+down_revision: Union[str, None] = "e414e6ff0bfd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Колонка есть в модели Product, но не была добавлена миграцией; в базах, созданных
+    # через Base.metadata.create_all (app/db/seeds.py), она уже существует
+    op.execute("ALTER TABLE public.products ADD COLUMN IF NOT EXISTS offline_purchases INTEGER DEFAULT 0")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE public.products DROP COLUMN IF EXISTS offline_purchases")
@@ -0,0 +1,88 @@
+"""add_cache_invalidation_triggers
+
+Revision ID: a7c9e1b3d5f8
+Revises: f1b3d5e7a9c2
+Create Date: 2026-10-21 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c9e1b3d5f8"
+down_revision: Union[str, None] = "f1b3d5e7a9c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DDL заморожен на этой ревизии; seeds.py берёт актуальную версию из app/db/invalidation_triggers.py
+TABLES = {
+    "products": ("product", "{times_ordered,updated_at}"),
+    "categories": ("category", "{}"),
+    "profiles": ("profile", "{}"),
+}
+TRIGGER_KINDS = ("insert", "delete", "update", "truncate")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.notify_cache_invalidation() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            entity text := TG_ARGV[0];
+            ignored text[] := coalesce(TG_ARGV[1], '{}')::text[];
+            action text := CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END;
+            ids uuid[];
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('cache_invalidation', json_build_object('entity', entity, 'id', NULL)::text);
+                RETURN NULL;
+            ELSIF TG_OP = 'UPDATE' THEN
+                SELECT array_agg(n.id) INTO ids
+                FROM changed n JOIN old_rows o ON o.id = n.id
+                WHERE to_jsonb(n) - ignored IS DISTINCT FROM to_jsonb(o) - ignored;
+            ELSE
+                SELECT array_agg(id) INTO ids FROM changed;
+            END IF;
+            IF cardinality(ids) > 100 THEN
+                PERFORM pg_notify('cache_invalidation', json_build_object('entity', entity, 'id', NULL)::text);
+            ELSIF ids IS NOT NULL THEN
+                PERFORM pg_notify(
+                    'cache_invalidation', json_build_object('entity', entity, 'id', id, 'action', action)::text
+                )
+                FROM unnest(ids) AS id;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """)
+    for table, (entity, ignored) in TABLES.items():
+        function = f"EXECUTE FUNCTION public.notify_cache_invalidation('{entity}', '{ignored}')"
+        for kind in TRIGGER_KINDS:
+            op.execute(f"DROP TRIGGER IF EXISTS cache_invalidation_{kind} ON public.{table}")
+        op.execute(
+            f"CREATE TRIGGER cache_invalidation_insert AFTER INSERT ON public.{table} "
+            f"REFERENCING NEW TABLE AS changed FOR EACH STATEMENT {function}"
+        )
+        op.execute(
+            f"CREATE TRIGGER cache_invalidation_delete AFTER DELETE ON public.{table} "
+            f"REFERENCING OLD TABLE AS changed FOR EACH STATEMENT {function}"
+        )
+        op.execute(
+            f"CREATE TRIGGER cache_invalidation_update AFTER UPDATE ON public.{table} "
+            f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed FOR EACH STATEMENT {function}"
+        )
+        op.execute(
+            f"CREATE TRIGGER cache_invalidation_truncate AFTER TRUNCATE ON public.{table} FOR EACH STATEMENT {function}"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        for kind in TRIGGER_KINDS:
+            op.execute(f"DROP TRIGGER IF EXISTS cache_invalidation_{kind} ON public.{table}")
+    op.execute("DROP FUNCTION IF EXISTS public.notify_cache_invalidation()")
@@ -0,0 +1,45 @@
+"""add_unread_partial_indexes
+
+Revision ID: b7d9f1a3c5e2
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d9f1a3c5e2"
+down_revision: Union[str, None] = "a3c5e7f9b1d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Частичные индексы по непрочитанным: ленивая инициализация и сверка счётчиков (app/unread.py)
+    op.create_index(
+        "ix_notifications_user_id_unread",
+        "notifications",
+        ["user_id"],
+        schema="public",
+        postgresql_where="NOT is_read",
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_chat_messages_chat_id_unread",
+        "chat_messages",
+        ["chat_id"],
+        schema="public",
+        postgresql_where="NOT is_read",
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_chat_messages_chat_id_unread", table_name="chat_messages", schema="public", if_exists=True)
+    op.drop_index("ix_notifications_user_id_unread", table_name="notifications", schema="public", if_exists=True)
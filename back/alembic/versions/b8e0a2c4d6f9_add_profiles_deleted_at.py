@@ -0,0 +1,40 @@
+"""add_profiles_deleted_at
+
+Revision ID: b8e0a2c4d6f9
+Revises: a7c9e1b3d5f8
+Create Date: 2026-10-22 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e0a2c4d6f9"
+down_revision: Union[str, None] = "a7c9e1b3d5f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Отметка удаления: пользователь скрыт сразу, данные вычищает фоновый UserPurger
+    op.add_column("profiles", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True), schema="public")
+    op.create_index(
+        "ix_profiles_deleted",
+        "profiles",
+        ["id"],
+        schema="public",
+        postgresql_where="deleted_at IS NOT NULL",
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_profiles_deleted", table_name="profiles", schema="public", if_exists=True)
+    op.drop_column("profiles", "deleted_at", schema="public")
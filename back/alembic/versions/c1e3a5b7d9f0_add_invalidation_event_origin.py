@@ -0,0 +1,98 @@
+"""add_invalidation_event_origin
+
+Revision ID: c1e3a5b7d9f0
+Revises: b8e0a2c4d6f9
+Create Date: 2026-10-22 12:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c1e3a5b7d9f0"
+down_revision: Union[str, None] = "b8e0a2c4d6f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DDL заморожен на этой ревизии; seeds.py берёт актуальную версию из app/db/invalidation_triggers.py.
+# Триггеры не меняются: они вызывают функцию по имени
+FUNCTION_WITH_ORIGIN = """
+    CREATE OR REPLACE FUNCTION public.notify_cache_invalidation() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        entity text := TG_ARGV[0];
+        ignored text[] := coalesce(TG_ARGV[1], '{}')::text[];
+        action text := CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END;
+        origin text := current_setting('application_name', true);
+        all_rows text := json_build_object('entity', entity, 'id', NULL, 'origin', origin)::text;
+        ids uuid[];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('cache_invalidation', all_rows);
+            RETURN NULL;
+        ELSIF TG_OP = 'UPDATE' THEN
+            SELECT array_agg(n.id) INTO ids
+            FROM changed n JOIN old_rows o ON o.id = n.id
+            WHERE to_jsonb(n) - ignored IS DISTINCT FROM to_jsonb(o) - ignored;
+        ELSE
+            SELECT array_agg(id) INTO ids FROM changed;
+        END IF;
+        IF cardinality(ids) > 100 THEN
+            PERFORM pg_notify('cache_invalidation', all_rows);
+        ELSIF ids IS NOT NULL THEN
+            PERFORM pg_notify(
+                'cache_invalidation',
+                json_build_object('entity', entity, 'id', id, 'action', action, 'origin', origin)::text
+            )
+            FROM unnest(ids) AS id;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+FUNCTION_WITHOUT_ORIGIN = """
+    CREATE OR REPLACE FUNCTION public.notify_cache_invalidation() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        entity text := TG_ARGV[0];
+        ignored text[] := coalesce(TG_ARGV[1], '{}')::text[];
+        action text := CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END;
+        ids uuid[];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('cache_invalidation', json_build_object('entity', entity, 'id', NULL)::text);
+            RETURN NULL;
+        ELSIF TG_OP = 'UPDATE' THEN
+            SELECT array_agg(n.id) INTO ids
+            FROM changed n JOIN old_rows o ON o.id = n.id
+            WHERE to_jsonb(n) - ignored IS DISTINCT FROM to_jsonb(o) - ignored;
+        ELSE
+            SELECT array_agg(id) INTO ids FROM changed;
+        END IF;
+        IF cardinality(ids) > 100 THEN
+            PERFORM pg_notify('cache_invalidation', json_build_object('entity', entity, 'id', NULL)::text);
+        ELSIF ids IS NOT NULL THEN
+            PERFORM pg_notify(
+                'cache_invalidation', json_build_object('entity', entity, 'id', id, 'action', action)::text
+            )
+            FROM unnest(ids) AS id;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # В событие добавляется application_name соединения: воркер пропускает события своих записей
+    op.execute(FUNCTION_WITH_ORIGIN)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(FUNCTION_WITHOUT_ORIGIN)
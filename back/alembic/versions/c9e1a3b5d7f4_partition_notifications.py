@@ -0,0 +1,123 @@
+"""partition_notifications
+
+Revision ID: c9e1a3b5d7f4
+Revises: b7d9f1a3c5e2
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c9e1a3b5d7f4"
+down_revision: Union[str, None] = "b7d9f1a3c5e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, user_id, title, message, type, is_read, created_at, notification_data"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Старая таблица переименовывается и лишается ограничений, чтобы их имена освободились
+    op.execute("ALTER TABLE public.notifications RENAME TO notifications_unpartitioned")
+    op.execute("ALTER TABLE public.notifications_unpartitioned DROP CONSTRAINT IF EXISTS notifications_pkey")
+    op.execute("ALTER TABLE public.notifications_unpartitioned DROP CONSTRAINT IF EXISTS notifications_user_id_fkey")
+    op.execute("DROP INDEX IF EXISTS public.ix_notifications_user_id_unread")
+
+    op.execute("""
+        CREATE TABLE public.notifications (
+            id UUID NOT NULL,
+            user_id UUID NOT NULL REFERENCES public.profiles (id),
+            title VARCHAR NOT NULL,
+            message VARCHAR NOT NULL,
+            type VARCHAR NOT NULL,
+            is_read BOOLEAN,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            notification_data JSONB,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """)
+    op.execute("CREATE TABLE public.notifications_default PARTITION OF public.notifications DEFAULT")
+    # Помесячные партиции (UTC) от самого старого уведомления до двух месяцев вперёд
+    op.execute("""
+        DO $$
+        DECLARE
+            month_start TIMESTAMPTZ;
+            last_month TIMESTAMPTZ := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+                + INTERVAL '2 months';
+        BEGIN
+            SELECT coalesce(
+                date_trunc('month', min(created_at) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+            )
+            INTO month_start
+            FROM public.notifications_unpartitioned;
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.notifications FOR VALUES FROM (%L) TO (%L)',
+                    'notifications_p' || to_char(month_start AT TIME ZONE 'UTC', 'YYYYMM'),
+                    month_start,
+                    month_start + INTERVAL '1 month'
+                );
+                month_start := month_start + INTERVAL '1 month';
+            END LOOP;
+        END
+        $$
+        """)
+    op.execute(
+        f"INSERT INTO public.notifications ({COLUMNS}) "
+        "SELECT id, user_id, title, message, type, is_read, coalesce(created_at, now()), notification_data "
+        "FROM public.notifications_unpartitioned"
+    )
+    op.execute("DROP TABLE public.notifications_unpartitioned")
+
+    op.execute("CREATE INDEX ix_notifications_user_id_created_at ON public.notifications (user_id, created_at DESC)")
+    op.execute("CREATE INDEX ix_notifications_user_id_unread ON public.notifications (user_id) WHERE NOT is_read")
+
+    op.execute("""
+        CREATE TABLE public.notifications_archive (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL,
+            title VARCHAR NOT NULL,
+            message VARCHAR NOT NULL,
+            type VARCHAR NOT NULL,
+            is_read BOOLEAN,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            notification_data JSONB,
+            archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        )
+        """)
+    op.execute("CREATE INDEX ix_public_notifications_archive_user_id ON public.notifications_archive (user_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE public.notifications RENAME TO notifications_partitioned")
+    op.execute("ALTER TABLE public.notifications_partitioned DROP CONSTRAINT IF EXISTS notifications_pkey")
+    op.execute("ALTER TABLE public.notifications_partitioned DROP CONSTRAINT IF EXISTS notifications_user_id_fkey")
+    op.execute("DROP INDEX IF EXISTS public.ix_notifications_user_id_unread")
+    op.execute("DROP INDEX IF EXISTS public.ix_notifications_user_id_created_at")
+    op.execute("""
+        CREATE TABLE public.notifications (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES public.profiles (id),
+            title VARCHAR NOT NULL,
+            message VARCHAR NOT NULL,
+            type VARCHAR NOT NULL,
+            is_read BOOLEAN,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            notification_data JSONB
+        )
+        """)
+    # Архивные уведомления возвращаются в общую таблицу
+    op.execute(
+        f"INSERT INTO public.notifications ({COLUMNS}) SELECT {COLUMNS} FROM public.notifications_partitioned "
+        f"UNION ALL SELECT {COLUMNS} FROM public.notifications_archive"
+    )
+    op.execute("DROP TABLE public.notifications_partitioned CASCADE")
+    op.execute("DROP TABLE public.notifications_archive")
+    op.execute("CREATE INDEX ix_notifications_user_id_unread ON public.notifications (user_id) WHERE NOT is_read")
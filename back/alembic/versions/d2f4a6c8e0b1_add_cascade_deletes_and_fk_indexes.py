@@ -0,0 +1,64 @@
+"""add_cascade_deletes_and_fk_indexes
+
+Revision ID: d2f4a6c8e0b1
+Revises: c9e1a3b5d7f4
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f4a6c8e0b1"
+down_revision: Union[str, None] = "c9e1a3b5d7f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы по внешним ключам: массовые DELETE ... WHERE user_id/order_id/chat_id и проверки FK при удалении
+FK_INDEXES = (
+    ("ix_favourites_user_id", "favourites", "user_id"),
+    ("ix_cart_items_user_id", "cart_items", "user_id"),
+    ("ix_orders_user_id", "orders", "user_id"),
+    ("ix_order_items_order_id", "order_items", "order_id"),
+    ("ix_chats_user_id", "chats", "user_id"),
+    ("ix_chat_messages_chat_id", "chat_messages", "chat_id"),
+    ("ix_chat_messages_sender_id", "chat_messages", "sender_id"),
+)
+
+# Дочерние строки, которые удаляет сама база вместе с родителем
+CASCADE_FKS = (
+    ("order_items_order_id_fkey", "order_items", "order_id", "orders"),
+    ("chat_messages_chat_id_fkey", "chat_messages", "chat_id", "chats"),
+)
+
+
+def _recreate_fks(ondelete: str) -> None:
+    for name, table, column, referred in CASCADE_FKS:
+        op.drop_constraint(name, table, schema="public", type_="foreignkey", if_exists=True)
+        op.create_foreign_key(
+            name,
+            table,
+            referred,
+            [column],
+            ["id"],
+            source_schema="public",
+            referent_schema="public",
+            ondelete=ondelete,
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, column in FK_INDEXES:
+        op.create_index(name, table, [column], schema="public", if_not_exists=True)
+    _recreate_fks("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate_fks(None)
+    for name, table, _ in reversed(FK_INDEXES):
+        op.drop_index(name, table_name=table, schema="public", if_exists=True)
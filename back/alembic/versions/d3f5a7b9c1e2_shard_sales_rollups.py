@@ -0,0 +1,65 @@
+"""shard_sales_rollups
+
+Revision ID: d3f5a7b9c1e2
+Revises: c1e3a5b7d9f0
+Create Date: 2026-10-22 15:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d3f5a7b9c1e2"
+down_revision: Union[str, None] = "c1e3a5b7d9f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Имеющиеся итоги остаются в shard 0: читатели суммируют по всем shard
+    for table in ("sales_daily", "sales_daily_products"):
+        op.add_column(table, sa.Column("shard", sa.SmallInteger(), server_default="0", nullable=False), schema="public")
+        op.alter_column(table, "shard", server_default=None, schema="public")
+        op.drop_constraint(f"{table}_pkey", table, type_="primary", schema="public")
+    op.create_primary_key("sales_daily_pkey", "sales_daily", ["day", "shard"], schema="public")
+    op.create_primary_key(
+        "sales_daily_products_pkey", "sales_daily_products", ["day", "product_id", "shard"], schema="public"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Строки shard сворачиваются в одну на ключ
+    op.execute(
+        """
+        WITH merged AS (
+            DELETE FROM public.sales_daily RETURNING day, orders, units, revenue
+        )
+        INSERT INTO public.sales_daily (day, shard, orders, units, revenue)
+        SELECT day, 0, sum(orders), sum(units), sum(revenue) FROM merged GROUP BY day
+        """
+    )
+    op.execute(
+        """
+        WITH merged AS (
+            DELETE FROM public.sales_daily_products
+            RETURNING day, product_id, category_id, product_name, orders, units, revenue
+        )
+        INSERT INTO public.sales_daily_products
+            (day, shard, product_id, category_id, product_name, orders, units, revenue)
+        SELECT day, 0, product_id, (array_agg(category_id) FILTER (WHERE category_id IS NOT NULL))[1],
+               max(product_name), sum(orders), sum(units), sum(revenue)
+        FROM merged GROUP BY day, product_id
+        """
+    )
+    for table in ("sales_daily", "sales_daily_products"):
+        op.drop_constraint(f"{table}_pkey", table, type_="primary", schema="public")
+        op.drop_column(table, "shard", schema="public")
+    op.create_primary_key("sales_daily_pkey", "sales_daily", ["day"], schema="public")
+    op.create_primary_key("sales_daily_products_pkey", "sales_daily_products", ["day", "product_id"], schema="public")
@@ -0,0 +1,60 @@
+"""add_sales_rollups
+
+Revision ID: e5a7c9f1b3d6
+Revises: d2f4a6c8e0b1
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a7c9f1b3d6"
+down_revision: Union[str, None] = "d2f4a6c8e0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Заполняются командой `python -m app.db.sales_rollups` после миграции
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Numeric(14, 2), nullable=False),
+        sa.PrimaryKeyConstraint("day"),
+        schema="public",
+    )
+    op.create_table(
+        "sales_daily_products",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("category_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("product_name", sa.String(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Numeric(14, 2), nullable=False),
+        sa.PrimaryKeyConstraint("day", "product_id"),
+        schema="public",
+    )
+    op.create_index(
+        "ix_sales_daily_products_category_id_day",
+        "sales_daily_products",
+        ["category_id", "day"],
+        schema="public",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_sales_daily_products_category_id_day", table_name="sales_daily_products", schema="public")
+    op.drop_table("sales_daily_products", schema="public")
+    op.drop_table("sales_daily", schema="public")
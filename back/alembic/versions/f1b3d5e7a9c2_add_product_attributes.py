@@ -0,0 +1,63 @@
+"""add_product_attributes
+
+Revision ID: f1b3d5e7a9c2
+Revises: e5a7c9f1b3d6
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1b3d5e7a9c2"
+down_revision: Union[str, None] = "e5a7c9f1b3d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # jsonb_path_ops: индекс меньше и быстрее для @>, других операторов JSONB каталогу не нужно
+    op.create_index(
+        "ix_products_characteristics",
+        "products",
+        ["characteristics"],
+        schema="public",
+        postgresql_using="gin",
+        postgresql_ops={"characteristics": "jsonb_path_ops"},
+        if_not_exists=True,
+    )
+    op.create_table(
+        "product_attributes",
+        sa.Column("category_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("product_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["category_id"], ["public.categories.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("category_id", "key", "value"),
+        schema="public",
+    )
+    # Начальное заполнение; дальше справочник обновляется приложением (app/db/product_attributes.py)
+    op.execute("""
+        INSERT INTO public.product_attributes (category_id, key, value, product_count)
+        SELECT p.category_id, kv.key, kv.value, count(*)
+        FROM public.products p
+        CROSS JOIN LATERAL jsonb_each_text(
+            CASE WHEN jsonb_typeof(p.characteristics) = 'object' THEN p.characteristics END
+        ) AS kv
+        WHERE jsonb_typeof(p.characteristics -> kv.key) = 'string'
+          AND length(kv.value) BETWEEN 1 AND 100
+        GROUP BY p.category_id, kv.key, kv.value
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("product_attributes", schema="public")
+    op.drop_index("ix_products_characteristics", table_name="products", schema="public", if_exists=True)
@@ -3,15 +3,16 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Request, WebSocket, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from redis import Redis
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import HTTPConnection
 
 from app.db import models
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, get_db
+from app.redis_client import redis_client
 from app.schemas import CustomUser
 
 
@@ -25,12 +26,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-REDIS_URL = os.getenv("REDIS_URL")
-if not REDIS_URL:
-    raise ValueError("REDIS_URL is not set in the .env file")
-
-redis_client = Redis.from_url(REDIS_URL)
 # endregion
 
 
@@ -81,7 +76,7 @@ def decode_token(token: str) -> dict:
         ) from None
 
 
-def get_token_from_request(request: Request) -> Optional[str]:
+def get_token_from_request(request: HTTPConnection) -> Optional[str]:
     # Пробуем получить токен из cookie или заголовка Authorization
     token = request.cookies.get("access_token")
     if not token:
@@ -91,8 +86,16 @@ def get_token_from_request(request: Request) -> Optional[str]:
     return token
 
 
+def is_token_revoked(token: str) -> bool:
+    # Отозванные токены хранятся в Redis до истечения срока (revoke_token)
+    return bool(redis_client.get(f"blacklist:{token}"))
+
+
 async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> CustomUser:
-    token = get_token_from_request(request)
+    return await _get_user_by_token(get_token_from_request(request), db)
+
+
+async def _get_user_by_token(token: Optional[str], db: AsyncSession) -> CustomUser:
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     payload = decode_token(token)
@@ -103,14 +106,19 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    # Check if token is blacklisted in Redis
-    if redis_client.get(f"blacklist:{token}"):
+    if is_token_revoked(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    result = await db.execute(select(models.Profile).where(models.Profile.id == uuid.UUID(user_id)))
+    profile_id = uuid.UUID(user_id)
+    # Выполняется на каждый авторизованный запрос — SQL берётся из кэша lambda_stmt
+    result = await db.execute(
+        lambda_stmt(
+            lambda: select(models.Profile).where(models.Profile.id == profile_id, models.Profile.deleted_at.is_(None))
+        )
+    )
     user = result.scalars().first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -118,6 +126,20 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     return CustomUser.model_validate(user)
 
 
+async def get_websocket_user(websocket: WebSocket) -> Optional[CustomUser]:
+    """Пользователь WebSocket-соединения по тем же правилам, что get_current_user; None — не авторизован.
+
+    Браузер не даёт задать заголовки WebSocket, поэтому кроме cookie принимается параметр ?token=.
+    Сессия БД берётся только на время проверки, а не на всё соединение.
+    """
+    token = get_token_from_request(websocket) or websocket.query_params.get("token")
+    async with AsyncSessionLocal() as db:
+        try:
+            return await _get_user_by_token(token, db)
+        except HTTPException:
+            return None
+
+
 def get_current_admin_user(current_user: CustomUser = Depends(get_current_user)) -> CustomUser:
     if not current_user.isAdmin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
@@ -0,0 +1,100 @@
+"""Кэш результатов в памяти процесса с TTL
+
+Кэши создаются на уровне модуля и относятся к группе (например, "catalog"):
+
+    facets_cache = TTLCache("catalog_facets", group="catalog", ttl=60)
+    facets = await facets_cache.get_or_load(key, lambda: compute_facets(...))
+
+Изменения данных сбрасывают всю группу через invalidate_group("catalog"). Кэш у каждого
+воркера свой: остальные воркеры сбрасывают группу по событиям шины инвалидации
+(app/invalidation.py), а TTL ограничивает устаревание, если событие потерялось.
+Одновременные промахи по одному ключу выполняют загрузку один раз.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Generic, Optional, TypeVar
+
+from app.metrics import CACHE_REQUESTS
+
+T = TypeVar("T")
+
+# Кэши по группам для invalidate_group
+_GROUPS: dict[str, list["TTLCache"]] = {}
+
+
+class TTLCache(Generic[T]):
+    """Ограниченный по размеру LRU-кэш с временем жизни записей"""
+
+    def __init__(self, name: str, group: str, ttl: float, max_entries: int = 1000) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, T]] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        # Поколение растёт при сбросе: загрузка, начатая до сброса, не попадёт в кэш
+        self._generation = 0
+        _GROUPS.setdefault(group, []).append(self)
+
+    def get(self, key: str) -> tuple[bool, Optional[T]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: T) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[T]]) -> T:
+        found, value = self.get(key)
+        if found:
+            CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return value
+        pending = self._loading.get(key)
+        if pending is not None:
+            CACHE_REQUESTS.labels(self.name, "wait").inc()
+            return await asyncio.shield(pending)
+
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение получат только ожидающие; без них future не должен ругаться в лог
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if generation == self._generation:
+                self.set(key, value)
+            return value
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._loading.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def invalidate_group(group: str) -> None:
+    """Сбросить все кэши группы в текущем процессе"""
+    for cache in _GROUPS.get(group, ()):
+        cache.clear()
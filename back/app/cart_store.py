@@ -0,0 +1,455 @@
+"""Горячее хранилище корзин в Redis с отложенной записью в cart_items
+
+Включается CART_STORE=redis (по умолчанию корзина работает напрямую с БД).
+
+- `cart:user:{user_id}` — hash product_id -> JSON позиции (id, количество, цена и снимок
+  данных товара). Загружается из cart_items при первом обращении; служебное поле `_ready`
+  отличает загруженную корзину от истёкшей.
+- `cart:guest:{guest_id}` — корзина гостя. guest_id хранится в cookie, подписанной HMAC
+  на SECRET_KEY; гостевые корзины живут только в Redis (CART_TTL) и при входе сливаются
+  с корзиной пользователя.
+- `cart:dirty` — пользователи, чьи корзины изменились после последней записи в БД.
+  CartPersister раз в CART_FLUSH_INTERVAL переписывает их cart_items порциями; при
+  остановке приложения записывается всё накопленное.
+
+Между записями durability корзин пользователей обеспечивает персистентность Redis (AOF).
+После работы без CART_STORE=redis ключи `cart:user:*` нужно удалить перед повторным
+включением: иначе они перекроют изменения, сделанные напрямую в БД.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import delete, insert, lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from app.auth import get_secret_key
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.metrics import CART_STORE_FLUSHES
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+CART_STORE_ENABLED = os.getenv("CART_STORE", "db").lower() == "redis"
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "2"))
+CART_FLUSH_BATCH_SIZE = int(os.getenv("CART_FLUSH_BATCH_SIZE", "200"))
+# Срок жизни неиспользуемой корзины в Redis (и cookie гостя)
+CART_TTL = int(os.getenv("CART_TTL", str(30 * 24 * 3600)))
+
+GUEST_CART_COOKIE = "guest_cart"
+USER_CART_KEY = "cart:user:{owner_id}"
+GUEST_CART_KEY = "cart:guest:{owner_id}"
+DIRTY_CARTS_KEY = "cart:dirty"
+FLUSH_LOCK_KEY = "cart:flush:lock"
+READY_FIELD = "_ready"
+# Сколько держится блокировка записи, если воркер упал посреди неё
+FLUSH_LOCK_TTL = 30
+# Сколько при остановке ждать блокировку, которую держит другой воркер (меньше 10 с docker stop)
+FLUSH_STOP_WAIT = 5.0
+FLUSH_LOCK_POLL_INTERVAL = 0.5
+
+# KEYS: корзина, множество изменённых. ARGV: product_id, JSON новой позиции, прибавка
+# количества, текущая цена, TTL, id пользователя для cart:dirty ("" у гостя).
+# Существующая позиция увеличивается атомарно, без чтения в Python.
+ADD_ITEM_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local item
+if current then
+    item = cjson.decode(current)
+    item.quantity = item.quantity + tonumber(ARGV[3])
+    item.price_snapshot = ARGV[4]
+else
+    item = cjson.decode(ARGV[2])
+end
+local encoded = cjson.encode(item)
+redis.call('HSET', KEYS[1], ARGV[1], encoded)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+if ARGV[6] ~= '' then
+    redis.call('SADD', KEYS[2], ARGV[6])
+end
+return encoded
+"""
+
+# KEYS: корзина, множество изменённых. ARGV: product_id, id позиции, количество, TTL, id для cart:dirty.
+# Позиция меняется, только если под этим product_id всё ещё лежит та же позиция.
+SET_QUANTITY_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current then
+    return nil
+end
+local item = cjson.decode(current)
+if item.id ~= ARGV[2] then
+    return nil
+end
+item.quantity = tonumber(ARGV[3])
+local encoded = cjson.encode(item)
+redis.call('HSET', KEYS[1], ARGV[1], encoded)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+if ARGV[5] ~= '' then
+    redis.call('SADD', KEYS[2], ARGV[5])
+end
+return encoded
+"""
+
+# KEYS[1] — блокировка, ARGV[1] — токен владельца. Блокировка, истёкшая по TTL и взятая
+# другим воркером, не удаляется.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_add_item = async_redis_client.register_script(ADD_ITEM_SCRIPT)
+_set_quantity = async_redis_client.register_script(SET_QUANTITY_SCRIPT)
+_release_lock = async_redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+
+@dataclass(frozen=True)
+class CartOwner:
+    """Владелец корзины: пользователь или гость (id из подписанной cookie)"""
+
+    owner_id: str
+    is_guest: bool = False
+
+    @property
+    def key(self) -> str:
+        return (GUEST_CART_KEY if self.is_guest else USER_CART_KEY).format(owner_id=self.owner_id)
+
+    @property
+    def dirty_member(self) -> str:
+        # Гостевые корзины в БД не записываются
+        return "" if self.is_guest else self.owner_id
+
+
+# region Cookie гостя
+def _guest_signature(guest_id: str) -> str:
+    return hmac.new(get_secret_key().encode(), guest_id.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_guest_id(guest_id: str) -> str:
+    return f"{guest_id}.{_guest_signature(guest_id)}"
+
+
+def verify_guest_token(token: Optional[str]) -> Optional[str]:
+    """guest_id из значения cookie или None, если подпись не сходится"""
+    if not token:
+        return None
+    guest_id, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _guest_signature(guest_id)):
+        return None
+    try:
+        return str(uuid.UUID(guest_id))
+    except ValueError:
+        return None
+
+
+# endregion
+
+
+# region Позиции
+def _cart_items_stmt(user_id: uuid.UUID) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: (
+            select(models.CartItem)
+            .options(joinedload(models.CartItem.product))
+            .where(models.CartItem.user_id == user_id)
+        )
+    )
+
+
+def _item_payload(item_id: str, product: models.Product, quantity: int, price_snapshot: Decimal) -> dict[str, Any]:
+    """Позиция корзины вместе со снимком данных товара, чтобы чтение корзины не ходило в БД"""
+    return {
+        "id": item_id,
+        "product_id": str(product.id),
+        "quantity": quantity,
+        "price_snapshot": str(price_snapshot),
+        "name": product.name,
+        "slug": product.slug,
+        "description": product.description,
+        "image_url": product.image_url,
+        "category_id": str(product.category_id),
+    }
+
+
+def _decode_items(cached: dict[bytes, bytes]) -> list[dict[str, Any]]:
+    return [json.loads(value) for field, value in cached.items() if field.decode() != READY_FIELD]
+
+
+def _unavailable(e: RedisError) -> HTTPException:
+    logger.error(f"❌ Хранилище корзин недоступно: {e}")
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Cart storage is unavailable")
+
+
+async def _ensure_loaded(db: AsyncSession, owner: CartOwner) -> None:
+    """Загрузить корзину пользователя из cart_items, если её ещё нет в Redis"""
+    if owner.is_guest or await async_redis_client.hexists(owner.key, READY_FIELD):
+        return
+    result = await db.execute(_cart_items_stmt(uuid.UUID(owner.owner_id)))
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        for item in result.scalars().unique().all():
+            payload = _item_payload(str(item.id), item.product, item.quantity, item.price_snapshot)
+            # HSETNX: изменения, успевшие попасть в Redis раньше загрузки, не перезаписываются
+            pipe.hsetnx(owner.key, payload["product_id"], json.dumps(payload))
+        pipe.hset(owner.key, READY_FIELD, 1)
+        pipe.expire(owner.key, CART_TTL)
+        await pipe.execute()
+
+
+async def _find_item(owner: CartOwner, item_id: uuid.UUID) -> Optional[dict[str, Any]]:
+    for item in _decode_items(await async_redis_client.hgetall(owner.key)):
+        if item["id"] == str(item_id):
+            return item
+    return None
+
+
+async def get_items(db: AsyncSession, owner: CartOwner) -> list[dict[str, Any]]:
+    try:
+        await _ensure_loaded(db, owner)
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(owner.key)
+            pipe.expire(owner.key, CART_TTL)
+            cached, _ = await pipe.execute()
+    except RedisError as e:
+        raise _unavailable(e) from e
+    return _decode_items(cached)
+
+
+async def add_item(
+    db: AsyncSession, owner: CartOwner, product: models.Product, quantity: int, price_snapshot: Decimal
+) -> dict[str, Any]:
+    """Добавить товар (или увеличить количество уже лежащего в корзине)"""
+    payload = _item_payload(str(uuid.uuid4()), product, quantity, price_snapshot)
+    try:
+        await _ensure_loaded(db, owner)
+        encoded = await _add_item(
+            keys=[owner.key, DIRTY_CARTS_KEY],
+            args=[
+                str(product.id),
+                json.dumps(payload),
+                quantity,
+                str(price_snapshot),
+                CART_TTL,
+                owner.dirty_member,
+            ],
+        )
+    except RedisError as e:
+        raise _unavailable(e) from e
+    return json.loads(encoded)
+
+
+async def set_quantity(
+    db: AsyncSession, owner: CartOwner, item_id: uuid.UUID, quantity: int
+) -> Optional[dict[str, Any]]:
+    try:
+        await _ensure_loaded(db, owner)
+        item = await _find_item(owner, item_id)
+        if item is None:
+            return None
+        encoded = await _set_quantity(
+            keys=[owner.key, DIRTY_CARTS_KEY],
+            args=[item["product_id"], item["id"], quantity, CART_TTL, owner.dirty_member],
+        )
+    except RedisError as e:
+        raise _unavailable(e) from e
+    return None if encoded is None else json.loads(encoded)
+
+
+async def remove_item(db: AsyncSession, owner: CartOwner, item_id: uuid.UUID) -> bool:
+    try:
+        await _ensure_loaded(db, owner)
+        item = await _find_item(owner, item_id)
+        if item is None:
+            return False
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.hdel(owner.key, item["product_id"])
+            if owner.dirty_member:
+                pipe.sadd(DIRTY_CARTS_KEY, owner.dirty_member)
+            await pipe.execute()
+    except RedisError as e:
+        raise _unavailable(e) from e
+    return True
+
+
+async def clear(owner: CartOwner) -> None:
+    try:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(owner.key)
+            if owner.is_guest:
+                await pipe.execute()
+                return
+            # Пустая, но загруженная корзина: при записи в БД её позиции удалятся
+            pipe.hset(owner.key, READY_FIELD, 1)
+            pipe.expire(owner.key, CART_TTL)
+            pipe.sadd(DIRTY_CARTS_KEY, owner.dirty_member)
+            await pipe.execute()
+    except RedisError as e:
+        raise _unavailable(e) from e
+
+
+async def merge_items(
+    db: AsyncSession, owner: CartOwner, items: list[tuple[uuid.UUID, int, Decimal]], guest: Optional[CartOwner] = None
+) -> list[dict[str, Any]]:
+    """Слить в корзину пользователя позиции (product_id, количество, цена) и корзину гостя"""
+    try:
+        if guest is not None:
+            for item in _decode_items(await async_redis_client.hgetall(guest.key)):
+                items.append((uuid.UUID(item["product_id"]), item["quantity"], Decimal(item["price_snapshot"])))
+        if items:
+            # Снимки товаров одним запросом; позиции удалённых товаров пропускаются
+            result = await db.execute(
+                select(models.Product).where(models.Product.id.in_({product_id for product_id, _, _ in items}))
+            )
+            products = {product.id: product for product in result.scalars().all()}
+            for product_id, quantity, price_snapshot in items:
+                if product_id in products:
+                    await add_item(db, owner, products[product_id], quantity, price_snapshot)
+        if guest is not None:
+            await async_redis_client.delete(guest.key)
+    except RedisError as e:
+        raise _unavailable(e) from e
+    return await get_items(db, owner)
+
+
+# endregion
+
+
+class CartPersister:
+    """Отложенная запись изменённых корзин из Redis в cart_items"""
+
+    def __init__(self, interval: float = CART_FLUSH_INTERVAL, batch_size: int = CART_FLUSH_BATCH_SIZE) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _write_batch(self, user_ids: list[str]) -> int:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(USER_CART_KEY.format(owner_id=user_id))
+            cached_carts = await pipe.execute()
+
+        # Корзина без _ready истекла до записи — её содержимое в БД не трогается
+        carts = {
+            uuid.UUID(user_id): _decode_items(cached)
+            for user_id, cached in zip(user_ids, cached_carts, strict=True)
+            if READY_FIELD.encode() in cached
+        }
+        if not carts:
+            return 0
+
+        async with AsyncSessionLocal() as db:
+            # Удалённые за это время пользователи и товары отбрасываются, чтобы порция не упала на FK
+            product_ids = {uuid.UUID(item["product_id"]) for items in carts.values() for item in items}
+            existing_users = set(
+                (await db.execute(select(models.Profile.id).where(models.Profile.id.in_(carts)))).scalars().all()
+            )
+            existing_products = set()
+            if product_ids:
+                existing_products = set(
+                    (await db.execute(select(models.Product.id).where(models.Product.id.in_(product_ids))))
+                    .scalars()
+                    .all()
+                )
+            rows = [
+                {
+                    "id": uuid.UUID(item["id"]),
+                    "user_id": user_id,
+                    "product_id": uuid.UUID(item["product_id"]),
+                    "quantity": item["quantity"],
+                    "price_snapshot": Decimal(item["price_snapshot"]),
+                }
+                for user_id, items in carts.items()
+                if user_id in existing_users
+                for item in items
+                if uuid.UUID(item["product_id"]) in existing_products
+            ]
+            # Корзина в Redis — полный снимок: позиции пользователя в БД переписываются целиком
+            await db.execute(delete(models.CartItem).where(models.CartItem.user_id.in_(carts)))
+            if rows:
+                await db.execute(insert(models.CartItem), rows)
+            await db.commit()
+        return len(carts)
+
+    async def _acquire_lock(self, token: str, wait: float) -> bool:
+        deadline = time.monotonic() + wait
+        while not await async_redis_client.set(FLUSH_LOCK_KEY, token, ex=FLUSH_LOCK_TTL, nx=True):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(FLUSH_LOCK_POLL_INTERVAL)
+        return True
+
+    async def flush_once(self, wait: float = 0) -> Optional[int]:
+        """Записать все изменённые корзины; число записанных или None, если запись занята другим воркером"""
+        # Одна запись за раз: иначе два воркера могут записать снимки одной корзины в обратном порядке
+        token = uuid.uuid4().hex
+        if not await self._acquire_lock(token, wait):
+            return None
+        flushed = 0
+        try:
+            while True:
+                members = await async_redis_client.spop(DIRTY_CARTS_KEY, self.batch_size)
+                if not members:
+                    return flushed
+                user_ids = [member.decode() for member in members]
+                try:
+                    flushed += await self._write_batch(user_ids)
+                except BaseException:
+                    # Порция (в том числе прерванная остановкой) вернётся в очередь и запишется в следующий раз
+                    await async_redis_client.sadd(DIRTY_CARTS_KEY, *user_ids)
+                    CART_STORE_FLUSHES.labels("error").inc(len(user_ids))
+                    raise
+                CART_STORE_FLUSHES.labels("ok").inc(len(user_ids))
+        finally:
+            await _release_lock(keys=[FLUSH_LOCK_KEY], args=[token])
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи корзин в БД: {e}")
+
+    def start(self) -> None:
+        if CART_STORE_ENABLED:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Штатная остановка: накопленные изменения записываются сразу, после записи другого воркера
+        try:
+            flushed = await self.flush_once(wait=FLUSH_STOP_WAIT)
+            if flushed is None:
+                logger.warning(
+                    "⚠️ Корзины не записаны при остановке: запись занята другим воркером, "
+                    f"изменения остались в {DIRTY_CARTS_KEY}"
+                )
+            else:
+                logger.info(f"🛒 Корзины записаны в БД при остановке: {flushed}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось записать корзины при остановке: {e}")
+
+
+cart_persister = CartPersister()
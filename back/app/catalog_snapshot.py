@@ -0,0 +1,324 @@
+"""Снимок каталога в памяти процесса (CATALOG_SNAPSHOT=true)
+
+Товары и категории загружаются целиком и хранятся по столбцам: цены, коды категорий,
+флаги скидки и times_ordered — в массивах array, плюс отсортированные перестановки
+индексов по цене, названию, дате создания и популярности. Список товаров категории
+с фильтром по цене, сортировкой и пагинацией, карточка по id/slug и хиты продаж
+отдаются из снимка без запросов к БД и без построения ORM-объектов. Поиск и фильтр
+по характеристикам снимок не обслуживает — такие запросы идут в БД.
+
+Порядок по названию берётся из БД (ORDER BY name, то есть в collation базы), а не
+сравнением строк Python: в en_US/ru_RU они расходятся в регистре и пунктуации.
+
+Снимок неизменяем: изменение через админку этого воркера собирает новый снимок из
+текущих данных в памяти (без обращения к БД); изменения других воркеров и в обход
+приложения приходят пачками событий шины инвалидации (app/invalidation.py): записи
+пачки перечитываются одним запросом, и снимок пересобирается один раз на пачку. Раз в
+CATALOG_SNAPSHOT_REFRESH_INTERVAL секунд снимок загружается заново: times_ordered
+меняется с заказами, и событий на это нет.
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import time
+import uuid
+from array import array
+from collections.abc import Callable, Iterable
+from itertools import islice
+from typing import Any, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.base import ExecutableOption
+
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.invalidation import InvalidationEvent, subscribe_batch
+from app.schemas import CategoryInDB, ProductInDB
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "false").lower() == "true"
+CATALOG_SNAPSHOT_REFRESH_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_REFRESH_INTERVAL", "300"))
+
+
+class SnapshotData:
+    """Столбцы каталога и перестановки индексов, отсортированные по ключам"""
+
+    def __init__(
+        self,
+        products: Iterable[ProductInDB],
+        categories: Iterable[CategoryInDB],
+        name_rank: Optional[dict[uuid.UUID, int]] = None,
+    ) -> None:
+        self.products = list(products)
+        self.categories_by_slug = {category.slug: category for category in categories}
+        self.by_id = {product.id: position for position, product in enumerate(self.products)}
+        self.by_slug = {product.slug: position for position, product in enumerate(self.products)}
+
+        category_codes: dict[uuid.UUID, int] = {}
+        self.category_codes = category_codes
+        self.category = array(
+            "i", (category_codes.setdefault(p.categoryId, len(category_codes)) for p in self.products)
+        )
+        self.price = array("d", (float(p.price) for p in self.products))
+        self.discounted = bytes(bool(p.discount and p.discount > 0) for p in self.products)
+        self.times_ordered = array("q", (p.timesOrdered for p in self.products))
+
+        # name_rank — позиция товара в ORDER BY name из БД; товары, которых в нём ещё нет
+        # (созданы после загрузки), идут в конец до следующего события
+        name_rank = name_rank or {}
+        unranked = len(name_rank)
+        positions = range(len(self.products))
+        self.permutations = {
+            "price": array("l", sorted(positions, key=self.price.__getitem__)),
+            "name": array(
+                "l",
+                sorted(
+                    positions,
+                    key=lambda i: (name_rank.get(self.products[i].id, unranked), self.products[i].name),
+                ),
+            ),
+            "createdAt": array("l", sorted(positions, key=lambda i: self.products[i].createdAt)),
+            "timesOrdered": array("l", sorted(positions, key=lambda i: -self.times_ordered[i])),
+        }
+        # Цены в порядке перестановки по цене — для bisect по диапазону
+        self.sorted_price = array("d", (self.price[i] for i in self.permutations["price"]))
+
+    def _ordered_positions(
+        self, sort_by: Optional[str], descending: bool, min_price: Optional[float], max_price: Optional[float]
+    ) -> Iterable[int]:
+        if not sort_by:
+            return range(len(self.products))
+        # Как и в _apply_sorting, неизвестное поле сортирует по дате создания
+        key = sort_by if sort_by in ("name", "price") else "createdAt"
+        permutation = self.permutations[key]
+        if key == "price" and (min_price is not None or max_price is not None):
+            low = 0 if min_price is None else bisect.bisect_left(self.sorted_price, min_price)
+            high = len(permutation) if max_price is None else bisect.bisect_right(self.sorted_price, max_price)
+            permutation = permutation[low:high]
+        return reversed(permutation) if descending else permutation
+
+    def list_products(
+        self,
+        category_slug: str,
+        category_ids: Optional[list[str]],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        has_discount: Optional[bool],
+        sort_by: Optional[str],
+        sort_order: Optional[str],
+        offset: Optional[int],
+        limit: Optional[int],
+    ) -> list[ProductInDB]:
+        codes: Optional[set[int]] = None
+        if category_slug != "all":
+            category = self.categories_by_slug.get(category_slug)
+            if category is None or category.id not in self.category_codes:
+                return []
+            codes = {self.category_codes[category.id]}
+        elif category_ids:
+            codes = {self.category_codes[i] for i in map(_parse_uuid, category_ids) if i in self.category_codes}
+
+        def matches(position: int) -> bool:
+            if codes is not None and self.category[position] not in codes:
+                return False
+            price = self.price[position]
+            if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                return False
+            return not has_discount or bool(self.discounted[position])
+
+        positions = self._ordered_positions(sort_by, sort_order == "desc", min_price, max_price)
+        selected = filter(matches, positions)
+        # Та же семантика, что у _apply_pagination: 0 или None — без смещения и без ограничения
+        start = offset or 0
+        stop = start + limit if limit else None
+        return [self.products[position] for position in islice(selected, start, stop)]
+
+    def bestsellers(self, limit: int) -> list[ProductInDB]:
+        return [self.products[position] for position in self.permutations["timesOrdered"][:limit]]
+
+
+def _parse_uuid(value: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(value.strip())
+    except ValueError:
+        return None
+
+
+class CatalogSnapshot:
+    """Снимок каталога с загрузкой из БД и изменениями из админки"""
+
+    def __init__(
+        self, enabled: bool = CATALOG_SNAPSHOT_ENABLED, refresh_interval: float = CATALOG_SNAPSHOT_REFRESH_INTERVAL
+    ) -> None:
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self._products: dict[uuid.UUID, ProductInDB] = {}
+        self._categories: dict[uuid.UUID, CategoryInDB] = {}
+        self._name_rank: dict[uuid.UUID, int] = {}
+        self._snapshot: Optional[SnapshotData] = None
+        # Изменения, пришедшие во время загрузки: повторяются поверх загруженных данных
+        self._pending: Optional[list[Callable[[], None]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> Optional[SnapshotData]:
+        """Текущий снимок или None, если снимок выключен или ещё не загружен"""
+        return self._snapshot if self.enabled else None
+
+    def _rebuild_snapshot(self) -> None:
+        self._snapshot = SnapshotData(self._products.values(), self._categories.values(), self._name_rank)
+
+    def _apply(self, *changes: Callable[[], None]) -> None:
+        """Применить изменения и пересобрать снимок один раз"""
+        if not self.enabled or not changes:
+            return
+        if self._pending is not None:
+            self._pending.extend(changes)
+        for change in changes:
+            change()
+        self._rebuild_snapshot()
+
+    def _product_upsert(self, product: models.Product) -> Callable[[], None]:
+        item = ProductInDB.model_validate(product, from_attributes=True)
+        return lambda: self._products.__setitem__(item.id, item)
+
+    def _product_removal(self, product_id: uuid.UUID) -> Callable[[], None]:
+        return lambda: self._products.pop(product_id, None)
+
+    def _category_upsert(self, category: models.Category) -> Callable[[], None]:
+        item = CategoryInDB.model_validate(category, from_attributes=True)
+
+        def change() -> None:
+            self._categories[item.id] = item
+            # Категория встроена в ответы товаров — обновляем её и там
+            for product_id, product in self._products.items():
+                if product.categoryId == item.id:
+                    self._products[product_id] = product.model_copy(update={"category": item})
+
+        return change
+
+    def _category_removal(self, category_id: uuid.UUID) -> Callable[[], None]:
+        return lambda: self._categories.pop(category_id, None)
+
+    def upsert_product(self, product: models.Product) -> None:
+        """Товар после изменения (с загруженной категорией)"""
+        self._apply(self._product_upsert(product))
+
+    def remove_product(self, product_id: uuid.UUID) -> None:
+        self._apply(self._product_removal(product_id))
+
+    def upsert_category(self, category: models.Category) -> None:
+        self._apply(self._category_upsert(category))
+
+    def remove_category(self, category_id: uuid.UUID) -> None:
+        self._apply(self._category_removal(category_id))
+
+    @staticmethod
+    async def _load_name_rank(db: AsyncSession) -> dict[uuid.UUID, int]:
+        ids = (await db.execute(select(models.Product.id).order_by(models.Product.name))).scalars().all()
+        return {product_id: rank for rank, product_id in enumerate(ids)}
+
+    async def reload(self) -> None:
+        """Загрузить каталог из БД и заменить снимок"""
+        started = time.perf_counter()
+        self._pending = []
+        try:
+            async with AsyncSessionLocal() as db:
+                products = (
+                    (await db.execute(select(models.Product).options(joinedload(models.Product.category))))
+                    .scalars()
+                    .all()
+                )
+                categories = (await db.execute(select(models.Category))).scalars().all()
+                name_rank = await self._load_name_rank(db)
+            pending = self._pending
+        finally:
+            self._pending = None
+        self._products = {p.id: ProductInDB.model_validate(p, from_attributes=True) for p in products}
+        self._categories = {c.id: CategoryInDB.model_validate(c, from_attributes=True) for c in categories}
+        self._name_rank = name_rank
+        for change in pending:
+            change()
+        self._rebuild_snapshot()
+        logger.info(
+            f"📦 Снимок каталога: {len(self._products)} товаров, {len(self._categories)} категорий "
+            f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+
+    @staticmethod
+    async def _fetch_by_ids(
+        db: AsyncSession,
+        model: Union[type[models.Product], type[models.Category]],
+        ids: list[uuid.UUID],
+        *options: ExecutableOption,
+    ) -> dict[uuid.UUID, Any]:
+        if not ids:
+            return {}
+        query = select(model).options(*options).where(model.id.in_(ids))
+        return {row.id: row for row in (await db.execute(query)).scalars()}
+
+    async def on_invalidation(self, events: list[InvalidationEvent]) -> None:
+        """Перечитать из БД записи пачки событий и пересобрать снимок один раз
+
+        Записи из apply_local приходят в событии (obj) и не перечитываются.
+        """
+        if not self.enabled or self._snapshot is None:
+            return
+        if any(event.id is None for event in events):
+            await self.reload()
+            return
+        product_events = [event for event in events if event.entity == "product"]
+        category_events = [event for event in events if event.entity == "category"]
+        products = {event.id: event.obj for event in product_events if event.obj is not None}
+        categories = {event.id: event.obj for event in category_events if event.obj is not None}
+        # Удалённые записи не запрашиваются; запись, которой в БД уже нет, тоже удаляется из снимка
+        product_ids = [event.id for event in product_events if event.action != "delete" and event.obj is None]
+        category_ids = [event.id for event in category_events if event.action != "delete" and event.obj is None]
+        if product_ids or category_ids:
+            async with AsyncSessionLocal() as db:
+                products |= await self._fetch_by_ids(
+                    db, models.Product, product_ids, joinedload(models.Product.category)
+                )
+                categories |= await self._fetch_by_ids(db, models.Category, category_ids)
+                if product_ids:
+                    self._name_rank = await self._load_name_rank(db)
+        # Сначала категории: товар из той же пачки уже несёт новую версию своей категории
+        changes = [
+            self._category_upsert(categories[event.id]) if event.id in categories else self._category_removal(event.id)
+            for event in category_events
+        ]
+        changes += [
+            self._product_upsert(products[event.id]) if event.id in products else self._product_removal(event.id)
+            for event in product_events
+        ]
+        self._apply(*changes)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки снимка каталога: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+catalog_snapshot = CatalogSnapshot()
+subscribe_batch(("product", "category"), catalog_snapshot.on_invalidation)
@@ -0,0 +1,218 @@
+"""Сжатие HTTP-ответов: gzip и brotli по Accept-Encoding
+
+CompressionMiddleware сжимает ответы с типом из COMPRESSIBLE_TYPES и телом не меньше
+COMPRESSION_MIN_SIZE байт. Потоковые ответы (text/event-stream) не сжимаются: буферизация
+компрессора задерживала бы события. Ответ, у которого уже есть Content-Encoding, проходит как есть.
+
+Brotli используется, если установлен пакет brotli (pip install brotli); без него — только gzip.
+
+Закэшированные ответы каталога хранятся в кэше уже сериализованными и сжатыми (CompressedBody):
+каждая кодировка считается один раз на запись кэша, с более высоким уровнем сжатия, чем на лету.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Any, Optional
+
+from pydantic_core import to_json
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Уровни для сжатия на лету: дальше выигрыш в размере мал, а CPU растёт заметно
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+# Для ответов, сжимаемых один раз и отдаваемых из кэша много раз
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 9
+
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+        "text/css",
+        "text/csv",
+        "text/html",
+        "text/javascript",
+        "text/plain",
+        "text/xml",
+    }
+)
+# Предпочтение при равных q: brotli сжимает JSON каталога заметно лучше gzip
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None"""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    # mtime=0: одинаковое тело даёт одинаковые байты (стабильный ETag у прокси)
+    return gzip.compress(data, compresslevel=PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL, mtime=0)
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.split(";", 1)[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+class CompressedBody:
+    """Тело ответа, сериализованное один раз; сжатые варианты создаются при первом запросе"""
+
+    __slots__ = ("body", "media_type", "_encoded")
+
+    def __init__(self, body: bytes, media_type: str = "application/json") -> None:
+        self.body = body
+        self.media_type = media_type
+        self._encoded: dict[str, bytes] = {}
+
+    @classmethod
+    def from_value(cls, value: Any) -> "CompressedBody":  # noqa: ANN401
+        """JSON из pydantic-моделей (или списков моделей) — так же, как их сериализует FastAPI"""
+        return cls(to_json(value))
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body, encoding, precompressed=True)
+        return data
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding")) if COMPRESSION_ENABLED else None
+        if encoding is None or len(self.body) < COMPRESSION_MIN_SIZE:
+            return Response(self.body, media_type=self.media_type, headers={"Vary": "Accept-Encoding"})
+        return Response(
+            self.encoded(encoding),
+            media_type=self.media_type,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+
+
+class _StreamCompressor:
+    """Инкрементальный компрессор для ответов из нескольких частей"""
+
+    def __init__(self, encoding: str) -> None:
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._flush = self._compressor.process, self._compressor.finish
+        else:
+            # wbits=31 — формат gzip (заголовок и CRC), а не «голый» zlib
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress, self._flush = self._compressor.compress, self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def flush(self) -> bytes:
+        return self._flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware: сжатие ответов по Accept-Encoding с порогом размера и списком типов"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(encoding, self.minimum_size, send).run(self.app, scope, receive)
+
+
+class _CompressionResponder:
+    def __init__(self, encoding: str, minimum_size: int, send: Send) -> None:
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or not _is_compressible(headers.get("content-type", ""))
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Заголовки отправятся вместе с первой частью тела, когда станет ясно, сжимаем ли
+                self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                # Длина сжатого потока заранее неизвестна
+                del headers["Content-Length"]
+                self.compressor = _StreamCompressor(self.encoding)
+            else:
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        assert self.compressor is not None
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.flush()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
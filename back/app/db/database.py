@@ -1,10 +1,25 @@
 import logging
 import os
+import time
+import uuid
 from collections.abc import AsyncGenerator
+from typing import Optional
 
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from app.db.query_budget import install_query_instrumentation
+from app.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_DURATION,
+    DB_POOL_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUTS,
+)
 
 # Настройка логгирования
 logging.basicConfig(level=logging.INFO)
@@ -15,24 +30,100 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in the .env file")
 
-# Создаем движок с расширенными параметрами для устранения timeout ошибок
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    # Параметры пула соединений
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=3600,
-    pool_pre_ping=True,
-    # Параметры подключения asyncpg
-    connect_args={
-        "command_timeout": 60,
-        "server_settings": {
-            "application_name": "garden_store_backend",
+# Необязательная реплика для read-only эндпоинтов (каталог, категории, история заказов)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# Параметры пула и таймаутов (задаются через окружение)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Клиентский таймаут asyncpg на одну команду, секунды
+COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+# Серверный statement_timeout Postgres, миллисекунды (0 — без ограничения)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+# Кэш подготовленных выражений asyncpg на соединение (0 — выключить, нужно за pgbouncer в режиме transaction)
+PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "256"))
+# Размер кэша скомпилированных SQLAlchemy-запросов (lambda_stmt и обычные select) на движок
+COMPILED_CACHE_SIZE = int(os.getenv("DB_COMPILED_CACHE_SIZE", "1000"))
+# Уникален для процесса и входит в application_name соединений: по нему шина инвалидации
+# (app/invalidation.py) узнаёт события от собственных записей
+INSTANCE_ID = uuid.uuid4().hex[:12]
+
+
+def application_name(label: str) -> str:
+    return f"garden_store_backend_{label}_{INSTANCE_ID}"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания свободного соединения
+
+    Состояние пула записывается в гауги при каждой выдаче и возврате соединения: с несколькими
+    воркерами значения складываются через PROMETHEUS_MULTIPROC_DIR (app/metrics.py).
+    """
+
+    engine_label = "primary"
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.engine_label).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_DURATION.labels(self.engine_label).observe(time.perf_counter() - start)
+            self.report_state()
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        self.report_state()
+
+    def report_state(self) -> None:
+        DB_POOL_SIZE.labels(self.engine_label).set(self.size())
+        DB_POOL_CHECKED_OUT.labels(self.engine_label).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.engine_label).set(max(self.overflow(), 0))
+
+
+def register_pool_metrics(async_engine: AsyncEngine, label: str) -> None:
+    pool = async_engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.engine_label = label
+        pool.report_state()
+
+
+def create_engine_from_settings(url: str, label: str) -> AsyncEngine:
+    """Создать движок с параметрами пула и таймаутов из окружения"""
+    async_engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        query_cache_size=COMPILED_CACHE_SIZE,
+        # Параметры пула соединений
+        poolclass=InstrumentedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+        # Параметры подключения asyncpg
+        connect_args={
+            "command_timeout": COMMAND_TIMEOUT,
+            # LRU-кэш prepared statements на соединение: повторный запрос не проходит Parse на сервере
+            "prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "application_name": application_name(label),
+                "statement_timeout": str(STATEMENT_TIMEOUT_MS),
+            },
         },
-    },
-)
+    )
+    # Счётчик запросов и детектор N+1 (см. app/db/query_budget.py)
+    install_query_instrumentation(async_engine.sync_engine)
+    register_pool_metrics(async_engine, label)
+    return async_engine
+
+
+engine = create_engine_from_settings(DATABASE_URL, "primary")
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -40,6 +131,34 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+read_engine: Optional[AsyncEngine] = (
+    create_engine_from_settings(DATABASE_READ_URL, "replica") if DATABASE_READ_URL else None
+)
+
+ReadSessionLocal: Optional[async_sessionmaker[AsyncSession]] = (
+    async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine is not None else None
+)
+
+
+class ReplicaStatus:
+    """Доступность реплики: обновляется фоновой проверкой здоровья и ошибками подключения"""
+
+    def __init__(self) -> None:
+        self.available = read_engine is not None
+
+    def mark_available(self) -> None:
+        if not self.available:
+            logger.info("✅ Реплика БД снова доступна, чтение возвращается на неё")
+        self.available = True
+
+    def mark_unavailable(self, error: object) -> None:
+        if self.available:
+            logger.warning(f"⚠️  Реплика БД недоступна, чтение переключено на основную БД: {error}")
+        self.available = False
+
+
+replica_status = ReplicaStatus()
+
 Base = declarative_base()
 
 
@@ -55,6 +174,20 @@ async def check_database_connection() -> bool:
         return False
 
 
+async def _open_replica_session() -> Optional[AsyncSession]:
+    """Сессия на реплике с уже полученным соединением или None, если реплика недоступна"""
+    if ReadSessionLocal is None or not replica_status.available:
+        return None
+    db = ReadSessionLocal()
+    try:
+        await db.connection()
+    except (OSError, DBAPIError, PoolTimeoutError, TimeoutError) as e:
+        await db.close()
+        replica_status.mark_unavailable(e)
+        return None
+    return db
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as db:
         try:
@@ -70,3 +203,19 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await db.close()
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Сессия для read-only эндпоинтов: реплика, если она доступна, иначе основная БД"""
+    db = await _open_replica_session() or AsyncSessionLocal()
+    async with db:
+        try:
+            yield db
+        except Exception as e:
+            from fastapi import HTTPException
+
+            if isinstance(e, HTTPException):
+                raise
+            logger.error(f"Ошибка в сессии базы данных (чтение): {e}")
+            await db.rollback()
+            raise
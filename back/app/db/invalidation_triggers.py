@@ -0,0 +1,97 @@
+"""Триггеры pg_notify для шины инвалидации (app/invalidation.py)
+
+Создаются миграциями a7c9e1b3d5f8 и c1e3a5b7d9f0 (в них замороженные копии DDL: изменения
+здесь требуют новой миграции) и заново после пересоздания таблиц в seeds.py (DROP TABLE удаляет
+и триггеры).
+
+Все триггеры операторные, с таблицами переходов: массовая загрузка или массовое обновление
+дают одно событие «всё» вместо тысяч уведомлений, которые каждый воркер разбирал бы по одному.
+UPDATE рассылает только строки, изменившиеся не только в IGNORED_COLUMNS. В origin события
+записывается application_name соединения: воркер узнаёт по нему события своих записей.
+"""
+
+from typing import Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+# Таблица -> сущность события
+TABLES = {"products": "product", "categories": "category", "profiles": "profile"}
+
+# Столбцы, изменение которых не рассылается. times_ordered и updated_at товаров меняются
+# с каждым заказом, популярность догоняется периодической перезагрузкой кэшей
+IGNORED_COLUMNS = {"products": ("times_ordered", "updated_at")}
+
+# Больше строк в одном INSERT/UPDATE/DELETE — одно событие на всю сущность
+MAX_ROW_EVENTS = 100
+
+FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION public.notify_cache_invalidation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    entity text := TG_ARGV[0];
+    ignored text[] := coalesce(TG_ARGV[1], '{{}}')::text[];
+    action text := CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END;
+    origin text := current_setting('application_name', true);
+    all_rows text := json_build_object('entity', entity, 'id', NULL, 'origin', origin)::text;
+    ids uuid[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('cache_invalidation', all_rows);
+        RETURN NULL;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(n.id) INTO ids
+        FROM changed n JOIN old_rows o ON o.id = n.id
+        WHERE to_jsonb(n) - ignored IS DISTINCT FROM to_jsonb(o) - ignored;
+    ELSE
+        SELECT array_agg(id) INTO ids FROM changed;
+    END IF;
+    IF cardinality(ids) > {MAX_ROW_EVENTS} THEN
+        PERFORM pg_notify('cache_invalidation', all_rows);
+    ELSIF ids IS NOT NULL THEN
+        PERFORM pg_notify(
+            'cache_invalidation',
+            json_build_object('entity', entity, 'id', id, 'action', action, 'origin', origin)::text
+        )
+        FROM unnest(ids) AS id;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGER_KINDS = ("insert", "delete", "update", "truncate")
+
+
+def create_statements() -> list[str]:
+    statements = [FUNCTION_SQL]
+    for table, entity in TABLES.items():
+        ignored = ",".join(IGNORED_COLUMNS.get(table, ()))
+        function = f"EXECUTE FUNCTION public.notify_cache_invalidation('{entity}', '{{{ignored}}}')"
+        statements += [f"DROP TRIGGER IF EXISTS cache_invalidation_{kind} ON public.{table}" for kind in TRIGGER_KINDS]
+        statements += [
+            f"CREATE TRIGGER cache_invalidation_insert AFTER INSERT ON public.{table} "
+            f"REFERENCING NEW TABLE AS changed FOR EACH STATEMENT {function}",
+            f"CREATE TRIGGER cache_invalidation_delete AFTER DELETE ON public.{table} "
+            f"REFERENCING OLD TABLE AS changed FOR EACH STATEMENT {function}",
+            # Таблицы переходов несовместимы со списком столбцов UPDATE OF — фильтр внутри функции
+            f"CREATE TRIGGER cache_invalidation_update AFTER UPDATE ON public.{table} "
+            f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed FOR EACH STATEMENT {function}",
+            f"CREATE TRIGGER cache_invalidation_truncate AFTER TRUNCATE ON public.{table} FOR EACH STATEMENT {function}",
+        ]
+    return statements
+
+
+def drop_statements() -> list[str]:
+    statements = [
+        f"DROP TRIGGER IF EXISTS cache_invalidation_{kind} ON public.{table}"
+        for table in TABLES
+        for kind in TRIGGER_KINDS
+    ]
+    return [*statements, "DROP FUNCTION IF EXISTS public.notify_cache_invalidation()"]
+
+
+async def install(db: Union[AsyncSession, AsyncConnection]) -> None:
+    """Создать (или пересоздать) функцию и триггеры в текущей транзакции"""
+    for statement in create_statements():
+        await db.execute(text(statement))
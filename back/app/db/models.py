@@ -1,6 +1,18 @@
 import uuid
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    String,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
@@ -23,7 +35,16 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Фильтр по характеристикам: characteristics @> '{"ключ": "значение"}'
+        Index(
+            "ix_products_characteristics",
+            "characteristics",
+            postgresql_using="gin",
+            postgresql_ops={"characteristics": "jsonb_path_ops"},
+        ),
+        {"schema": "public"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     slug = Column(String, unique=True, nullable=False)
@@ -44,15 +65,32 @@ class Product(Base):
     cart_items = relationship("CartItem", back_populates="product")
 
 
+class ProductAttribute(Base):
+    """Значения характеристик по категориям (app/db/product_attributes.py)"""
+
+    __tablename__ = "product_attributes"
+    __table_args__ = {"schema": "public"}
+
+    category_id = Column(UUID(as_uuid=True), ForeignKey("public.categories.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+
+
 class Profile(Base):
     __tablename__ = "profiles"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        Index("ix_profiles_deleted", "id", postgresql_where="deleted_at IS NOT NULL"),
+        {"schema": "public"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True)  # Matches auth.users id
     email = Column(String, unique=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     full_name = Column(String)
     is_admin = Column(Boolean, default=False)
+    # Пользователь удалён и скрыт; строки вычищает фоновый UserPurger (app/user_purge.py)
+    deleted_at = Column(DateTime(timezone=True))
 
     favourites = relationship("Favourite", back_populates="profile")
     cart_items = relationship("CartItem", back_populates="profile")
@@ -61,7 +99,7 @@ class Profile(Base):
 
 class Favourite(Base):
     __tablename__ = "favourites"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (Index("ix_favourites_user_id", "user_id"), {"schema": "public"})
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
@@ -73,7 +111,7 @@ class Favourite(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (Index("ix_cart_items_user_id", "user_id"), {"schema": "public"})
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
@@ -87,7 +125,7 @@ class CartItem(Base):
 
 class Order(Base):
     __tablename__ = "orders"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (Index("ix_orders_user_id", "user_id"), {"schema": "public"})
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
@@ -102,15 +140,16 @@ class Order(Base):
     phone = Column(String, nullable=False)
 
     profile = relationship("Profile", back_populates="orders")
-    order_items = relationship("OrderItem", back_populates="order")
+    # Позиции удаляются базой (ON DELETE CASCADE), без загрузки в сессию
+    order_items = relationship("OrderItem", back_populates="order", passive_deletes=True)
 
 
 class OrderItem(Base):
     __tablename__ = "order_items"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (Index("ix_order_items_order_id", "order_id"), {"schema": "public"})
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("public.orders.id"), nullable=False)
+    order_id = Column(UUID(as_uuid=True), ForeignKey("public.orders.id", ondelete="CASCADE"), nullable=False)
     product_id = Column(UUID(as_uuid=True), nullable=False)  # No foreign key, it's a snapshot
     quantity = Column(Integer, nullable=False)
     price_snapshot = Column(Numeric(10, 2), nullable=False)
@@ -122,7 +161,7 @@ class OrderItem(Base):
 
 class Chat(Base):
     __tablename__ = "chats"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (Index("ix_chats_user_id", "user_id"), {"schema": "public"})
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
@@ -132,15 +171,21 @@ class Chat(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("Profile", foreign_keys=[user_id])
-    messages = relationship("ChatMessage", back_populates="chat", cascade="all, delete-orphan")
+    messages = relationship("ChatMessage", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Непрочитанные сообщения чата: счётчики непрочитанного и их сверка (app/unread.py)
+        Index("ix_chat_messages_chat_id_unread", "chat_id", postgresql_where="NOT is_read"),
+        Index("ix_chat_messages_chat_id", "chat_id"),
+        Index("ix_chat_messages_sender_id", "sender_id"),
+        {"schema": "public"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    chat_id = Column(UUID(as_uuid=True), ForeignKey("public.chats.id"), nullable=False)
+    chat_id = Column(UUID(as_uuid=True), ForeignKey("public.chats.id", ondelete="CASCADE"), nullable=False)
     sender_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
     message = Column(String, nullable=False)
     is_from_admin = Column(Boolean, default=False)
@@ -153,16 +198,77 @@ class ChatMessage(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
-    __table_args__ = {"schema": "public"}
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        # Помесячные партиции по created_at (app/db/notification_partitions.py); ключ партиционирования
+        # обязан входить в первичный ключ
+        PrimaryKeyConstraint("id", "created_at"),
+        Index("ix_notifications_user_id_unread", "user_id", postgresql_where="NOT is_read"),
+        {"schema": "public", "postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("public.profiles.id"), nullable=False)
     title = Column(String, nullable=False)
     message = Column(String, nullable=False)
     type = Column(String, nullable=False)  # 'order_status', 'chat_message', 'new_order', 'system'
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     # Дополнительные данные для уведомления (order_id, chat_id и т.д.)
     notification_data = Column(JSONB)
 
     user = relationship("Profile", foreign_keys=[user_id])
+
+    # Для ORM уведомление по-прежнему идентифицируется только id
+    __mapper_args__ = {"primary_key": ["id"]}
+
+
+# Лента пользователя: последние уведомления по created_at
+Index("ix_notifications_user_id_created_at", Notification.user_id, Notification.created_at.desc())
+
+
+class NotificationArchive(Base):
+    """Прочитанные и устаревшие уведомления, перенесённые из notifications"""
+
+    __tablename__ = "notifications_archive"
+    __table_args__ = {"schema": "public"}
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    title = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    is_read = Column(Boolean)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    notification_data = Column(JSONB)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class SalesDaily(Base):
+    """Дневные итоги продаж (app/db/sales_rollups.py); отменённые заказы не учитываются"""
+
+    __tablename__ = "sales_daily"
+    __table_args__ = {"schema": "public"}
+
+    day = Column(Date, primary_key=True)
+    # Часть итогов дня (ROLLUP_SHARDS в app/db/sales_rollups.py): итог дня — сумма по shard
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class SalesDailyProduct(Base):
+    """Дневные продажи по товарам; категория и название запоминаются на момент продажи"""
+
+    __tablename__ = "sales_daily_products"
+    __table_args__ = (Index("ix_sales_daily_products_category_id_day", "category_id", "day"), {"schema": "public"})
+
+    day = Column(Date, primary_key=True)
+    # Без внешних ключей: итоги переживают удаление товара или категории
+    product_id = Column(UUID(as_uuid=True), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    category_id = Column(UUID(as_uuid=True))
+    product_name = Column(String, nullable=False)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
@@ -0,0 +1,160 @@
+"""Помесячные партиции таблицы notifications и перенос старых уведомлений в архив
+
+notifications секционирована по created_at (RANGE, партиция на календарный месяц UTC,
+имя notifications_pYYYYMM) плюс партиция DEFAULT на случай отсутствующего месяца.
+Прочитанные уведомления старше NOTIFICATION_ARCHIVE_DAYS и любые старше
+NOTIFICATION_MAX_AGE_DAYS переносятся в notifications_archive; опустевшие партиции
+за пределами NOTIFICATION_MAX_AGE_DAYS удаляются.
+
+Список уведомлений по умолчанию читает только последние NOTIFICATION_HOT_DAYS (hot_cutoff()),
+то есть одну-две помесячные партиции; более старые отдаются отдельным запросом (older=true),
+который читает и архив. Счётчик непрочитанного и изменения статуса затрагивают все строки
+в пределах срока хранения (retention_cutoff()).
+"""
+
+import logging
+import os
+import re
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_ARCHIVE_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_DAYS", "30"))
+NOTIFICATION_MAX_AGE_DAYS = int(os.getenv("NOTIFICATION_MAX_AGE_DAYS", "180"))
+# Окно списка уведомлений по умолчанию; старше — по запросу older=true
+NOTIFICATION_HOT_DAYS = min(int(os.getenv("NOTIFICATION_HOT_DAYS", "30")), NOTIFICATION_MAX_AGE_DAYS)
+# На сколько месяцев вперёд создаются партиции
+NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv("NOTIFICATION_PARTITIONS_AHEAD", "2"))
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.getenv("NOTIFICATION_ARCHIVE_BATCH_SIZE", "5000"))
+
+PARTITION_PREFIX = "notifications_p"
+DEFAULT_PARTITION = "notifications_default"
+_PARTITION_NAME_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+# Одна порция: строки удаляются из notifications и вставляются в архив в одном запросе;
+# результат — сколько непрочитанных уведомлений ушло у каждого пользователя
+_ARCHIVE_BATCH_SQL = text("""
+    WITH batch AS (
+        SELECT id, created_at
+        FROM public.notifications
+        WHERE created_at < :max_age_cutoff
+           OR (is_read AND created_at < :read_cutoff)
+        ORDER BY created_at
+        LIMIT :batch_size
+    ), moved AS (
+        DELETE FROM public.notifications n
+        USING batch b
+        WHERE n.id = b.id AND n.created_at = b.created_at
+        RETURNING n.id, n.user_id, n.title, n.message, n.type, n.is_read, n.created_at, n.notification_data
+    ), archived AS (
+        INSERT INTO public.notifications_archive
+            (id, user_id, title, message, type, is_read, created_at, notification_data)
+        SELECT id, user_id, title, message, type, is_read, created_at, notification_data FROM moved
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT user_id, count(*) AS moved, count(*) FILTER (WHERE NOT coalesce(is_read, false)) AS unread
+    FROM moved
+    GROUP BY user_id
+    """)
+
+
+def hot_cutoff() -> datetime:
+    """Нижняя граница created_at для списка уведомлений по умолчанию"""
+    return datetime.now(UTC) - timedelta(days=NOTIFICATION_HOT_DAYS)
+
+
+def retention_cutoff() -> datetime:
+    """Нижняя граница created_at строк notifications, ещё не ушедших в архив по сроку хранения"""
+    return datetime.now(UTC) - timedelta(days=NOTIFICATION_MAX_AGE_DAYS)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=UTC)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}{month.month:02d}"
+
+
+async def list_partitions(conn: AsyncConnection) -> dict[str, datetime]:
+    """Помесячные партиции notifications: имя -> начало месяца"""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'public.notifications'::regclass"
+        )
+    )
+    partitions = {}
+    for (name,) in result.all():
+        match = _PARTITION_NAME_RE.match(name)
+        if match:
+            partitions[name] = datetime(int(match[1]), int(match[2]), 1, tzinfo=UTC)
+    return partitions
+
+
+async def ensure_partitions(
+    conn: AsyncConnection, months_ahead: int = NOTIFICATION_PARTITIONS_AHEAD, months_back: int = 0
+) -> list[str]:
+    """Создать партиции текущего месяца, months_ahead следующих и months_back прошлых; имена созданных"""
+    # DEFAULT принимает строки за месяцы без партиции, чтобы вставка не падала
+    await conn.execute(
+        text(f"CREATE TABLE IF NOT EXISTS public.{DEFAULT_PARTITION} PARTITION OF public.notifications DEFAULT")
+    )
+    existing = await list_partitions(conn)
+    created = []
+    now = datetime.now(UTC)
+    first_month = now.year * 12 + now.month - 1 - months_back
+    month = datetime(first_month // 12, first_month % 12 + 1, 1, tzinfo=UTC)
+    for _ in range(months_back + months_ahead + 1):
+        name = partition_name(month)
+        if name not in existing:
+            bounds = f"FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            await conn.execute(
+                text(f"CREATE TABLE IF NOT EXISTS public.{name} PARTITION OF public.notifications FOR VALUES {bounds}")
+            )
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+async def archive_batch(
+    conn: AsyncConnection, batch_size: int = NOTIFICATION_ARCHIVE_BATCH_SIZE
+) -> tuple[int, dict[str, int]]:
+    """Перенести в архив одну порцию: (сколько строк перенесено, user_id -> ушедшие непрочитанные)"""
+    result = await conn.execute(
+        _ARCHIVE_BATCH_SQL,
+        {
+            "max_age_cutoff": retention_cutoff(),
+            "read_cutoff": datetime.now(UTC) - timedelta(days=NOTIFICATION_ARCHIVE_DAYS),
+            "batch_size": batch_size,
+        },
+    )
+    total = 0
+    unread: dict[str, int] = {}
+    for user_id, moved, unread_moved in result.all():
+        total += moved
+        if unread_moved:
+            unread[str(user_id)] = unread_moved
+    return total, unread
+
+
+async def drop_expired_partitions(conn: AsyncConnection) -> list[str]:
+    """Удалить пустые партиции, целиком лежащие старше NOTIFICATION_MAX_AGE_DAYS"""
+    cutoff = retention_cutoff()
+    dropped = []
+    for name, month in sorted((await list_partitions(conn)).items()):
+        if _next_month(month) > cutoff:
+            continue
+        has_rows = (await conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM public.{name})"))).scalar()
+        if has_rows:
+            # Строки остаются только если архивация ещё не дошла до этого месяца
+            logger.warning(f"⚠️  Партиция {name} старше срока хранения, но не пуста — пропущена")
+            continue
+        await conn.execute(text(f"ALTER TABLE public.notifications DETACH PARTITION public.{name}"))
+        await conn.execute(text(f"DROP TABLE public.{name}"))
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,74 @@
+"""Справочник фильтруемых характеристик товаров: product_attributes
+
+Для каждой категории хранятся пары ключ/значение из products.characteristics и число
+товаров с ними — из него строится список фильтров каталога без обхода JSONB всех товаров.
+Фильтруются только строковые значения не длиннее MAX_VALUE_LENGTH символов. Категории
+пересчитываются в транзакции изменения товара (refresh); полный пересчёт:
+
+    python -m app.db.product_attributes
+"""
+
+import asyncio
+import time
+import uuid
+from collections.abc import Iterable
+from typing import Optional, Union
+
+from sqlalchemy import case, delete, func, select, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db import models
+
+MAX_VALUE_LENGTH = 100
+
+Executor = Union[AsyncSession, AsyncConnection]
+
+
+async def refresh(db: Executor, category_ids: Optional[Iterable[Optional[uuid.UUID]]] = None) -> None:
+    """Пересчитать характеристики категорий category_ids (всех, если None) в текущей транзакции"""
+    product, attribute = models.Product, models.ProductAttribute
+    # jsonb_each_text падает на массивах и скалярах, поэтому такие characteristics пропускаются
+    characteristics = case((func.jsonb_typeof(product.characteristics) == "object", product.characteristics))
+    pairs = func.jsonb_each_text(characteristics).table_valued("key", "value").lateral("kv")
+    stmt = (
+        select(product.category_id, pairs.c.key, pairs.c.value, func.count())
+        .select_from(product)
+        .join(pairs, true())
+        .where(
+            func.jsonb_typeof(product.characteristics[pairs.c.key]) == "string",
+            func.length(pairs.c.value).between(1, MAX_VALUE_LENGTH),
+        )
+        .group_by(product.category_id, pairs.c.key, pairs.c.value)
+    )
+    cleanup = delete(attribute)
+    if category_ids is not None:
+        category_ids = {category_id for category_id in category_ids if category_id is not None}
+        if not category_ids:
+            return
+        stmt = stmt.where(product.category_id.in_(category_ids))
+        cleanup = cleanup.where(attribute.category_id.in_(category_ids))
+
+    await db.execute(cleanup)
+    upsert = insert(attribute).from_select(["category_id", "key", "value", "product_count"], stmt)
+    # Параллельный пересчёт той же категории мог уже вставить строку — берём свежий счётчик
+    await db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["category_id", "key", "value"],
+            set_={"product_count": upsert.excluded.product_count},
+        )
+    )
+
+
+if __name__ == "__main__":
+
+    async def main_refresh() -> None:
+        from app.db.database import engine
+
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            await refresh(conn)
+        await engine.dispose()
+        print(f"Характеристики товаров пересчитаны за {time.perf_counter() - started:.1f} с")
+
+    asyncio.run(main_refresh())
@@ -0,0 +1,174 @@
+"""Подсчёт SQL-запросов на HTTP-запрос, бюджеты маршрутов и детектор N+1"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Режим работы: off — выключено, log — предупреждение в лог, raise — исключение (для тестов).
+# Бюджет проверяется после отправки ответа, поэтому в режиме raise клиент ответ уже получил:
+# исключение видно в логах сервера и в TestClient (raise_server_exceptions), но не в статусе ответа
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()
+DEFAULT_QUERY_BUDGET = int(os.getenv("QUERY_BUDGET_DEFAULT", "20"))
+# Сколько раз один и тот же запрос может повториться за HTTP-запрос, прежде чем это считается N+1
+REPEATED_STATEMENT_THRESHOLD = int(os.getenv("QUERY_BUDGET_REPEAT_THRESHOLD", "5"))
+
+# Бюджеты отдельных маршрутов: "METHOD /шаблон/пути" -> максимум SQL-запросов
+ROUTE_QUERY_BUDGETS: dict[str, int] = {
+    "GET /api/cart": 3,
+    "GET /api/products/category/{category_slug}": 3,
+    "GET /api/products/slug/{product_slug}": 2,
+    "GET /api/products/{product_id}": 2,
+    "GET /api/notifications/unread-count": 2,
+}
+
+_PLACEHOLDER_RE = re.compile(r"\$\d+|%\(\w+\)s|:\w+|\?")
+_IN_LIST_RE = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceededError(RuntimeError):
+    """Маршрут превысил бюджет запросов или выполнил повторяющиеся запросы"""
+
+
+class QueryStats:
+    """Статистика SQL-запросов в рамках одного HTTP-запроса"""
+
+    __slots__ = ("count", "total_time", "shapes")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[normalize_statement(statement)] += 1
+
+    def repeated(self, threshold: int = REPEATED_STATEMENT_THRESHOLD) -> list[tuple[str, int]]:
+        """Запросы одинаковой формы, выполненные не меньше threshold раз"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def normalize_statement(statement: str) -> str:
+    """Приводит запрос к "форме": параметры и IN-списки любой длины становятся одинаковыми"""
+    shape = _PLACEHOLDER_RE.sub("?", statement)
+    shape = _IN_LIST_RE.sub("(?...)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Считать все SQL-запросы внутри блока (используется middleware, тестами и бенчмарками)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(
+    conn: Connection, cursor: object, statement: str, parameters: object, context: object, executemany: bool
+) -> None:
+    # Время начала хранится в контексте выполнения, а не в conn.info: для упавшего запроса
+    # after_cursor_execute не вызывается, и метка в соединении пула осталась бы навсегда
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Connection, cursor: object, statement: str, parameters: object, context: object, executemany: bool
+) -> None:
+    stats = _current_stats.get()
+    start = getattr(context, "_query_start_time", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def install_query_instrumentation(engine: Engine) -> None:
+    """Подключить счётчик запросов к движку (для async-движка передаётся engine.sync_engine)"""
+    if QUERY_BUDGET_MODE == "off" or event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def check_query_budget(route_key: str, stats: QueryStats) -> None:
+    """Сравнить статистику с бюджетом маршрута и сообщить о нарушениях согласно QUERY_BUDGET_MODE"""
+    problems = []
+    budget = ROUTE_QUERY_BUDGETS.get(route_key, DEFAULT_QUERY_BUDGET)
+    if stats.count > budget:
+        problems.append(f"{stats.count} queries (budget {budget})")
+    for shape, n in stats.repeated():
+        problems.append(f"repeated {n}x: {shape[:200]}")
+
+    if not problems:
+        return
+    report = f"{route_key}: " + "; ".join(problems) + f"; db time {stats.total_time * 1000:.1f} ms"
+    if QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceededError(report)
+    logger.warning(f"⚠️  Превышен бюджет SQL-запросов — {report}")
+
+
+def _load_budget_overrides() -> None:
+    # Формат переменной: QUERY_BUDGETS="GET /api/admin/users=5,POST /api/orders=10"
+    for item in os.getenv("QUERY_BUDGETS", "").split(","):
+        route_key, _, limit = item.rpartition("=")
+        if route_key.strip() and limit.strip().isdigit():
+            ROUTE_QUERY_BUDGETS[route_key.strip()] = int(limit)
+
+
+_load_budget_overrides()
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware: считает запросы к БД на каждый HTTP-запрос и проверяет бюджет маршрута
+
+    Проверка идёт после того, как ответ отправлен (буферизовать каждый ответ ради неё слишком
+    дорого), так что и в режиме raise она не меняет статус ответа клиенту.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or QUERY_BUDGET_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        route = scope.get("route")
+        if route is not None:
+            check_query_budget(f"{scope['method']} {route.path}", stats)
@@ -0,0 +1,213 @@
+"""Дневные агрегаты продаж: sales_daily (итоги дня) и sales_daily_products (по товарам)
+
+Агрегаты меняются в той же транзакции, что и заказ: apply_orders(..., +1) после создания
+заказа или возврата из отмены, apply_orders(..., -1) перед удалением, отменой или правкой
+состава. Учитываются заказы во всех статусах, кроме EXCLUDED_STATUSES; день — дата
+создания заказа в ANALYTICS_TIMEZONE.
+
+Итоги дня разложены по ROLLUP_SHARDS строкам (shard — байт id заказа), иначе все
+оформления заказов за день ждали бы блокировку одной строки sales_daily. Читатели
+суммируют строки дня (и товара) по всем shard.
+
+Полный или частичный пересчёт из orders/order_items (после миграции и при подозрении
+на расхождение) не блокирует оформление заказов:
+
+    python -m app.db.sales_rollups [--since YYYY-MM-DD]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import date
+from typing import Optional, Union
+
+from sqlalchemy import ColumnElement, Date, Integer, Select, and_, cast, func, or_, select, text, true
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db import models
+
+ANALYTICS_TIMEZONE = os.getenv("ANALYTICS_TIMEZONE", "Europe/Moscow")
+EXCLUDED_STATUSES = ("cancelled",)
+# Изменение не портит итоги (суммы по shard те же), но дельты старых заказов попадут в другие строки
+ROLLUP_SHARDS = 16
+
+Executor = Union[AsyncSession, AsyncConnection]
+
+
+def is_counted(status: Optional[str]) -> bool:
+    """Входит ли заказ с таким статусом в агрегаты"""
+    return status not in EXCLUDED_STATUSES
+
+
+def order_day() -> ColumnElement[date]:
+    return cast(func.timezone(ANALYTICS_TIMEZONE, models.Order.created_at), Date)
+
+
+def order_shard() -> ColumnElement[int]:
+    return func.get_byte(func.uuid_send(models.Order.id), 15, type_=Integer) % ROLLUP_SHARDS
+
+
+def _daily_deltas(condition: ColumnElement[bool], sign: int) -> Select:
+    order, item = models.Order, models.OrderItem
+    per_order = (
+        select(
+            order_day().label("day"),
+            order_shard().label("shard"),
+            order.total_amount,
+            func.coalesce(func.sum(item.quantity), 0).label("units"),
+        )
+        .outerjoin(item, item.order_id == order.id)
+        .where(condition, order.status.notin_(EXCLUDED_STATUSES))
+        .group_by(order.id)
+        .subquery()
+    )
+    return select(
+        per_order.c.day,
+        per_order.c.shard,
+        (sign * func.count()).label("orders"),
+        (sign * func.sum(per_order.c.units)).label("units"),
+        (sign * func.sum(per_order.c.total_amount)).label("revenue"),
+    ).group_by(per_order.c.day, per_order.c.shard)
+
+
+def _product_deltas(condition: ColumnElement[bool], sign: int) -> Select:
+    order, item, product = models.Order, models.OrderItem, models.Product
+    day, shard = order_day().label("day"), order_shard().label("shard")
+    return (
+        select(
+            day,
+            shard,
+            item.product_id,
+            product.category_id,
+            func.max(item.name).label("product_name"),
+            (sign * func.count(func.distinct(order.id))).label("orders"),
+            (sign * func.sum(item.quantity)).label("units"),
+            (sign * func.sum(item.quantity * item.price_snapshot)).label("revenue"),
+        )
+        .select_from(item)
+        .join(order, order.id == item.order_id)
+        .outerjoin(product, product.id == item.product_id)
+        .where(condition, order.status.notin_(EXCLUDED_STATUSES))
+        .group_by(day, shard, item.product_id, product.category_id)
+    )
+
+
+def _add_daily(deltas: Select) -> Insert:
+    daily = insert(models.SalesDaily).from_select(["day", "shard", "orders", "units", "revenue"], deltas)
+    return daily.on_conflict_do_update(
+        index_elements=["day", "shard"],
+        set_={
+            "orders": models.SalesDaily.orders + daily.excluded.orders,
+            "units": models.SalesDaily.units + daily.excluded.units,
+            "revenue": models.SalesDaily.revenue + daily.excluded.revenue,
+        },
+    )
+
+
+def _add_products(deltas: Select) -> Insert:
+    products = insert(models.SalesDailyProduct).from_select(
+        ["day", "shard", "product_id", "category_id", "product_name", "orders", "units", "revenue"], deltas
+    )
+    return products.on_conflict_do_update(
+        index_elements=["day", "product_id", "shard"],
+        set_={
+            # Категория — на момент первой продажи за день, чтобы вычитание попадало в ту же строку
+            "category_id": func.coalesce(models.SalesDailyProduct.category_id, products.excluded.category_id),
+            "orders": models.SalesDailyProduct.orders + products.excluded.orders,
+            "units": models.SalesDailyProduct.units + products.excluded.units,
+            "revenue": models.SalesDailyProduct.revenue + products.excluded.revenue,
+        },
+    )
+
+
+async def apply_orders(db: Executor, condition: ColumnElement[bool], sign: int) -> None:
+    """Прибавить (sign=1) или вычесть (sign=-1) учитываемые заказы, подходящие под condition"""
+    await db.execute(_add_daily(_daily_deltas(condition, sign)))
+    await db.execute(_add_products(_product_deltas(condition, sign)))
+
+
+def _correction(fresh: Select, current: Select, keys: tuple[str, ...], extra: tuple[str, ...] = ()) -> Select:
+    """Разница «пересчитано из заказов» минус «сейчас в агрегатах» по ключам keys"""
+    fresh_rows, current_rows = fresh.subquery("fresh"), current.subquery("current")
+    values = ("orders", "units", "revenue")
+    differences = [
+        (func.coalesce(fresh_rows.c[name], 0) - func.coalesce(current_rows.c[name], 0)).label(name) for name in values
+    ]
+    return (
+        select(
+            *(func.coalesce(fresh_rows.c[name], current_rows.c[name]).label(name) for name in (*keys, *extra)),
+            *differences,
+        )
+        .select_from(
+            fresh_rows.join(
+                current_rows,
+                and_(*(fresh_rows.c[name] == current_rows.c[name] for name in keys)),
+                full=True,
+            )
+        )
+        .where(or_(*(difference != 0 for difference in differences)))
+    )
+
+
+async def rebuild(conn: AsyncConnection, since: Optional[date] = None) -> None:
+    """Пересчитать агрегаты с даты since (все, если None) в текущей транзакции
+
+    Пересчёт собирается в промежуточной выборке и прибавляется к агрегатам как поправка
+    (пересчитано минус текущее) тем же upsert, что и дельты заказов. Оба чтения в одном
+    выражении видят один снимок, а заказы, закоммиченные позже, уже добавили свою дельту
+    к строкам, на которые ляжет поправка. Поэтому таблицы не блокируются: оформление заказа
+    ждёт только блокировку строк, которые пересчёт обновляет в самом конце.
+    """
+    daily, products = models.SalesDaily, models.SalesDailyProduct
+    orders_in_scope = true() if since is None else order_day() >= since
+    daily_in_scope = true() if since is None else daily.day >= since
+    products_in_scope = true() if since is None else products.day >= since
+
+    current_daily = select(daily.day, daily.shard, daily.orders, daily.units, daily.revenue).where(daily_in_scope)
+    await conn.execute(_add_daily(_correction(_daily_deltas(orders_in_scope, 1), current_daily, ("day", "shard"))))
+
+    current_products = select(
+        products.day,
+        products.shard,
+        products.product_id,
+        products.category_id,
+        products.product_name,
+        products.orders,
+        products.units,
+        products.revenue,
+    ).where(products_in_scope)
+    await conn.execute(
+        _add_products(
+            _correction(
+                _product_deltas(orders_in_scope, 1),
+                current_products,
+                ("day", "shard", "product_id"),
+                ("category_id", "product_name"),
+            )
+        )
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Пересчёт дневных агрегатов продаж")
+    parser.add_argument("--since", type=date.fromisoformat, help="Пересчитать начиная с даты (YYYY-MM-DD)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    async def main_rebuild() -> None:
+        from app.db.database import engine
+
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            # Пересчёт за всё время на больших объёмах дольше обычного statement_timeout
+            await conn.execute(text("SET LOCAL statement_timeout = 0"))
+            await rebuild(conn, args.since)
+        await engine.dispose()
+        print(f"Агрегаты продаж пересчитаны за {time.perf_counter() - started:.1f} с")
+
+    asyncio.run(main_rebuild())
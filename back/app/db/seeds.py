@@ -1,6 +1,8 @@
+import argparse
 import asyncio
 import os
 import uuid
+from dataclasses import fields
 from decimal import Decimal
 
 # Load environment variables
@@ -9,7 +11,13 @@ from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.auth import get_password_hash  # Assuming get_password_hash is in app.auth
+from app.db import invalidation_triggers
 from app.db.models import Base, Category, Order, OrderItem, Product, Profile
+from app.db.notification_partitions import ensure_partitions
+from app.db.product_attributes import refresh as refresh_product_attributes
+from app.db.sales_rollups import rebuild as rebuild_sales_rollups
+from app.db.synthetic_seeds import PRESETS, SyntheticVolumes, seed_synthetic_data, volumes_from_args
+from app.invalidation import publish_all
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
 
@@ -37,6 +45,10 @@ async def recreate_tables() -> None:
         await conn.execute(text("DROP TABLE IF EXISTS public.profiles CASCADE;"))
 
         await conn.run_sync(Base.metadata.create_all)
+        # create_all создаёт notifications без партиций
+        await ensure_partitions(conn)
+        # Триггеры шины инвалидации удалены вместе с таблицами
+        await invalidation_triggers.install(conn)
     print("Tables recreated successfully.")
 
 
@@ -270,14 +282,38 @@ async def seed_data() -> None:
         await session.commit()
         print(f"Created {number_of_orders} random orders.")
 
+    async with engine.begin() as conn:
+        await rebuild_sales_rollups(conn)
+        await refresh_product_attributes(conn)
+    print("Sales rollups and product attributes rebuilt.")
+
     print("Seeding complete.")
     await engine.dispose()
+    await publish_all()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Заполнение БД тестовыми данными")
+    parser.add_argument(
+        "--synthetic", action="store_true", help="Большой синтетический набор через COPY (app/db/synthetic_seeds.py)"
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="medium", help="Объёмы синтетических данных")
+    for field in fields(SyntheticVolumes):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, dest=field.name, help="Переопределить объём")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Строк в одной пачке COPY")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора случайных чисел")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
 
     async def main_seed() -> None:
         await recreate_tables()
         await seed_data()
 
-    asyncio.run(main_seed())
+    if args.synthetic:
+        volumes = volumes_from_args(args.preset, vars(args))
+        asyncio.run(seed_synthetic_data(DATABASE_URL, volumes, seed=args.seed, chunk_size=args.chunk_size))
+    else:
+        asyncio.run(main_seed())
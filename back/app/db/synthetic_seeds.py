@@ -0,0 +1,509 @@
+"""Генератор больших синтетических наборов данных для бенчмарков и подбора индексов
+
+Данные загружаются через COPY (asyncpg copy_records_to_table) пачками, поэтому миллионы строк
+укладываются в минуты. Распределения приближены к реальным: популярность товаров и активность
+покупателей подчиняются степенному закону, цены — логнормальному, заказы смещены к недавним датам.
+
+Запуск: python -m app.db.seeds --synthetic --preset large
+"""
+
+import json
+import random
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, fields, replace
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Optional
+
+from asyncpg import Connection as AsyncpgConnection
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.auth import get_password_hash
+from app.db.notification_partitions import ensure_partitions
+from app.db.product_attributes import refresh as refresh_product_attributes
+from app.db.sales_rollups import rebuild as rebuild_sales_rollups
+from app.invalidation import publish_all
+
+ADMIN_ID = uuid.UUID("28ad2b7d-02d6-4f84-b1c3-1ee26e6b4b58")
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "adminpassword"
+# Пароль всех синтетических пользователей; хэш bcrypt считается один раз
+USER_PASSWORD = "password123"
+
+CATEGORY_THEMES = [
+    ("Лопаты", "shovels"),
+    ("Семена", "seeds"),
+    ("Горшки и кашпо", "pots"),
+    ("Грабли", "rakes"),
+    ("Шланги и полив", "watering"),
+    ("Удобрения", "fertilizers"),
+    ("Секаторы", "pruners"),
+    ("Садовая мебель", "furniture"),
+    ("Теплицы", "greenhouses"),
+    ("Освещение", "lighting"),
+    ("Перчатки и одежда", "workwear"),
+    ("Газонокосилки", "mowers"),
+]
+MATERIALS = ["Сталь", "Пластик", "Керамика", "Дерево", "Алюминий", "Резина", "Текстиль"]
+COLORS = ["Зелёный", "Чёрный", "Терракотовый", "Белый", "Серый", "Красный", "Синий"]
+IMAGES = [
+    "/images/ceramic_pot.jpg",
+    "/images/fiskars_shovel.jpg",
+    "/images/folding_shovel.jpg",
+    "/images/hanging_pot.jpg",
+    "/images/peat_pots.jpg",
+    "/images/sunflower_seeds.jpg",
+    "/images/truper_drain.jpg",
+]
+ORDER_STATUSES = ["delivered", "shipped", "processing", "pending", "cancelled"]
+ORDER_STATUS_WEIGHTS = [60, 10, 8, 15, 7]
+NOTIFICATION_TYPES = ["order_created", "order_status_changed", "chat_message", "system"]
+# Верхняя граница длины одной переписки
+MAX_MESSAGES_PER_CHAT = 20_000
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск"]
+
+PRODUCT_COLUMNS = [
+    "id",
+    "slug",
+    "name",
+    "description",
+    "price",
+    "discount",
+    "characteristics",
+    "image_url",
+    "category_id",
+    "created_at",
+    "times_ordered",
+    "offline_purchases",
+]
+ORDER_COLUMNS = [
+    "id",
+    "user_id",
+    "total_amount",
+    "status",
+    "created_at",
+    "full_name",
+    "email",
+    "address",
+    "city",
+    "postal_code",
+    "phone",
+]
+ORDER_ITEM_COLUMNS = ["id", "order_id", "product_id", "quantity", "price_snapshot", "name", "image_url"]
+
+
+@dataclass(frozen=True)
+class SyntheticVolumes:
+    """Объёмы генерируемых данных"""
+
+    categories: int = 12
+    products: int = 10_000
+    users: int = 10_000
+    order_items: int = 100_000
+    chats: int = 1_000
+    chat_messages: int = 50_000
+    notifications: int = 100_000
+    cart_items: int = 20_000
+    favourites: int = 20_000
+
+
+PRESETS: dict[str, SyntheticVolumes] = {
+    "small": SyntheticVolumes(
+        products=1_000,
+        users=1_000,
+        order_items=10_000,
+        chats=100,
+        chat_messages=5_000,
+        notifications=10_000,
+        cart_items=2_000,
+        favourites=2_000,
+    ),
+    "medium": SyntheticVolumes(),
+    "large": SyntheticVolumes(
+        categories=40,
+        products=100_000,
+        users=1_000_000,
+        order_items=10_000_000,
+        chats=20_000,
+        chat_messages=2_000_000,
+        notifications=5_000_000,
+        cart_items=500_000,
+        favourites=1_000_000,
+    ),
+}
+
+# Порядок очистки: сначала зависимые таблицы
+TRUNCATE_TABLES = [
+    "chat_messages",
+    "chats",
+    "notifications",
+    "notifications_archive",
+    "order_items",
+    "orders",
+    "cart_items",
+    "favourites",
+    "products",
+    "categories",
+    "profiles",
+]
+
+
+def volumes_from_args(preset: str, overrides: dict[str, Optional[int]]) -> SyntheticVolumes:
+    """Объёмы пресета с переопределениями из командной строки"""
+    names = {field.name for field in fields(SyntheticVolumes)}
+    return replace(PRESETS[preset], **{k: v for k, v in overrides.items() if k in names and v is not None})
+
+
+def _power_law_cum_weights(n: int, exponent: float) -> list[float]:
+    """Кумулятивные веса Ципфа: элемент с рангом r выбирается пропорционально 1 / r^exponent"""
+    return list(accumulate(1.0 / (rank**exponent) for rank in range(1, n + 1)))
+
+
+def _recent_datetime(rng: random.Random, now: datetime, days: int = 730) -> datetime:
+    # Бета-распределение смещает даты к настоящему: недавних заказов больше, чем старых
+    return now - timedelta(days=days * rng.betavariate(1.0, 3.0), seconds=rng.randint(0, 86_399))
+
+
+def _chunks(records: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    chunk: list[tuple] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SyntheticSeeder:
+    """Генерирует записи и загружает их через COPY пачками по chunk_size строк"""
+
+    def __init__(self, conn: AsyncpgConnection, volumes: SyntheticVolumes, seed: int, chunk_size: int) -> None:
+        self.conn = conn
+        self.volumes = volumes
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.now = datetime.now(UTC)
+        self.category_ids: list[uuid.UUID] = []
+        self.product_ids: list[uuid.UUID] = []
+        self.product_prices: list[Decimal] = []
+        self.product_names: list[str] = []
+        self.product_images: list[str] = []
+        self.user_ids: list[uuid.UUID] = []
+        self.product_cum_weights: list[float] = []
+        self.user_cum_weights: list[float] = []
+
+    async def copy(self, table: str, columns: list[str], records: Iterable[tuple]) -> int:
+        start = time.perf_counter()
+        total = 0
+        for chunk in _chunks(records, self.chunk_size):
+            await self.conn.copy_records_to_table(table, records=chunk, columns=columns, schema_name="public")
+            total += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  {table}: {total:,} строк, {total / max(elapsed, 1e-9):,.0f} строк/с", end="\r", flush=True)
+        print(f"  {table}: {total:,} строк за {time.perf_counter() - start:.1f} с" + " " * 20)
+        return total
+
+    def pick_products(self, k: int) -> list[int]:
+        return self.rng.choices(range(len(self.product_ids)), cum_weights=self.product_cum_weights, k=k)
+
+    def pick_user(self) -> uuid.UUID:
+        return self.rng.choices(self.user_ids, cum_weights=self.user_cum_weights)[0]
+
+    async def seed_categories(self) -> None:
+        records = []
+        for i in range(self.volumes.categories):
+            name, slug = CATEGORY_THEMES[i % len(CATEGORY_THEMES)]
+            suffix = i // len(CATEGORY_THEMES)
+            if suffix:
+                name, slug = f"{name} {suffix + 1}", f"{slug}-{suffix + 1}"
+            category_id = uuid.uuid4()
+            self.category_ids.append(category_id)
+            records.append((category_id, slug, name, f"Категория «{name}»", IMAGES[i % len(IMAGES)]))
+        await self.copy("categories", ["id", "slug", "name", "description", "image_url"], records)
+
+    def _product_records(self) -> Iterator[tuple]:
+        rng = self.rng
+        # Размер категорий тоже неравномерный: несколько крупных и длинный хвост
+        category_weights = _power_law_cum_weights(len(self.category_ids), 0.8)
+        for i in range(self.volumes.products):
+            product_id = uuid.uuid4()
+            category_id = rng.choices(self.category_ids, cum_weights=category_weights)[0]
+            price = Decimal(str(round(min(rng.lognormvariate(6.7, 0.9), 99_999.0) + 10, 2)))
+            discount = Decimal(rng.choice([5, 10, 15, 20, 25, 30, 50])) if rng.random() < 0.2 else None
+            name = f"Товар {i + 1}"
+            image = IMAGES[i % len(IMAGES)]
+            characteristics = {
+                "material": rng.choice(MATERIALS),
+                "color": rng.choice(COLORS),
+                "weight": f"{round(rng.uniform(0.1, 15), 1)} кг",
+            }
+            self.product_ids.append(product_id)
+            self.product_prices.append(price)
+            self.product_names.append(name)
+            self.product_images.append(image)
+            yield (
+                product_id,
+                f"synthetic-product-{i + 1}",
+                name,
+                f"Описание товара {i + 1}",
+                price,
+                discount,
+                json.dumps(characteristics, ensure_ascii=False),
+                image,
+                category_id,
+                _recent_datetime(rng, self.now, days=1095),
+                0,
+                rng.randint(0, 20) if rng.random() < 0.1 else 0,
+            )
+
+    async def seed_products(self) -> None:
+        await self.copy("products", PRODUCT_COLUMNS, self._product_records())
+        # Порядок популярности не совпадает с порядком создания
+        popularity = list(range(len(self.product_ids)))
+        self.rng.shuffle(popularity)
+        self.product_ids = [self.product_ids[i] for i in popularity]
+        self.product_prices = [self.product_prices[i] for i in popularity]
+        self.product_names = [self.product_names[i] for i in popularity]
+        self.product_images = [self.product_images[i] for i in popularity]
+        self.product_cum_weights = _power_law_cum_weights(len(self.product_ids), 1.1)
+
+    def _user_records(self, hashed_password: str) -> Iterator[tuple]:
+        yield (ADMIN_ID, ADMIN_EMAIL, get_password_hash(ADMIN_PASSWORD), "John Doe", True)
+        self.user_ids.append(ADMIN_ID)
+        for i in range(self.volumes.users):
+            user_id = uuid.uuid4()
+            self.user_ids.append(user_id)
+            yield (user_id, f"user{i + 1}@synthetic.example", hashed_password, f"Покупатель {i + 1}", False)
+
+    async def seed_users(self) -> None:
+        hashed_password = get_password_hash(USER_PASSWORD)
+        await self.copy(
+            "profiles", ["id", "email", "hashed_password", "full_name", "is_admin"], self._user_records(hashed_password)
+        )
+        # Активность покупателей: небольшая доля делает большую часть заказов
+        self.user_cum_weights = _power_law_cum_weights(len(self.user_ids), 0.9)
+
+    def _order_record(self, order_id: uuid.UUID, total: Decimal, n: int) -> tuple:
+        rng = self.rng
+        return (
+            order_id,
+            self.pick_user(),
+            total,
+            rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+            _recent_datetime(rng, self.now),
+            f"Покупатель {n}",
+            f"order{n}@synthetic.example",
+            f"ул. Садовая, {n % 200 + 1}",
+            rng.choice(CITIES),
+            f"{100000 + n % 900000}",
+            f"+7900{n % 10_000_000:07d}",
+        )
+
+    async def seed_orders(self) -> None:
+        rng = self.rng
+        orders: list[tuple] = []
+        items: list[tuple] = []
+        order_total = item_total = 0
+        start = time.perf_counter()
+
+        while item_total + len(items) < self.volumes.order_items:
+            order_id = uuid.uuid4()
+            # Большинство заказов из 1–3 позиций, изредка до 15
+            n_items = min(1 + int(rng.expovariate(0.6)), 15)
+            total = Decimal("0.00")
+            for index in self.pick_products(n_items):
+                quantity = 1 + int(rng.expovariate(1.2))
+                price = self.product_prices[index]
+                total += price * quantity
+                items.append(
+                    (
+                        uuid.uuid4(),
+                        order_id,
+                        self.product_ids[index],
+                        quantity,
+                        price,
+                        self.product_names[index],
+                        self.product_images[index],
+                    )
+                )
+            orders.append(self._order_record(order_id, total, order_total + len(orders)))
+            if len(items) >= self.chunk_size:
+                # Сначала заказы, затем позиции — из-за внешнего ключа order_items.order_id
+                await self.conn.copy_records_to_table(
+                    "orders", records=orders, columns=ORDER_COLUMNS, schema_name="public"
+                )
+                await self.conn.copy_records_to_table(
+                    "order_items", records=items, columns=ORDER_ITEM_COLUMNS, schema_name="public"
+                )
+                order_total += len(orders)
+                item_total += len(items)
+                orders, items = [], []
+                rate = item_total / (time.perf_counter() - start)
+                print(
+                    f"  orders: {order_total:,}, order_items: {item_total:,}, {rate:,.0f} строк/с", end="\r", flush=True
+                )
+
+        if orders:
+            await self.conn.copy_records_to_table("orders", records=orders, columns=ORDER_COLUMNS, schema_name="public")
+            await self.conn.copy_records_to_table(
+                "order_items", records=items, columns=ORDER_ITEM_COLUMNS, schema_name="public"
+            )
+            order_total += len(orders)
+            item_total += len(items)
+        elapsed = time.perf_counter() - start
+        print(f"  orders: {order_total:,}, order_items: {item_total:,} за {elapsed:.1f} с" + " " * 20)
+
+    def _chat_records(self, chats: list[tuple[uuid.UUID, uuid.UUID, int]]) -> Iterator[tuple]:
+        rng = self.rng
+        for chat_id, user_id, n_messages in chats:
+            created_at = _recent_datetime(rng, self.now, days=365)
+            last_message_at = created_at + timedelta(minutes=n_messages * rng.uniform(1, 30))
+            unread = rng.randint(0, min(n_messages, 5)) if rng.random() < 0.3 else 0
+            yield (chat_id, user_id, rng.random() < 0.8, min(last_message_at, self.now), unread, created_at)
+
+    def _message_records(self, chats: list[tuple[uuid.UUID, uuid.UUID, int]]) -> Iterator[tuple]:
+        rng = self.rng
+        for chat_id, user_id, n_messages in chats:
+            moment = _recent_datetime(rng, self.now, days=365)
+            for i in range(n_messages):
+                from_admin = i % 2 == 1 and rng.random() < 0.9
+                moment = min(moment + timedelta(seconds=rng.randint(10, 3_600)), self.now)
+                yield (
+                    uuid.uuid4(),
+                    chat_id,
+                    ADMIN_ID if from_admin else user_id,
+                    f"Сообщение {i + 1} в чате",
+                    from_admin,
+                    i < n_messages - 3 or rng.random() < 0.5,
+                    moment,
+                )
+
+    async def seed_chats(self) -> None:
+        if not self.volumes.chats:
+            return
+        # Длина переписки — степенной закон: несколько чатов с тысячами сообщений, большинство короткие
+        weights = [self.rng.paretovariate(1.1) for _ in range(self.volumes.chats)]
+        scale = self.volumes.chat_messages / sum(weights)
+        chats = [
+            (uuid.uuid4(), self.pick_user(), min(max(1, round(weight * scale)), MAX_MESSAGES_PER_CHAT))
+            for weight in weights
+        ]
+        await self.copy(
+            "chats",
+            ["id", "user_id", "is_active", "last_message_at", "unread_count", "created_at"],
+            self._chat_records(chats),
+        )
+        await self.copy(
+            "chat_messages",
+            ["id", "chat_id", "sender_id", "message", "is_from_admin", "is_read", "created_at"],
+            self._message_records(chats),
+        )
+
+    def _notification_records(self) -> Iterator[tuple]:
+        rng = self.rng
+        for i in range(self.volumes.notifications):
+            notification_type = rng.choice(NOTIFICATION_TYPES)
+            created_at = _recent_datetime(rng, self.now, days=365)
+            # Старые уведомления почти всегда прочитаны
+            is_read = (self.now - created_at).days > 7 or rng.random() < 0.5
+            yield (
+                uuid.uuid4(),
+                self.pick_user(),
+                f"Уведомление {i + 1}",
+                f"Текст уведомления типа {notification_type}",
+                notification_type,
+                is_read,
+                created_at,
+                json.dumps({"source": "synthetic"}),
+            )
+
+    def _user_product_pairs(self, total: int) -> Iterator[tuple[uuid.UUID, int]]:
+        """Пары (пользователь, индекс товара) без повторов внутри пользователя"""
+        produced = 0
+        while produced < total:
+            user_id = self.pick_user()
+            indexes = set(self.pick_products(min(1 + int(self.rng.expovariate(0.4)), total - produced)))
+            for index in indexes:
+                yield user_id, index
+            produced += len(indexes)
+
+    async def seed_notifications_and_carts(self) -> None:
+        await self.copy(
+            "notifications",
+            ["id", "user_id", "title", "message", "type", "is_read", "created_at", "notification_data"],
+            self._notification_records(),
+        )
+        await self.copy(
+            "cart_items",
+            ["id", "user_id", "product_id", "quantity", "price_snapshot"],
+            (
+                (uuid.uuid4(), user_id, self.product_ids[index], self.rng.randint(1, 4), self.product_prices[index])
+                for user_id, index in self._user_product_pairs(self.volumes.cart_items)
+            ),
+        )
+        await self.copy(
+            "favourites",
+            ["id", "user_id", "product_id"],
+            (
+                (uuid.uuid4(), user_id, self.product_ids[index])
+                for user_id, index in self._user_product_pairs(self.volumes.favourites)
+            ),
+        )
+
+
+def _create_seed_engine(database_url: str) -> AsyncEngine:
+    # Без statement_timeout: агрегирующие UPDATE и ANALYZE на миллионах строк идут дольше 15 с
+    return create_async_engine(database_url, pool_size=1, connect_args={"server_settings": {"statement_timeout": "0"}})
+
+
+async def seed_synthetic_data(
+    database_url: str, volumes: SyntheticVolumes, seed: int = 42, chunk_size: int = 50_000
+) -> None:
+    """Очистить таблицы и заполнить их синтетическими данными заданного объёма"""
+    print(f"Synthetic seeding: {volumes}")
+    engine = _create_seed_engine(database_url)
+    started = time.perf_counter()
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"TRUNCATE {', '.join(f'public.{t}' for t in TRUNCATE_TABLES)} CASCADE"))
+            # Уведомления генерируются за последний год: партиции на каждый месяц этого периода
+            await ensure_partitions(conn, months_back=13)
+            await conn.commit()
+
+            raw = await conn.get_raw_connection()
+            seeder = SyntheticSeeder(raw.driver_connection, volumes, seed, chunk_size)
+            await seeder.seed_categories()
+            await seeder.seed_products()
+            await seeder.seed_users()
+            await seeder.seed_orders()
+            await seeder.seed_chats()
+            await seeder.seed_notifications_and_carts()
+
+            print("  Пересчёт products.times_ordered ...")
+            await conn.execute(
+                text(
+                    "UPDATE public.products p SET times_ordered = s.total "
+                    "FROM (SELECT product_id, SUM(quantity) AS total FROM public.order_items GROUP BY product_id) s "
+                    "WHERE p.id = s.product_id"
+                )
+            )
+            await conn.commit()
+            print("  Пересчёт агрегатов продаж ...")
+            await rebuild_sales_rollups(conn)
+            await conn.commit()
+            print("  Пересчёт справочника характеристик ...")
+            await refresh_product_attributes(conn)
+            await conn.commit()
+            print("  ANALYZE ...")
+            await conn.execute(text("ANALYZE"))
+            await conn.commit()
+    finally:
+        await engine.dispose()
+    await publish_all()
+    print(f"Synthetic seeding complete in {time.perf_counter() - started:.1f} s")
+    print(f"Admin: {ADMIN_EMAIL} / {ADMIN_PASSWORD}, users: user<N>@synthetic.example / {USER_PASSWORD}")
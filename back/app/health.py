@@ -0,0 +1,107 @@
+"""Проверки liveness/readiness с кешированным состоянием зависимостей"""
+
+import asyncio
+import logging
+import os
+from collections.abc import Awaitable
+from datetime import UTC, datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.db.database import engine, read_engine, replica_status
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+
+
+class HealthMonitor:
+    """Фоновая задача, периодически проверяющая Postgres и Redis через общие пулы.
+
+    Эндпоинты /readyz и /health только читают закешированный результат, поэтому
+    частые пробы Kubernetes/Docker не создают нагрузки на зависимости.
+    """
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self.status: dict[str, str] = {"database": "unknown", "redis": "unknown"}
+        if read_engine is not None:
+            self.status["replica"] = "unknown"
+        self.checked_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        # Реплика необязательна: без неё чтение уходит на основную БД
+        return self.status["database"] == "OK" and self.status["redis"] == "OK"
+
+    async def _check_database(self) -> str:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return "OK"
+
+    async def _check_replica(self) -> str:
+        assert read_engine is not None
+        async with read_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return "OK"
+
+    async def _check_redis(self) -> str:
+        await async_redis_client.ping()
+        return "OK"
+
+    async def _run_check(self, name: str, check: Awaitable[str]) -> None:
+        try:
+            self.status[name] = await asyncio.wait_for(check, timeout=self.timeout)
+        except TimeoutError:
+            self.status[name] = "Timeout"
+        except Exception as e:
+            self.status[name] = f"Error: {e}"
+
+    async def check_once(self) -> None:
+        was_ready = self.ready
+        checks = [
+            self._run_check("database", self._check_database()),
+            self._run_check("redis", self._check_redis()),
+        ]
+        if read_engine is not None:
+            checks.append(self._run_check("replica", self._check_replica()))
+        await asyncio.gather(*checks)
+        if read_engine is not None:
+            if self.status["replica"] == "OK":
+                replica_status.mark_available()
+            else:
+                replica_status.mark_unavailable(self.status["replica"])
+        self.checked_at = datetime.now(UTC)
+        if self.ready != was_ready or not self.ready:
+            log = logger.info if self.ready else logger.warning
+            log(f"Состояние зависимостей: {self.status}")
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check_once()
+
+    async def start(self) -> None:
+        """Выполнить первую проверку и запустить периодические"""
+        await self.check_once()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict[str, Optional[str]]:
+        return {**self.status, "checkedAt": self.checked_at.isoformat() if self.checked_at else None}
+
+
+health_monitor = HealthMonitor()
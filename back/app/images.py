@@ -0,0 +1,180 @@
+"""Хранилище изображений товаров и категорий с миниатюрами WebP
+
+Оригиналы хранятся на локальном диске по SHA-256 содержимого (повторная загрузка того же
+файла ничего не пишет), миниатюры — рядом, по одной на каждую ширину из THUMBNAIL_WIDTHS:
+
+    {UPLOAD_DIR}/originals/ab/<sha256>.jpg   -> /api/images/<sha256>.jpg
+    {UPLOAD_DIR}/thumbnails/ab/<sha256>-320.webp -> /api/images/<sha256>-320.webp
+
+Имя файла однозначно определяет содержимое, поэтому файлы отдаются с immutable-кэшированием.
+Миниатюры шире оригинала не создаются. Декодирование и сжатие — CPU-работа на сотни
+миллисекунд, поэтому она идёт в пуле процессов, а не в event loop и не в потоках под GIL.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.metrics import IMAGE_THUMBNAIL_DURATION
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_WIDTHS = tuple(sorted(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "160,320,640").split(",") if w.strip()))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Защита от «бомб»: картинка 10 КБ, распаковывающаяся в гигабайты
+IMAGE_MAX_PIXELS = 50_000_000
+
+IMAGES_URL_PREFIX = "/api/images"
+
+# Сигнатура файла -> расширение; Content-Type от клиента не проверяется
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+
+def detect_extension(data: bytes) -> Optional[str]:
+    for signature, extension in _SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def original_path(digest: str, extension: str) -> str:
+    return os.path.join(UPLOAD_DIR, "originals", digest[:2], f"{digest}.{extension}")
+
+
+def thumbnail_path(digest: str, width: int) -> str:
+    return os.path.join(UPLOAD_DIR, "thumbnails", digest[:2], f"{digest}-{width}.webp")
+
+
+def _write_atomic(path: str, write: Callable[[str], None], exclusive: bool = False) -> bool:
+    """Записать файл через временный; exclusive — не заменять существующий. True, если файл записан"""
+    # Параллельная загрузка того же файла или чтение на полпути не должны увидеть обрезанный файл
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        if not exclusive:
+            os.replace(tmp_path, path)
+            return True
+        # link не заменяет существующий файл: из параллельных загрузок создателем окажется одна
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def store_original(data: bytes, extension: str) -> tuple[str, bool]:
+    """Сохранить оригинал, если его ещё нет; вернуть SHA-256 и признак, что файл создан этим вызовом"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = original_path(digest, extension)
+    if os.path.exists(path):
+        return digest, False
+    return digest, _write_atomic(path, lambda tmp_path: Path(tmp_path).write_bytes(data), exclusive=True)
+
+
+def discard_original(digest: str, extension: str) -> None:
+    """Удалить оригинал, созданный загрузкой, которая не удалась
+
+    Оригиналы общие для всех загрузок того же содержимого, поэтому удалять можно только файл,
+    который store_original создал в этой же загрузке.
+    """
+    try:
+        os.unlink(original_path(digest, extension))
+    except FileNotFoundError:
+        pass
+
+
+def render_thumbnails(source: str, digest: str, widths: tuple[int, ...], quality: int) -> list[int]:
+    """Создать недостающие миниатюры (выполняется в процессе пула); вернуть доступные ширины
+
+    Файл, который не удалось декодировать, даёт ValueError; ошибки чтения и записи диска — OSError.
+    """
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    with open(source, "rb") as source_file:
+        try:
+            with Image.open(source_file) as image_file:
+                image = ImageOps.exif_transpose(image_file)
+                image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        except (Image.DecompressionBombError, UnidentifiedImageError) as e:
+            raise ValueError(str(e)) from e
+        except OSError as e:
+            # Pillow сообщает об обрезанных и повреждённых данных через OSError
+            raise ValueError(f"повреждённые данные изображения: {e}") from e
+    # Ширина не больше оригинала; совсем маленький оригинал даёт одну миниатюру своей ширины
+    available = [width for width in widths if width < image.width] or [min(min(widths), image.width)]
+    for width in available:
+        path = thumbnail_path(digest, width)
+        if os.path.exists(path):
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        _write_atomic(path, lambda tmp_path, thumb=resized: thumb.save(tmp_path, "WEBP", quality=quality, method=4))
+    return available
+
+
+class ImageProcessor:
+    """Пул процессов для миниатюр; создаётся при первой загрузке и закрывается в lifespan"""
+
+    def __init__(self, workers: int = IMAGE_WORKERS) -> None:
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def thumbnails(self, digest: str, extension: str) -> list[int]:
+        if self._pool is None:
+            # spawn, а не fork: копия воркера с потоками и открытыми соединениями процессу пула не нужна
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        started = time.perf_counter()
+        try:
+            widths = await asyncio.get_running_loop().run_in_executor(
+                self._pool,
+                render_thumbnails,
+                original_path(digest, extension),
+                digest,
+                THUMBNAIL_WIDTHS,
+                THUMBNAIL_QUALITY,
+            )
+        except BrokenProcessPool:
+            # Процесс пула умер (OOM killer, падение декодера): сломанный пул больше не принимает
+            # задачи, поэтому он закрывается и создаётся заново при следующей загрузке
+            logger.error("❌ Пул обработки изображений сломан, будет пересоздан")
+            self.stop()
+            raise
+        IMAGE_THUMBNAIL_DURATION.observe(time.perf_counter() - started)
+        return widths
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_processor = ImageProcessor()
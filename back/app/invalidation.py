@@ -0,0 +1,285 @@
+"""Шина инвалидации кэшей в памяти процесса между воркерами
+
+Событие — изменение сущности (product, category, profile): id записи и действие
+(upsert/delete); id=None означает «изменилось всё» (массовая загрузка, TRUNCATE,
+переподключение слушателя). Модули с кэшами подписываются на сущности:
+
+    subscribe("product", on_product_changed)
+
+Кэшу, который дорого обновлять на каждое событие, подходит subscribe_batch: обработчик получает
+все события пачки сразу и пересобирает кэш один раз.
+
+Обработчик, изменивший товар или категорию, после COMMIT вызывает apply_local: подписчики
+этого воркера получают событие сразу, вместе со свежей ORM-записью (без повторного чтения
+из БД), а остальные воркеры — через бэкенд. Событие несёт origin — application_name
+соединения (app/db/database.py), поэтому эхо собственной записи воркер пропускает
+и изменение применяется один раз.
+
+Бэкенд задаётся INVALIDATION_BACKEND:
+
+- postgres (по умолчанию) — события отправляют триггеры таблиц через pg_notify
+  (app/db/invalidation_triggers.py), поэтому их видят и изменения в обход приложения: seeds,
+  add_admin.py, ручной SQL. Уведомление доставляется только после COMMIT.
+- redis — события публикуют сами обработчики через apply_local()/publish() в канал Redis Pub/Sub.
+  В этом режиме изменения в обход приложения до воркеров не доходят (кроме скриптов,
+  которые вызывают publish сами) и подхватываются периодической перезагрузкой кэшей.
+
+Слушатель держит отдельное соединение (не из пула) и кладёт события в очередь; обработчики
+вызываются по очереди из одной задачи, повторы одного события в пачке схлопываются. После
+потери соединения события могли пропасть, поэтому после переподключения все подписчики
+получают событие id=None.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+import asyncpg
+from redis.exceptions import RedisError
+
+from app.db import models
+from app.db.database import DATABASE_URL, application_name
+from app.metrics import CACHE_INVALIDATIONS
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_BACKEND = os.getenv("INVALIDATION_BACKEND", "postgres").lower()
+INVALIDATION_CHANNEL = "cache_invalidation"
+# Пауза перед повторным подключением слушателя и период проверки соединения
+INVALIDATION_RECONNECT_DELAY = float(os.getenv("INVALIDATION_RECONNECT_DELAY", "2"))
+INVALIDATION_PING_INTERVAL = 10.0
+
+ENTITIES = ("product", "category", "profile")
+ACTIONS = ("upsert", "delete")
+# origin событий от записей этого процесса (основной движок БД)
+LOCAL_ORIGIN = application_name("primary")
+# Сущности, которые процесс меняет только в обработчиках с apply_local: эхо их записей
+# пропускается. Профили меняются и в других местах, их эхо обрабатывается как обычно
+LOCAL_ENTITIES = ("product", "category")
+
+
+@dataclass(frozen=True, slots=True)
+class InvalidationEvent:
+    entity: str
+    id: Optional[uuid.UUID]
+    action: str = "upsert"
+    # Кто изменил запись; не участвует в сравнении, чтобы повторы схлопывались
+    origin: Optional[str] = field(default=None, compare=False)
+    # Свежая ORM-запись — только у событий apply_local, по шине не передаётся
+    obj: Optional[Union[models.Product, models.Category]] = field(default=None, compare=False, repr=False)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "entity": self.entity,
+                "id": str(self.id) if self.id else None,
+                "action": self.action,
+                "origin": self.origin,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, payload: str) -> Optional["InvalidationEvent"]:
+        try:
+            data = json.loads(payload)
+            entity, action = data["entity"], data.get("action", "upsert")
+            entity_id = uuid.UUID(data["id"]) if data.get("id") else None
+            origin = str(data["origin"]) if data.get("origin") else None
+        except (ValueError, TypeError, KeyError):
+            return None
+        if entity not in ENTITIES or action not in ACTIONS:
+            return None
+        return cls(entity, entity_id, action, origin)
+
+
+Handler = Callable[[InvalidationEvent], Awaitable[None]]
+BatchHandler = Callable[[list[InvalidationEvent]], Awaitable[None]]
+
+_HANDLERS: dict[str, list[Handler]] = {}
+_BATCH_HANDLERS: list[tuple[frozenset[str], BatchHandler]] = []
+
+
+def subscribe(entity: str, handler: Handler) -> None:
+    """Вызывать handler на каждое событие сущности entity в этом процессе"""
+    if entity not in ENTITIES:
+        raise ValueError(f"Неизвестная сущность инвалидации: {entity}")
+    _HANDLERS.setdefault(entity, []).append(handler)
+
+
+def subscribe_batch(entities: Iterable[str], handler: BatchHandler) -> None:
+    """Вызывать handler один раз на пачку событий сущностей entities (повторы уже схлопнуты)"""
+    entities = frozenset(entities)
+    if not entities <= set(ENTITIES):
+        raise ValueError(f"Неизвестные сущности инвалидации: {sorted(entities - set(ENTITIES))}")
+    _BATCH_HANDLERS.append((entities, handler))
+
+
+async def publish(entity: str, entity_id: Optional[uuid.UUID] = None, action: str = "upsert") -> None:
+    """Сообщить воркерам об изменении после COMMIT.
+
+    В режиме postgres ничего не делает: то же событие уже отправил триггер таблицы.
+    Ошибка Redis не роняет запрос — кэши догонят данные при периодической перезагрузке.
+    """
+    await _publish(InvalidationEvent(entity, entity_id, action))
+
+
+async def _publish(event: InvalidationEvent) -> None:
+    if INVALIDATION_BACKEND != "redis":
+        return
+    try:
+        await async_redis_client.publish(INVALIDATION_CHANNEL, event.to_json())
+    except RedisError as e:
+        logger.warning(f"⚠️ Не удалось опубликовать инвалидацию {event}: {e}")
+
+
+async def apply_local(
+    entity: str,
+    entity_id: uuid.UUID,
+    action: str = "upsert",
+    obj: Optional[Union[models.Product, models.Category]] = None,
+) -> None:
+    """Применить изменение записи к кэшам этого воркера и сообщить остальным (после COMMIT).
+
+    obj — запись в том виде, в каком её отдаёт обработчик (товар с загруженной категорией):
+    подписчики берут её вместо повторного чтения из БД. Эхо этого события от триггера
+    или из Redis воркер пропускает по origin.
+    """
+    event = InvalidationEvent(entity, entity_id, action, LOCAL_ORIGIN, obj)
+    await invalidation_listener.handle([event])
+    await _publish(event)
+
+
+async def publish_all() -> None:
+    """Сообщить, что изменились все сущности (загрузка данных скриптами)"""
+    for entity in ENTITIES:
+        await publish(entity)
+
+
+def _asyncpg_dsn(url: str) -> str:
+    # asyncpg не понимает диалект SQLAlchemy в схеме URL
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class InvalidationListener:
+    """Фоновый слушатель событий инвалидации для текущего воркера"""
+
+    def __init__(self, backend: str = INVALIDATION_BACKEND) -> None:
+        self.backend = backend
+        self._queue: asyncio.Queue[InvalidationEvent] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._connected_once = False
+
+    def _on_payload(self, payload: str) -> None:
+        event = InvalidationEvent.from_json(payload)
+        if event is None:
+            logger.warning(f"⚠️ Некорректное событие инвалидации: {payload!r}")
+            return
+        if event.origin == LOCAL_ORIGIN and event.id is not None and event.entity in LOCAL_ENTITIES:
+            # Запись этого же процесса уже применена через apply_local. События «всё»
+            # не пропускаются — их дают массовые изменения без apply_local
+            return
+        self._queue.put_nowait(event)
+
+    def _resync(self) -> None:
+        # При первом подключении кэши и так загружаются с нуля
+        if not self._connected_once:
+            self._connected_once = True
+            return
+        for entity in ENTITIES:
+            self._queue.put_nowait(InvalidationEvent(entity, None))
+
+    async def _listen_postgres(self) -> None:
+        conn = await asyncpg.connect(_asyncpg_dsn(DATABASE_URL))
+        try:
+            await conn.add_listener(
+                INVALIDATION_CHANNEL, lambda _conn, _pid, _channel, payload: self._on_payload(payload)
+            )
+            logger.info("📡 Слушатель инвалидации подключён к Postgres")
+            self._resync()
+            while True:
+                await asyncio.sleep(INVALIDATION_PING_INTERVAL)
+                # Без запроса обрыв соединения не заметить: asyncpg не читает сокет вхолостую
+                await conn.execute("SELECT 1")
+        finally:
+            await conn.close()
+
+    async def _listen_redis(self) -> None:
+        pubsub = async_redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            logger.info("📡 Слушатель инвалидации подписан на канал Redis")
+            self._resync()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=INVALIDATION_PING_INTERVAL)
+                if message is None:
+                    await pubsub.ping()
+                elif message["type"] == "message":
+                    data = message["data"]
+                    self._on_payload(data.decode() if isinstance(data, bytes) else data)
+        finally:
+            await pubsub.aclose()
+
+    async def _listen(self) -> None:
+        listen = self._listen_redis if self.backend == "redis" else self._listen_postgres
+        while True:
+            try:
+                await listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Слушатель инвалидации отключился: {e}")
+            await asyncio.sleep(INVALIDATION_RECONNECT_DELAY)
+
+    async def _dispatch(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Событие «всё» поглощает события отдельных записей той же сущности
+            full = {event.entity for event in batch if event.id is None}
+            events = dict.fromkeys(
+                InvalidationEvent(event.entity, None) if event.id is None else event
+                for event in batch
+                if event.id is None or event.entity not in full
+            )
+            await self.handle(list(events))
+
+    async def handle(self, events: list[InvalidationEvent]) -> None:
+        """Вызвать подписчиков на пачку событий без повторов"""
+        for event in events:
+            CACHE_INVALIDATIONS.labels(event.entity, "all" if event.id is None else event.action).inc()
+            for handler in _HANDLERS.get(event.entity, ()):
+                try:
+                    await handler(event)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработки инвалидации {event}: {e}")
+        for entities, batch_handler in _BATCH_HANDLERS:
+            selected = [event for event in events if event.entity in entities]
+            if not selected:
+                continue
+            try:
+                await batch_handler(selected)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки пачки инвалидации ({len(selected)} событий): {e}")
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._dispatch())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+invalidation_listener = InvalidationListener()
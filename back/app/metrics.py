@@ -0,0 +1,175 @@
+"""Метрики Prometheus (prometheus_client): HTTP, пул БД, Redis, WebSocket и уведомления
+
+Метрики отдаёт эндпоинт /metrics. Доступ к нему: с METRICS_TOKEN — только с заголовком
+Authorization: Bearer <токен>, без него — только с адресов из METRICS_ALLOWED_NETWORKS
+(по умолчанию loopback и частные сети, где работает Prometheus).
+
+С несколькими воркерами (uvicorn --workers, gunicorn) задайте PROMETHEUS_MULTIPROC_DIR —
+общий каталог, очищаемый перед запуском: процессы пишут значения в mmap-файлы, и /metrics
+любого воркера отдаёт сумму по всем (гауги — по живым процессам). Без переменной метрики
+живут в памяти процесса.
+"""
+
+import ipaddress
+import os
+import secrets
+import time
+from typing import Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv(
+        "METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if network.strip()
+]
+
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def render_metrics() -> bytes:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """Убрать гауги завершающегося процесса из суммы по воркерам"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_access_allowed(client_ip: str, authorization: Optional[str]) -> bool:
+    if METRICS_TOKEN:
+        return secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+    try:
+        address = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return False
+    return any(address in network for network in METRICS_ALLOWED_NETWORKS)
+
+
+# region HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ("method",), multiprocess_mode="livesum"
+)
+# endregion
+
+# region Database
+DB_POOL_SIZE = Gauge("db_pool_size", "Размер пула соединений SQLAlchemy", ("engine",), multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Соединения, выданные из пула", ("engine",), multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Соединения сверх pool_size (overflow)", ("engine",), multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds", "Время получения соединения из пула", ("engine",), buckets=FAST_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Таймауты ожидания соединения из пула", ("engine",))
+# endregion
+
+# region Redis
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds", "Время выполнения команды Redis", ("command",), buckets=FAST_BUCKETS
+)
+REDIS_COMMAND_ERRORS = Counter("redis_command_errors_total", "Ошибки команд Redis", ("command",))
+# endregion
+
+# region WebSocket / уведомления
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections", "Активные WebSocket-подключения", ("kind",), multiprocess_mode="livesum"
+)
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    "notification_queue_depth", "Уведомления, ожидающие доставки", multiprocess_mode="livesum"
+)
+UNREAD_COUNTER_CORRECTIONS = Counter(
+    "unread_counter_corrections_total", "Счётчики непрочитанного, исправленные сверкой с БД", ("kind",)
+)
+NOTIFICATIONS_COALESCED = Counter(
+    "notifications_coalesced_total", "Уведомления админам, вошедшие в сводку вместо отдельной рассылки", ("type",)
+)
+# endregion
+
+# region Корзины
+CART_STORE_FLUSHES = Counter(
+    "cart_store_flushes_total", "Корзины, записанные из Redis в cart_items (result: ok/error)", ("result",)
+)
+# endregion
+
+# region Пользователи
+USERS_PURGED = Counter("users_purged_total", "Пользователи, удалённые фоновой очисткой")
+# endregion
+
+# region Кэш
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кэшам в памяти процесса (hit, miss, wait)", ("cache", "result")
+)
+CATALOG_SNAPSHOT_REQUESTS = Counter(
+    "catalog_snapshot_requests_total", "Запросы каталога: из снимка в памяти или из БД", ("endpoint", "source")
+)
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_total", "Полученные события инвалидации (upsert, delete, all)", ("entity", "action")
+)
+# endregion
+
+# region Изображения
+IMAGE_THUMBNAIL_DURATION = Histogram(
+    "image_thumbnail_seconds", "Время создания миниатюр одного изображения в пуле процессов"
+)
+# endregion
+
+# region Rate limiting
+RATE_LIMITED_REQUESTS = Counter(
+    "rate_limited_requests_total", "Запросы, отклонённые ограничением частоты", ("policy", "scope")
+)
+# endregion
+
+
+class MetricsMiddleware:
+    """ASGI middleware: гистограмма длительности запросов по шаблону маршрута"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code: Optional[int] = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with HTTP_REQUESTS_IN_PROGRESS.labels(method).track_inprogress():
+                await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method, route.path if route is not None else "unmatched", str(status_code or 500)
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,76 @@
+"""Фоновое обслуживание notifications: партиции наперёд, архивация, удаление старых партиций"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from app.db.database import engine
+from app.db.notification_partitions import archive_batch, drop_expired_partitions, ensure_partitions
+from app.redis_client import async_redis_client
+from app.unread import add_unread_notifications
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_MAINTENANCE_INTERVAL = float(os.getenv("NOTIFICATION_MAINTENANCE_INTERVAL", "3600"))
+MAINTENANCE_LOCK_KEY = "notifications:maintenance:lock"
+
+
+class NotificationMaintenance:
+    """Периодическое обслуживание таблицы уведомлений (один воркер за интервал)"""
+
+    def __init__(self, interval: float = NOTIFICATION_MAINTENANCE_INTERVAL) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _archive(self) -> int:
+        total = 0
+        while True:
+            # Каждая порция — отдельная короткая транзакция
+            async with engine.begin() as conn:
+                moved, unread = await archive_batch(conn)
+            for user_id, count in unread.items():
+                await add_unread_notifications(user_id, -count)
+            total += moved
+            if not moved:
+                return total
+
+    async def run_once(self) -> None:
+        if not await async_redis_client.set(MAINTENANCE_LOCK_KEY, 1, ex=max(int(self.interval), 1), nx=True):
+            return
+        async with engine.begin() as conn:
+            created = await ensure_partitions(conn)
+        if created:
+            logger.info(f"🗂️  Созданы партиции уведомлений: {', '.join(created)}")
+
+        archived = await self._archive()
+        if archived:
+            logger.info(f"🗄️  В архив перенесено уведомлений: {archived}")
+
+        async with engine.begin() as conn:
+            dropped = await drop_expired_partitions(conn)
+        if dropped:
+            logger.info(f"🗑️  Удалены пустые партиции уведомлений: {', '.join(dropped)}")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка обслуживания таблицы уведомлений: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+notification_maintenance = NotificationMaintenance()
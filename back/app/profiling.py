@@ -0,0 +1,191 @@
+"""Профилирование отдельного запроса по флагу администратора
+
+Запрос профилируется, если он пришёл с заголовком `X-Profile: 1` (или параметром `?_profile=1`)
+и токеном администратора. Ответ получает заголовки с именем артефакта и разбивкой времени
+(SQL, Pydantic, SQLAlchemy ORM), сам .pstats сохраняется в PROFILE_DIR и доступен через
+/api/admin/profiles.
+
+cProfile профилирует весь поток event loop, поэтому в артефакт попадают и конкурентные запросы
+этого воркера; одновременно профилируется не больше одного запроса.
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import decode_token, get_token_from_request, is_token_revoked
+from app.db.query_budget import current_stats, track_queries
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("logs", "profiles"))
+# Сколько последних артефактов хранить на диске
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_FLAG = b"_profile=1"
+
+_UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9_-]+")
+# Слои для разбивки времени: слой -> подстроки пути файла или имени функции в pstats
+_LAYERS = {
+    "pydantic": ("pydantic",),
+    "orm": ("sqlalchemy",),
+}
+
+
+def _profile_requested(scope: Scope) -> bool:
+    if PROFILE_QUERY_FLAG in scope.get("query_string", b""):
+        return True
+    return any(name == PROFILE_HEADER and value not in (b"", b"0") for name, value in scope["headers"])
+
+
+def _is_admin_request(scope: Scope) -> bool:
+    """Токен из cookie/Authorization — те же правила, что у get_current_user, включая отзыв"""
+    token = get_token_from_request(Request(scope))
+    if not token:
+        return False
+    try:
+        payload = decode_token(token)
+    except HTTPException:
+        return False
+    return bool(payload.get("is_admin")) and not is_token_revoked(token)
+
+
+def layer_timings(stats: pstats.Stats) -> dict[str, float]:
+    """Собственное время функций (tottime) по слоям: pydantic и SQLAlchemy ORM, секунды"""
+    totals = dict.fromkeys(_LAYERS, 0.0)
+    for (filename, _, funcname), (_, _, tottime, _, _) in stats.stats.items():
+        location = f"{filename}:{funcname}"
+        for layer, markers in _LAYERS.items():
+            if any(marker in location for marker in markers):
+                totals[layer] += tottime
+                break
+    return totals
+
+
+def _artifact_name(scope: Scope, duration: float) -> str:
+    path = _UNSAFE_CHARS_RE.sub("_", scope["path"]).strip("_") or "root"
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return f"{timestamp}_{scope['method']}_{path[:80]}_{duration * 1000:.0f}ms.pstats"
+
+
+def save_profile(profiler: cProfile.Profile, name: str) -> str:
+    """Сохранить .pstats и текстовую сводку рядом; старые артефакты удаляются"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(60)
+    with open(path.removesuffix(".pstats") + ".txt", "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+
+    artifacts = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".pstats"))
+    for old in artifacts[: max(len(artifacts) - PROFILE_MAX_FILES, 0)]:
+        for suffix in (".pstats", ".txt"):
+            old_path = os.path.join(PROFILE_DIR, old.removesuffix(".pstats") + suffix)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+    return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: профилирует запрос администратора с флагом X-Profile"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        # Cookie и токен разбираются, только если профилирование запрошено
+        if not _profile_requested(scope) or not _is_admin_request(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._lock.locked():
+            # Профилировщик на поток один — второй запрос выполняется без него
+            await self.app(scope, receive, self._with_headers(send, {"X-Profile-Status": "busy"}))
+            return
+
+        async with self._lock:
+            await self._profile(scope, receive, send)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stats = current_stats()
+        profiler = cProfile.Profile()
+        start_message: Optional[Message] = None
+        buffered: list[Message] = []
+
+        async def buffered_send(message: Message) -> None:
+            # Ответ придерживается до конца профилирования, чтобы добавить заголовки с итогами
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+            else:
+                buffered.append(message)
+
+        start = time.perf_counter()
+        # Если QueryBudgetMiddleware выключен, SQL-запросы считаются здесь
+        with track_queries() if stats is None else nullcontext(stats) as query_stats:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, buffered_send)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        name = _artifact_name(scope, duration)
+        try:
+            await asyncio.to_thread(save_profile, profiler, name)
+        except OSError as e:
+            logger.error(f"❌ Не удалось сохранить профиль {name}: {e}")
+            name = ""
+        layers = layer_timings(pstats.Stats(profiler))
+        logger.info(
+            f"🔬 Профиль {scope['method']} {scope['path']}: {duration * 1000:.1f} ms, "
+            f"SQL {query_stats.total_time * 1000:.1f} ms ({query_stats.count}), "
+            f"pydantic {layers['pydantic'] * 1000:.1f} ms, ORM {layers['orm'] * 1000:.1f} ms → {name}"
+        )
+
+        if start_message is None:
+            return
+        headers = MutableHeaders(scope=start_message)
+        headers["X-Profile-Artifact"] = name
+        timing = f"profile;dur={duration * 1000:.2f}, "
+        if stats is None:
+            timing += f"{query_stats.server_timing()}, "
+        timing += (
+            f'pydantic;dur={layers["pydantic"] * 1000:.2f};desc="Pydantic (self)", '
+            f'orm;dur={layers["orm"] * 1000:.2f};desc="SQLAlchemy (self)"'
+        )
+        headers.append("Server-Timing", timing)
+        await send(start_message)
+        for message in buffered:
+            await send(message)
+
+    @staticmethod
+    def _with_headers(send: Send, extra: dict[str, str]) -> Send:
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for key, value in extra.items():
+                    headers[key] = value
+            await send(message)
+
+        return send_with_headers
@@ -0,0 +1,262 @@
+"""Ограничение частоты запросов: token bucket в Redis с запасным вариантом в памяти процесса
+
+Политики задаются по имени (RATE_LIMIT_POLICIES) и подключаются к маршрутам как зависимости:
+
+    @router.post("/auth/signin", dependencies=[Depends(rate_limit("auth_signin"))])
+
+Каждая политика — набор корзин по IP и/или пользователю. Корзина атомарно пополняется
+и списывается Lua-скриптом в Redis; если Redis недоступен, используются корзины в памяти
+процесса (лимит тогда действует на каждый воркер отдельно). При исчерпании — 429 с Retry-After.
+
+Заголовки X-RateLimit-* добавляет к ответу RateLimitHeadersMiddleware, поэтому они есть
+и у маршрутов, которые возвращают собственный Response.
+"""
+
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import decode_token, get_token_from_request
+from app.metrics import RATE_LIMITED_REQUESTS
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Сколько доверенных reverse proxy (Traefik/Dokploy) стоит перед приложением. Каждый дописывает
+# адрес своего клиента в конец X-Forwarded-For, поэтому адрес берётся на столько записей с конца;
+# левые записи присылает сам клиент и им верить нельзя. 0 — заголовок игнорируется.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# После ошибки Redis столько секунд используется только локальный лимитер
+REDIS_RETRY_INTERVAL = 5.0
+# Максимум корзин в памяти процесса (самые старые вытесняются)
+LOCAL_BUCKETS_LIMIT = 10_000
+
+# KEYS[1] — ключ корзины; ARGV: ёмкость, пополнение в секунду, стоимость запроса.
+# Время берётся из Redis, чтобы часы воркеров не влияли на лимит.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Корзина политики: capacity запросов за period секунд
+
+    scope — чей это лимит: "ip" — любого запроса по IP, "anon" — только анонимного по IP,
+    "user" — только авторизованного по пользователю.
+    """
+
+    scope: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+@dataclass(frozen=True)
+class BucketResult:
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+
+# Политики маршрутов: имя -> корзины. Все корзины должны пропустить запрос.
+RATE_LIMIT_POLICIES: dict[str, tuple[Bucket, ...]] = {
+    # bcrypt + запрос в БД на каждую попытку входа
+    "auth_signin": (Bucket("ip", 10, 60),),
+    "auth_signup": (Bucket("ip", 5, 60),),
+    "auth_reset_password": (Bucket("ip", 5, 300),),
+    "auth_update_password": (Bucket("user", 5, 300),),
+    # Поиск по каталогу (ILIKE по названию и описанию): анонимы — по IP, пользователи — по аккаунту,
+    # чтобы пользователи за одним NAT не делили лимит
+    "catalog_search": (Bucket("anon", 60, 60), Bucket("user", 120, 60)),
+}
+
+
+class LocalTokenBuckets:
+    """Корзины в памяти процесса на случай недоступности Redis"""
+
+    def __init__(self, limit: int = LOCAL_BUCKETS_LIMIT) -> None:
+        self.limit = limit
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, bucket: Bucket, cost: float = 1.0) -> BucketResult:
+        now = time.monotonic()
+        tokens, ts = self._buckets.pop(key, (float(bucket.capacity), now))
+        tokens = min(bucket.capacity, tokens + max(0.0, now - ts) * bucket.rate)
+        allowed = tokens >= cost
+        retry_after = 0.0 if allowed else (cost - tokens) / bucket.rate
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.limit:
+            self._buckets.popitem(last=False)
+        return BucketResult(allowed, tokens, retry_after)
+
+
+class RateLimiter:
+    """Token bucket в Redis (Lua) с переключением на локальные корзины при ошибках Redis"""
+
+    def __init__(self) -> None:
+        self._script = async_redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._local = LocalTokenBuckets()
+        self._redis_disabled_until = 0.0
+
+    async def take(self, key: str, bucket: Bucket, cost: float = 1.0) -> BucketResult:
+        if time.monotonic() >= self._redis_disabled_until:
+            try:
+                allowed, remaining, retry_after = await self._script(
+                    keys=[key], args=[bucket.capacity, bucket.rate, cost]
+                )
+                return BucketResult(bool(allowed), float(remaining), float(retry_after))
+            except RedisError as e:
+                logger.warning(f"⚠️  Redis недоступен для rate limiting, используется локальный лимит: {e}")
+                self._redis_disabled_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        return self._local.take(key, bucket, cost)
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUSTED_PROXIES > 0:
+        forwarded = [ip.strip() for ip in ",".join(request.headers.getlist("x-forwarded-for")).split(",")]
+        forwarded = [ip for ip in forwarded if ip]
+        # Записей меньше, чем прокси, — запрос пришёл в обход них, заголовок поддельный
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+
+def _user_id(request: Request) -> Optional[str]:
+    """Идентификатор пользователя из JWT без обращения к БД (подпись проверяется)"""
+    token = get_token_from_request(request)
+    if not token:
+        return None
+    try:
+        return decode_token(token).get("sub")
+    except HTTPException:
+        return None
+
+
+def _load_policy_overrides() -> None:
+    """Переопределение политик из RATE_LIMITS, например `auth_signin=ip:10/60,catalog_search=anon:60/60+user:120/60`"""
+    for item in os.getenv("RATE_LIMITS", "").split(","):
+        name, _, spec = item.partition("=")
+        if not name.strip() or not spec.strip():
+            continue
+        buckets = []
+        for part in spec.split("+"):
+            scope, _, limit = part.strip().partition(":")
+            capacity, _, period = limit.partition("/")
+            buckets.append(Bucket(scope, int(capacity), float(period)))
+        RATE_LIMIT_POLICIES[name.strip()] = tuple(buckets)
+
+
+_load_policy_overrides()
+
+
+def rate_limit(policy: str, when: Optional[Callable[[Request], bool]] = None) -> Callable:
+    """Зависимость FastAPI, применяющая политику policy; when — условие применения"""
+    buckets = RATE_LIMIT_POLICIES[policy]
+    needs_user = any(bucket.scope in ("anon", "user") for bucket in buckets)
+
+    async def dependency(request: Request) -> None:
+        if not RATE_LIMIT_ENABLED or (when is not None and not when(request)):
+            return
+        user_id = _user_id(request) if needs_user else None
+        ip = client_ip(request)
+        identities = {"ip": ip, "user": user_id, "anon": None if user_id else ip}
+
+        limit = None
+        remaining = math.inf
+        for bucket in buckets:
+            identity = identities.get(bucket.scope)
+            if identity is None:
+                # Корзина не относится к этому запросу (пользовательская у анонима или наоборот)
+                continue
+            result = await rate_limiter.take(f"ratelimit:{policy}:{bucket.scope}:{identity}", bucket)
+            if not result.allowed:
+                RATE_LIMITED_REQUESTS.labels(policy, bucket.scope).inc()
+                retry_after = max(1, math.ceil(result.retry_after))
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please try again later",
+                    headers={
+                        "Retry-After": str(retry_after),
+                        "X-RateLimit-Limit": str(bucket.capacity),
+                        "X-RateLimit-Remaining": "0",
+                    },
+                )
+            if result.remaining < remaining:
+                remaining = result.remaining
+                limit = bucket.capacity
+        if limit is not None:
+            # Ответ создаёт маршрут; заголовки добавит RateLimitHeadersMiddleware
+            request.state.rate_limit_headers = {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(int(remaining)),
+            }
+
+    return dependency
+
+
+class RateLimitHeadersMiddleware:
+    """ASGI middleware: заголовки X-RateLimit-* из зависимости rate_limit в ответ маршрута"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # request.state хранится в scope["state"], общем для middleware и маршрута
+                rate_limit_headers = scope.get("state", {}).get("rate_limit_headers")
+                if rate_limit_headers:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in rate_limit_headers.items():
+                        if name not in headers:
+                            headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,52 @@
+"""Общие клиенты Redis с измерением времени выполнения команд"""
+
+import os
+import time
+from typing import Any
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from app.metrics import REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS
+
+REDIS_URL = os.getenv("REDIS_URL")
+if not REDIS_URL:
+    raise ValueError("REDIS_URL is not set in the .env file")
+
+
+class InstrumentedRedis(Redis):
+    """Синхронный клиент Redis, записывающий время каждой команды в метрики"""
+
+    def execute_command(self, *args, **options) -> Any:  # noqa: ANN401
+        command = str(args[0])
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except RedisError:
+            REDIS_COMMAND_ERRORS.labels(command).inc()
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.labels(command).observe(time.perf_counter() - start)
+
+
+redis_client = InstrumentedRedis.from_url(REDIS_URL)
+
+
+class InstrumentedAsyncRedis(AsyncRedis):
+    """Асинхронный клиент Redis с теми же метриками, что и синхронный"""
+
+    async def execute_command(self, *args, **options) -> Any:  # noqa: ANN401
+        command = str(args[0])
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except RedisError:
+            REDIS_COMMAND_ERRORS.labels(command).inc()
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.labels(command).observe(time.perf_counter() - start)
+
+
+# Общий пул соединений для асинхронного кода (health checks, фоновые задачи)
+async_redis_client = InstrumentedAsyncRedis.from_url(REDIS_URL)
@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter
 
-from . import categories, orders, products, users
+from . import analytics, categories, images, orders, products, profiles, users
 
 # Создаем главный роутер для админки
 router = APIRouter()
@@ -12,3 +12,6 @@ router.include_router(categories.router, tags=["Admin Categories"])
 router.include_router(products.router, tags=["Admin Products"])
 router.include_router(orders.router, tags=["Admin Orders"])
 router.include_router(users.router, tags=["Admin Users"])
+router.include_router(profiles.router, tags=["Admin Profiles"])
+router.include_router(analytics.router, tags=["Admin Analytics"])
+router.include_router(images.router, tags=["Admin Images"])
@@ -0,0 +1,171 @@
+"""Admin sales analytics routes (по агрегатам sales_daily / sales_daily_products)"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Literal, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import get_current_admin_user
+from app.db import models
+from app.db.database import get_read_db
+from app.db.sales_rollups import ANALYTICS_TIMEZONE
+from app.schemas import CategorySales, CustomUser, ProductSales, SalesAnalytics, SalesPoint, SalesTotals
+
+router = APIRouter()
+
+DEFAULT_PERIOD_DAYS = 30
+MAX_PERIOD_DAYS = 3 * 366
+
+Interval = Literal["day", "week", "month"]
+SortBy = Literal["revenue", "units", "orders"]
+
+
+def _period(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    """Границы периода включительно; по умолчанию — последние DEFAULT_PERIOD_DAYS дней"""
+    if date_to is None:
+        date_to = datetime.now(ZoneInfo(ANALYTICS_TIMEZONE)).date()
+    if date_from is None:
+        date_from = date_to - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="dateFrom позже dateTo")
+    if (date_to - date_from).days > MAX_PERIOD_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Период не может быть длиннее {MAX_PERIOD_DAYS} дней"
+        )
+    return date_from, date_to
+
+
+def _bucket_start(day: date, interval: Interval) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day: date, interval: Interval) -> date:
+    if interval == "week":
+        return day + timedelta(days=7)
+    if interval == "month":
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+
+@router.get("/admin/analytics/sales", response_model=SalesAnalytics)
+async def get_sales_analytics(
+    date_from: Optional[date] = Query(None, alias="dateFrom", description="Начало периода (включительно)"),
+    date_to: Optional[date] = Query(None, alias="dateTo", description="Конец периода (включительно)"),
+    interval: Interval = Query("day", description="Шаг ряда: day, week или month"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CustomUser = Depends(get_current_admin_user),
+) -> SalesAnalytics:
+    """Выручка, заказы и проданные единицы за период с разбивкой по дням, неделям или месяцам"""
+    date_from, date_to = _period(date_from, date_to)
+    daily = models.SalesDaily
+    bucket = cast(func.date_trunc(interval, daily.day), Date).label("bucket")
+    result = await db.execute(
+        select(bucket, func.sum(daily.orders), func.sum(daily.units), func.sum(daily.revenue))
+        .where(daily.day.between(date_from, date_to))
+        .group_by(bucket)
+    )
+    rows = {row[0]: row[1:] for row in result.all()}
+
+    # Пустые интервалы тоже попадают в ряд, чтобы на графике не было разрывов
+    series = []
+    point = _bucket_start(date_from, interval)
+    while point <= date_to:
+        orders, units, revenue = rows.get(point, (0, 0, Decimal(0)))
+        series.append(SalesPoint(date=point, orders=orders, units=units, revenue=revenue))
+        point = _next_bucket(point, interval)
+
+    orders = sum(item.orders for item in series)
+    revenue = sum((item.revenue for item in series), Decimal(0))
+    totals = SalesTotals(
+        orders=orders,
+        units=sum(item.units for item in series),
+        revenue=revenue,
+        averageOrderValue=(revenue / orders).quantize(Decimal("0.01")) if orders else Decimal(0),
+    )
+    return SalesAnalytics(dateFrom=date_from, dateTo=date_to, interval=interval, totals=totals, series=series)
+
+
+@router.get("/admin/analytics/top-products", response_model=list[ProductSales])
+async def get_top_products(
+    date_from: Optional[date] = Query(None, alias="dateFrom", description="Начало периода (включительно)"),
+    date_to: Optional[date] = Query(None, alias="dateTo", description="Конец периода (включительно)"),
+    sort_by: SortBy = Query("revenue", alias="sortBy", description="Сортировка: revenue, units или orders"),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CustomUser = Depends(get_current_admin_user),
+) -> list[ProductSales]:
+    """Самые продаваемые товары за период"""
+    date_from, date_to = _period(date_from, date_to)
+    sales = models.SalesDailyProduct
+    totals = {
+        "orders": func.sum(sales.orders).label("orders"),
+        "units": func.sum(sales.units).label("units"),
+        "revenue": func.sum(sales.revenue).label("revenue"),
+    }
+    result = await db.execute(
+        select(
+            sales.product_id,
+            # Текущие название и категория, если товар ещё существует, иначе — название на момент продажи
+            func.coalesce(models.Product.name, func.max(sales.product_name)).label("name"),
+            models.Product.category_id,
+            *totals.values(),
+        )
+        .outerjoin(models.Product, models.Product.id == sales.product_id)
+        .where(sales.day.between(date_from, date_to))
+        .group_by(sales.product_id, models.Product.id)
+        .having(totals["orders"] > 0)
+        .order_by(totals[sort_by].desc(), sales.product_id)
+        .limit(limit)
+    )
+    return [
+        ProductSales(
+            productId=row.product_id,
+            name=row.name,
+            categoryId=row.category_id,
+            orders=row.orders,
+            units=row.units,
+            revenue=row.revenue,
+        )
+        for row in result.all()
+    ]
+
+
+@router.get("/admin/analytics/categories", response_model=list[CategorySales])
+async def get_category_sales(
+    date_from: Optional[date] = Query(None, alias="dateFrom", description="Начало периода (включительно)"),
+    date_to: Optional[date] = Query(None, alias="dateTo", description="Конец периода (включительно)"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CustomUser = Depends(get_current_admin_user),
+) -> list[CategorySales]:
+    """Продажи по категориям за период (товары без категории — categoryId = null)"""
+    date_from, date_to = _period(date_from, date_to)
+    sales = models.SalesDailyProduct
+    revenue = func.sum(sales.revenue).label("revenue")
+    result = await db.execute(
+        select(
+            sales.category_id,
+            func.max(models.Category.name).label("name"),
+            func.sum(sales.orders).label("orders"),
+            func.sum(sales.units).label("units"),
+            revenue,
+        )
+        .outerjoin(models.Category, models.Category.id == sales.category_id)
+        .where(sales.day.between(date_from, date_to))
+        .group_by(sales.category_id)
+        .having(func.sum(sales.orders) > 0)
+        .order_by(revenue.desc())
+    )
+    return [
+        CategorySales(
+            categoryId=row.category_id, name=row.name, orders=row.orders, units=row.units, revenue=row.revenue
+        )
+        for row in result.all()
+    ]
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth import get_current_admin_user
 from app.db import models
 from app.db.database import get_db
+from app.invalidation import apply_local
 from app.schemas import CategoryCreate, CategoryInDB, CategoryUpdate, CustomUser
 
 router = APIRouter()
@@ -45,6 +46,7 @@ async def create_admin_category(
     db.add(db_category)
     await db.commit()
     await db.refresh(db_category)
+    await apply_local("category", db_category.id, obj=db_category)
     return CategoryInDB.model_validate(db_category, from_attributes=True)
 
 
@@ -71,6 +73,7 @@ async def update_admin_category(
     db.add(db_category)
     await db.commit()
     await db.refresh(db_category)
+    await apply_local("category", db_category.id, obj=db_category)
     return CategoryInDB.model_validate(db_category, from_attributes=True)
 
 
@@ -88,6 +91,7 @@ async def delete_admin_category(
 
     await db.delete(db_category)
     await db.commit()
+    await apply_local("category", category_id, "delete")
 
 
 @router.get("/admin/categories/{category_id}", response_model=CategoryInDB)
@@ -0,0 +1,75 @@
+"""Admin image upload (app/images.py)"""
+
+import asyncio
+import logging
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+
+from app.auth import get_current_admin_user
+from app.images import (
+    IMAGE_MAX_UPLOAD_BYTES,
+    IMAGES_URL_PREFIX,
+    MEDIA_TYPES,
+    detect_extension,
+    discard_original,
+    image_processor,
+    store_original,
+)
+from app.schemas import CustomUser, ImageThumbnail, ImageUpload
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _thumbnail_error(error: Exception) -> HTTPException:
+    if isinstance(error, BrokenProcessPool):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Обработка изображений временно недоступна, повторите загрузку",
+        )
+    if isinstance(error, ValueError):
+        # Сигнатура совпала, но декодировать файл не удалось (обрезан, повреждён, слишком большой)
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Не удалось обработать изображение: {error}"
+        )
+    # Ошибка диска (нет места, нет прав) — проблема сервера, а не файла
+    logger.error(f"❌ Не удалось записать миниатюры: {error}")
+    return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Не удалось сохранить изображение")
+
+
+@router.post("/admin/images", response_model=ImageUpload, status_code=status.HTTP_201_CREATED)
+async def upload_admin_image(
+    file: UploadFile = File(...), current_user: CustomUser = Depends(get_current_admin_user)
+) -> ImageUpload:
+    """Загрузить изображение: оригинал сохраняется по хэшу содержимого, миниатюры WebP создаются сразу"""
+    # Читаем на байт больше лимита, чтобы отличить файл ровно в лимит от слишком большого
+    data = await file.read(IMAGE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Файл больше {IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)} МБ",
+        )
+    extension = detect_extension(data)
+    if extension is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Поддерживаются JPEG, PNG, GIF и WebP"
+        )
+
+    digest, created = await asyncio.to_thread(store_original, data, extension)
+    try:
+        widths = await image_processor.thumbnails(digest, extension)
+    except (BrokenProcessPool, OSError, ValueError) as e:
+        if created:
+            # Оригинал, существовавший до загрузки, уже используется товарами и категориями
+            await asyncio.to_thread(discard_original, digest, extension)
+        raise _thumbnail_error(e) from e
+
+    return ImageUpload(
+        hash=digest,
+        url=f"{IMAGES_URL_PREFIX}/{digest}.{extension}",
+        contentType=MEDIA_TYPES[extension],
+        size=len(data),
+        thumbnails=[ImageThumbnail(width=width, url=f"{IMAGES_URL_PREFIX}/{digest}-{width}.webp") for width in widths],
+    )
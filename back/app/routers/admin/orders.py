@@ -3,13 +3,14 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.auth import get_current_admin_user
 from app.db import models
 from app.db.database import get_db
+from app.db.sales_rollups import apply_orders, is_counted
 from app.routers.notifications import create_notification
 from app.schemas import CustomUser, OrderEdit, OrderInDB, OrderUpdateStatus
 
@@ -42,8 +43,16 @@ async def update_admin_order_status(
     old_status = db_order.status
     new_status = order_update.status
 
+    # Агрегаты продаж: отменённый заказ вычитается до смены статуса, вернувшийся из отмены — прибавляется после
+    counted_changed = is_counted(old_status) != is_counted(new_status)
+    if counted_changed and is_counted(old_status):
+        await apply_orders(db, models.Order.id == order_id, -1)
+
     db_order.status = new_status
     db.add(db_order)
+    if counted_changed and is_counted(new_status):
+        await db.flush()
+        await apply_orders(db, models.Order.id == order_id, 1)
     await db.commit()
     await db.refresh(db_order)
 
@@ -82,20 +91,11 @@ async def delete_admin_order(
     order_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_admin_user)
 ) -> None:
     """Удалить заказ (только для админа)"""
-    result = await db.execute(select(models.Order).filter(models.Order.id == order_id))
-    db_order = result.scalars().first()
-    if not db_order:
+    await apply_orders(db, models.Order.id == order_id, -1)
+    # Позиции заказа удаляются каскадом (order_items.order_id ON DELETE CASCADE)
+    result = await db.execute(delete(models.Order).where(models.Order.id == order_id))
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Order not found")
-
-    # Сначала удаляем все элементы заказа
-    order_items_result = await db.execute(select(models.OrderItem).filter(models.OrderItem.order_id == order_id))
-    order_items = order_items_result.scalars().all()
-
-    for item in order_items:
-        await db.delete(item)
-
-    # Затем удаляем сам заказ
-    await db.delete(db_order)
     await db.commit()
 
 
@@ -113,12 +113,15 @@ async def edit_admin_order(
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    # Удаляем старые элементы заказа
-    order_items_result = await db.execute(select(models.OrderItem).filter(models.OrderItem.order_id == order_id))
-    old_order_items = order_items_result.scalars().all()
+    # Старый состав вычитается из агрегатов продаж, новый прибавляется перед коммитом
+    await apply_orders(db, models.Order.id == order_id, -1)
 
-    for item in old_order_items:
-        await db.delete(item)
+    # Удаляем старые элементы заказа
+    await db.execute(
+        delete(models.OrderItem)
+        .where(models.OrderItem.order_id == order_id)
+        .execution_options(synchronize_session=False)
+    )
 
     # Создаем новые элементы заказа
     for item_data in order_edit.orderItems:
@@ -135,6 +138,8 @@ async def edit_admin_order(
     # Обновляем общую сумму заказа
     db_order.total_amount = order_edit.totalAmount
     db.add(db_order)
+    await db.flush()
+    await apply_orders(db, models.Order.id == order_id, 1)
 
     await db.commit()
 
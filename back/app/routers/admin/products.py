@@ -8,8 +8,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.auth import get_current_admin_user
-from app.db import models
+from app.db import models, product_attributes
 from app.db.database import get_db
+from app.invalidation import apply_local
 from app.schemas import CustomUser, ProductCreate, ProductInDB, ProductOfflineUpdate, ProductUpdate
 
 router = APIRouter()
@@ -48,6 +49,8 @@ async def create_admin_product(
         category_id=product_in.categoryId,
     )
     db.add(db_product)
+    await db.flush()
+    await product_attributes.refresh(db, [db_product.category_id])
     await db.commit()
     await db.refresh(db_product)
 
@@ -56,6 +59,7 @@ async def create_admin_product(
         select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.id == db_product.id)
     )
     db_product_with_category = result.scalars().first()
+    await apply_local("product", db_product_with_category.id, obj=db_product_with_category)
     return ProductInDB.model_validate(db_product_with_category, from_attributes=True)
 
 
@@ -88,7 +92,10 @@ async def delete_admin_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     await db.delete(db_product)
+    await db.flush()
+    await product_attributes.refresh(db, [db_product.category_id])
     await db.commit()
+    await apply_local("product", product_id, "delete")
 
 
 @router.patch("/admin/products/{product_id}", response_model=ProductInDB)
@@ -104,6 +111,7 @@ async def update_admin_product(
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    previous_category_id = db_product.category_id
     update_data = product_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         if key == "imageUrl":
@@ -114,6 +122,9 @@ async def update_admin_product(
             setattr(db_product, key, value)
 
     db.add(db_product)
+    if "characteristics" in update_data or "categoryId" in update_data:
+        await db.flush()
+        await product_attributes.refresh(db, [previous_category_id, db_product.category_id])
     await db.commit()
     await db.refresh(db_product)
 
@@ -122,6 +133,7 @@ async def update_admin_product(
         select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.id == product_id)
     )
     db_product_with_category = result.scalars().first()
+    await apply_local("product", db_product_with_category.id, obj=db_product_with_category)
     return ProductInDB.model_validate(db_product_with_category, from_attributes=True)
 
 
@@ -151,4 +163,5 @@ async def update_product_offline_purchases(
         select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.id == product_id)
     )
     db_product_with_category = result.scalars().first()
+    await apply_local("product", db_product_with_category.id, obj=db_product_with_category)
     return ProductInDB.model_validate(db_product_with_category, from_attributes=True)
@@ -0,0 +1,44 @@
+"""Admin access to request profiles saved by ProfilingMiddleware"""
+
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.auth import get_current_admin_user
+from app.profiling import PROFILE_DIR
+from app.schemas import CustomUser
+
+router = APIRouter()
+
+
+@router.get("/admin/profiles")
+def list_profiles(current_user: CustomUser = Depends(get_current_admin_user)) -> list[dict[str, object]]:
+    """Список сохранённых профилей, новые первыми"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".pstats"):
+            continue
+        stat = os.stat(os.path.join(PROFILE_DIR, name))
+        profiles.append(
+            {
+                "name": name,
+                "size": stat.st_size,
+                "createdAt": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "summary": name.removesuffix(".pstats") + ".txt",
+            }
+        )
+    return profiles
+
+
+@router.get("/admin/profiles/{name}")
+def download_profile(name: str, current_user: CustomUser = Depends(get_current_admin_user)) -> FileResponse:
+    """Скачать .pstats (открывается snakeviz/gprof2dot) или текстовую сводку .txt"""
+    path = os.path.join(PROFILE_DIR, name)
+    if os.path.basename(name) != name or not name.endswith((".pstats", ".txt")) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain; charset=utf-8" if name.endswith(".txt") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
@@ -3,13 +3,15 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import get_current_admin_user, pwd_context
 from app.db import models
 from app.db.database import get_db
+from app.invalidation import publish
 from app.schemas import CustomUser, UserCreate, UserInDB, UserUpdate
+from app.user_purge import enqueue_user_purge
 
 router = APIRouter()
 
@@ -21,7 +23,7 @@ async def get_admin_users(
     """Получить список всех пользователей (только для админа)"""
     # Упрощаем запрос - сначала получаем всех пользователей
     try:
-        result = await db.execute(select(models.Profile))
+        result = await db.execute(select(models.Profile).filter(models.Profile.deleted_at.is_(None)))
         users = result.scalars().all()
         print(f"DEBUG: Found {len(users)} users in database")
 
@@ -89,6 +91,7 @@ async def create_admin_user(
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    await publish("profile", db_user.id)
 
     return UserInDB(
         id=db_user.id,
@@ -107,7 +110,9 @@ async def get_admin_user(
     user_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_admin_user)
 ) -> UserInDB:
     """Получить информацию о пользователе (только для админа)"""
-    result = await db.execute(select(models.Profile).filter(models.Profile.id == user_id))
+    result = await db.execute(
+        select(models.Profile).filter(models.Profile.id == user_id, models.Profile.deleted_at.is_(None))
+    )
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
@@ -146,7 +151,9 @@ async def update_admin_user(
     current_user: CustomUser = Depends(get_current_admin_user),
 ) -> UserInDB:
     """Обновить пользователя (только для админа)"""
-    result = await db.execute(select(models.Profile).filter(models.Profile.id == user_id))
+    result = await db.execute(
+        select(models.Profile).filter(models.Profile.id == user_id, models.Profile.deleted_at.is_(None))
+    )
     db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
@@ -170,49 +177,33 @@ async def update_admin_user(
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    await publish("profile", user_id)
 
     # Возвращаем обновленного пользователя с статистикой
     return await get_admin_user(user_id, db, current_user)
 
 
-@router.delete("/admin/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/admin/users/{user_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_admin_user(
     user_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_admin_user)
 ) -> None:
-    """Удалить пользователя (только для админа)"""
+    """Удалить пользователя (только для админа)
+
+    Профиль сразу помечается удалённым: пользователь пропадает из списков и не может войти.
+    Данные удаляются в фоне порциями (app/user_purge.py), ответ — 202 сразу после постановки в очередь.
+    """
     if current_user.id == user_id:
         raise HTTPException(status_code=400, detail="Нельзя удалить самого себя")
 
-    result = await db.execute(select(models.Profile).filter(models.Profile.id == user_id))
-    db_user = result.scalars().first()
-    if not db_user:
+    result = await db.execute(
+        update(models.Profile)
+        .where(models.Profile.id == user_id, models.Profile.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .returning(models.Profile.id)
+    )
+    if result.scalar() is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    # Удаляем связанные данные
-    # Избранное
-    favorites_result = await db.execute(select(models.Favourite).filter(models.Favourite.user_id == user_id))
-    favorites = favorites_result.scalars().all()
-    for favorite in favorites:
-        await db.delete(favorite)
-
-    # Корзина
-    cart_items_result = await db.execute(select(models.CartItem).filter(models.CartItem.user_id == user_id))
-    cart_items = cart_items_result.scalars().all()
-    for cart_item in cart_items:
-        await db.delete(cart_item)
-
-    # Заказы и их элементы
-    orders_result = await db.execute(select(models.Order).filter(models.Order.user_id == user_id))
-    orders = orders_result.scalars().all()
-    for order in orders:
-        # Удаляем элементы заказа
-        order_items_result = await db.execute(select(models.OrderItem).filter(models.OrderItem.order_id == order.id))
-        order_items = order_items_result.scalars().all()
-        for order_item in order_items:
-            await db.delete(order_item)
-        # Удаляем заказ
-        await db.delete(order)
-
-    # Удаляем пользователя
-    await db.delete(db_user)
     await db.commit()
+    await publish("profile", user_id)
+
+    await enqueue_user_purge(user_id)
@@ -17,6 +17,7 @@ from app.auth import (
 )
 from app.db import models
 from app.db.database import get_db
+from app.rate_limit import rate_limit
 from app.schemas import CustomUser, ResetPasswordSchema, SignInSchema, SignUpSchema, Token, UpdatePasswordSchema
 
 router = APIRouter()
@@ -26,7 +27,13 @@ IS_PRODUCTION = os.getenv("DEBUG", "true").lower() == "false"
 COOKIE_DOMAIN = ".sadovnick.store" if IS_PRODUCTION else None
 
 
-@router.post("/auth/signup", response_model=CustomUser, status_code=201, response_model_by_alias=True)
+@router.post(
+    "/auth/signup",
+    dependencies=[Depends(rate_limit("auth_signup"))],
+    response_model=CustomUser,
+    status_code=201,
+    response_model_by_alias=True,
+)
 async def signup(user_in: SignUpSchema, db: AsyncSession = Depends(get_db)) -> CustomUser:
     if user_in.password != user_in.confirmPassword:
         raise HTTPException(status_code=400, detail="Passwords do not match")
@@ -54,9 +61,11 @@ async def signup(user_in: SignUpSchema, db: AsyncSession = Depends(get_db)) -> C
     return CustomUser.model_validate(db_profile)
 
 
-@router.post("/auth/signin", response_model=Token)
+@router.post("/auth/signin", dependencies=[Depends(rate_limit("auth_signin"))], response_model=Token)
 async def signin(response: Response, user_in: SignInSchema, db: AsyncSession = Depends(get_db)) -> Token:
-    result = await db.execute(select(models.Profile).where(models.Profile.email == user_in.email))
+    result = await db.execute(
+        select(models.Profile).where(models.Profile.email == user_in.email, models.Profile.deleted_at.is_(None))
+    )
     user = result.scalars().first()
     if not user or not verify_password(user_in.password, str(user.hashed_password)):
         raise HTTPException(
@@ -98,9 +107,11 @@ async def logout(response: Response, request: Request, db: AsyncSession = Depend
     return {"message": "Successfully logged out"}
 
 
-@router.post("/auth/reset-password")
+@router.post("/auth/reset-password", dependencies=[Depends(rate_limit("auth_reset_password"))])
 async def reset_password(data: ResetPasswordSchema, db: AsyncSession = Depends(get_db)) -> dict[str, str]:
-    result = await db.execute(select(models.Profile).where(models.Profile.email == data.email))
+    result = await db.execute(
+        select(models.Profile).where(models.Profile.email == data.email, models.Profile.deleted_at.is_(None))
+    )
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User with this email not found")
@@ -114,7 +125,7 @@ async def reset_password(data: ResetPasswordSchema, db: AsyncSession = Depends(g
     return {"message": "Password reset initiated. Please proceed to update your password with the new credentials."}
 
 
-@router.post("/auth/update-password")
+@router.post("/auth/update-password", dependencies=[Depends(rate_limit("auth_update_password"))])
 async def update_password(
     data: UpdatePasswordSchema, current_user: CustomUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)
 ) -> dict[str, str]:
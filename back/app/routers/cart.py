@@ -1,14 +1,19 @@
 import uuid
+from typing import Any
 
 # Removed unused List import
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
-from app.auth import get_current_user
+from app import cart_store
+from app.auth import get_current_user, get_token_from_request
+from app.cart_store import CART_STORE_ENABLED, CART_TTL, GUEST_CART_COOKIE, CartOwner
 from app.db import models
 from app.db.database import get_db
+from app.routers.auth import COOKIE_DOMAIN, IS_PRODUCTION
 from app.schemas import (
     CartItemAdd,
     CartItemInDB,
@@ -21,16 +26,90 @@ from app.schemas import (
 router = APIRouter()
 
 
+# Запросы корзины выполняются на каждое действие пользователя, поэтому собираются через
+# lambda_stmt: скомпилированный SQL берётся из кэша, меняются только параметры
+def _cart_items_stmt(user_id: uuid.UUID) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: (
+            select(models.CartItem)
+            .options(joinedload(models.CartItem.product))
+            .where(models.CartItem.user_id == user_id)
+        )
+    )
+
+
+def _cart_item_by_product_stmt(user_id: uuid.UUID, product_id: uuid.UUID) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(models.CartItem).where(
+            models.CartItem.user_id == user_id, models.CartItem.product_id == product_id
+        )
+    )
+
+
+def _cart_item_stmt(item_id: uuid.UUID, user_id: uuid.UUID) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(models.CartItem).where(models.CartItem.id == item_id, models.CartItem.user_id == user_id)
+    )
+
+
+def _set_guest_cookie(response: Response, guest_id: str) -> None:
+    response.set_cookie(
+        key=GUEST_CART_COOKIE,
+        value=cart_store.sign_guest_id(guest_id),
+        httponly=True,
+        secure=IS_PRODUCTION,
+        samesite="lax",
+        domain=COOKIE_DOMAIN,
+        max_age=CART_TTL,
+    )
+
+
+async def get_cart_owner(request: Request, response: Response, db: AsyncSession = Depends(get_db)) -> CartOwner:
+    """Владелец корзины: пользователь, а при CART_STORE=redis без токена — гость по подписанной cookie"""
+    if not CART_STORE_ENABLED or get_token_from_request(request):
+        current_user = await get_current_user(request, db)
+        return CartOwner(str(current_user.id))
+    guest_id = cart_store.verify_guest_token(request.cookies.get(GUEST_CART_COOKIE))
+    if guest_id is None:
+        guest_id = str(uuid.uuid4())
+        _set_guest_cookie(response, guest_id)
+    return CartOwner(guest_id, is_guest=True)
+
+
+def _stored_item_in_db(item: dict[str, Any], owner: CartOwner) -> CartItemInDB:
+    return CartItemInDB(
+        id=item["id"],
+        productId=item["product_id"],
+        userId=owner.owner_id,
+        quantity=item["quantity"],
+        priceSnapshot=float(item["price_snapshot"]),
+    )
+
+
+def _stored_item_with_product(item: dict[str, Any], owner: CartOwner) -> CartItemWithProduct:
+    return CartItemWithProduct(
+        id=item["id"],
+        productId=item["product_id"],
+        userId=owner.owner_id,
+        quantity=item["quantity"],
+        priceSnapshot=float(item["price_snapshot"]),
+        name=item["name"],
+        slug=item["slug"],
+        description=item["description"],
+        imageUrl=item["image_url"],
+        categoryId=item["category_id"],
+    )
+
+
 @router.get("/cart", response_model=list[CartItemWithProduct])
 async def get_cart(
-    db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), owner: CartOwner = Depends(get_cart_owner)
 ) -> list[CartItemWithProduct]:
     """Получить корзину текущего пользователя"""
-    result = await db.execute(
-        select(models.CartItem)
-        .options(joinedload(models.CartItem.product))
-        .filter(models.CartItem.user_id == current_user.id)
-    )
+    if CART_STORE_ENABLED:
+        return [_stored_item_with_product(item, owner) for item in await cart_store.get_items(db, owner)]
+
+    result = await db.execute(_cart_items_stmt(uuid.UUID(owner.owner_id)))
     cart_items = result.scalars().unique().all()
 
     # Преобразуем в CartItemWithProduct, объединяя данные корзины и товара
@@ -56,7 +135,7 @@ async def get_cart(
 
 @router.post("/cart/add", response_model=CartItemInDB, status_code=status.HTTP_201_CREATED)
 async def add_to_cart(
-    cart_item: CartItemAdd, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)
+    cart_item: CartItemAdd, db: AsyncSession = Depends(get_db), owner: CartOwner = Depends(get_cart_owner)
 ) -> CartItemInDB:
     """Добавить товар в корзину"""
     # Проверяем, существует ли продукт
@@ -65,12 +144,13 @@ async def add_to_cart(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    if CART_STORE_ENABLED:
+        item = await cart_store.add_item(db, owner, product, cart_item.quantity, product.price)
+        return _stored_item_in_db(item, owner)
+
+    user_id = uuid.UUID(owner.owner_id)
     # Проверяем, есть ли уже такой товар в корзине
-    existing_result = await db.execute(
-        select(models.CartItem).filter(
-            models.CartItem.user_id == current_user.id, models.CartItem.product_id == cart_item.productId
-        )
-    )
+    existing_result = await db.execute(_cart_item_by_product_stmt(user_id, cart_item.productId))
     existing_item = existing_result.scalars().first()
 
     if existing_item:
@@ -84,7 +164,7 @@ async def add_to_cart(
     else:
         # Создаем новый элемент корзины
         new_cart_item = models.CartItem(
-            user_id=current_user.id,
+            user_id=user_id,
             product_id=cart_item.productId,
             quantity=cart_item.quantity,
             price_snapshot=product.price,
@@ -100,12 +180,16 @@ async def update_cart_item(
     item_id: uuid.UUID,
     update_data: CartItemUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: CustomUser = Depends(get_current_user),
+    owner: CartOwner = Depends(get_cart_owner),
 ) -> CartItemInDB:
     """Изменить количество товара в корзине"""
-    result = await db.execute(
-        select(models.CartItem).filter(models.CartItem.id == item_id, models.CartItem.user_id == current_user.id)
-    )
+    if CART_STORE_ENABLED:
+        item = await cart_store.set_quantity(db, owner, item_id, update_data.quantity)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        return _stored_item_in_db(item, owner)
+
+    result = await db.execute(_cart_item_stmt(item_id, uuid.UUID(owner.owner_id)))
     cart_item = result.scalars().first()
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
@@ -119,12 +203,15 @@ async def update_cart_item(
 
 @router.delete("/cart/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_from_cart(
-    item_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)
+    item_id: uuid.UUID, db: AsyncSession = Depends(get_db), owner: CartOwner = Depends(get_cart_owner)
 ) -> None:
     """Удалить товар из корзины"""
-    result = await db.execute(
-        select(models.CartItem).filter(models.CartItem.id == item_id, models.CartItem.user_id == current_user.id)
-    )
+    if CART_STORE_ENABLED:
+        if not await cart_store.remove_item(db, owner, item_id):
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        return
+
+    result = await db.execute(_cart_item_stmt(item_id, uuid.UUID(owner.owner_id)))
     cart_item = result.scalars().first()
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
@@ -135,14 +222,13 @@ async def remove_from_cart(
 
 
 @router.delete("/cart", status_code=status.HTTP_204_NO_CONTENT)
-async def clear_cart(db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)) -> None:
+async def clear_cart(db: AsyncSession = Depends(get_db), owner: CartOwner = Depends(get_cart_owner)) -> None:
     """Очистить всю корзину"""
-    result = await db.execute(select(models.CartItem).filter(models.CartItem.user_id == current_user.id))
-    cart_items = result.scalars().all()
-
-    for item in cart_items:
-        await db.delete(item)
+    if CART_STORE_ENABLED:
+        await cart_store.clear(owner)
+        return
 
+    await db.execute(delete(models.CartItem).where(models.CartItem.user_id == uuid.UUID(owner.owner_id)))
     await db.commit()
     return
 
@@ -150,9 +236,26 @@ async def clear_cart(db: AsyncSession = Depends(get_db), current_user: CustomUse
 @router.post("/cart/merge", response_model=list[CartItemInDB])
 async def merge_cart(
     cart_merge_request: CartMergeRequest,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: CustomUser = Depends(get_current_user),
 ) -> list[CartItemInDB]:
+    if CART_STORE_ENABLED:
+        # Слияние в Redis: локальная корзина фронтенда и гостевая корзина из cookie добавляются в hash пользователя
+        owner = CartOwner(str(current_user.id))
+        guest_id = cart_store.verify_guest_token(request.cookies.get(GUEST_CART_COOKIE))
+        guest = CartOwner(guest_id, is_guest=True) if guest_id else None
+        items = await cart_store.merge_items(
+            db,
+            owner,
+            [(item.productId, item.quantity, item.priceSnapshot) for item in cart_merge_request.localCart],
+            guest,
+        )
+        if guest is not None:
+            response.delete_cookie(GUEST_CART_COOKIE, domain=COOKIE_DOMAIN)
+        return [_stored_item_in_db(item, owner) for item in items]
+
     user_id = current_user.id
     merged_cart_items = []
 
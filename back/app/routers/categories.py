@@ -6,7 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import models
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.schemas import CategoryInDB
 
 # Настройка логгирования
@@ -16,7 +16,7 @@ router = APIRouter()
 
 
 @router.get("/categories", response_model=list[CategoryInDB])
-async def get_categories(slug: Optional[str] = None, db: AsyncSession = Depends(get_db)) -> list[CategoryInDB]:
+async def get_categories(slug: Optional[str] = None, db: AsyncSession = Depends(get_read_db)) -> list[CategoryInDB]:
     try:
         logger.info(f"Запрос категорий, slug: {slug}")
 
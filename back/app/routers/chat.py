@@ -1,31 +1,68 @@
 import json
 import uuid
 from datetime import datetime
+from typing import Optional
 
 # Removed unused List import
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from sqlalchemy import desc, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import get_current_admin_user, get_current_user
+from app.auth import get_current_admin_user, get_current_user, get_websocket_user
 from app.db import models
 from app.db.database import get_db
-from app.routers.notifications import create_notification, create_notification_for_admins
+from app.routers.notifications import create_notification, create_notification_for_admins, push_unread_count
 from app.schemas import ChatInDB, ChatMessageInDB, ChatMessageSend, CustomUser
+from app.unread import add_admin_unread_chat, get_admin_unread_chats, reset_admin_unread_chat
 from app.websocket_manager import manager  # Импортируем готовый менеджер
 
 router = APIRouter()
 
 
+def _chat_updated_event(
+    chat: models.Chat, unread_count: int, last_message: Optional[str] = None, last_message_at: Optional[datetime] = None
+) -> dict:
+    """Событие для списков чатов: клиент обновляет строку чата без повторного запроса списка"""
+    chat_data = {
+        "id": str(chat.id),
+        "userId": str(chat.user_id),
+        "isActive": chat.is_active,
+        "unreadCount": unread_count,
+    }
+    if last_message is not None:
+        chat_data["lastMessage"] = last_message
+    if last_message_at is not None:
+        chat_data["lastMessageAt"] = last_message_at.isoformat()
+    return {"type": "chat_updated", "chat": chat_data}
+
+
+async def _authorize_websocket(websocket: WebSocket, user_id: str, is_admin: bool = False) -> bool:
+    """Сокет принимается только от владельца user_id (и администратора для /ws/admin)"""
+    user = await get_websocket_user(websocket)
+    if user is None or str(user.id) != user_id or (is_admin and not user.isAdmin):
+        # Закрытие до accept — клиент получит отказ в рукопожатии (403)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return False
+    return True
+
+
+async def _send_initial_state(user_id: str) -> None:
+    """Текущий счётчик непрочитанных сразу после подключения — клиенту не нужен первый опрос"""
+    await push_unread_count(None, user_id)
+
+
 # WebSocket endpoint для пользователей
 @router.websocket("/ws/chat/{user_id}")
 async def websocket_chat_user(websocket: WebSocket, user_id: str) -> None:
+    if not await _authorize_websocket(websocket, user_id):
+        return
     await manager.connect(websocket, user_id)
     try:
         # Отправляем подтверждение подключения
         await websocket.send_text(
             json.dumps({"type": "connection_established", "userId": user_id, "timestamp": datetime.now().isoformat()})
         )
+        await _send_initial_state(user_id)
 
         while True:
             try:
@@ -72,12 +109,15 @@ async def websocket_chat_user(websocket: WebSocket, user_id: str) -> None:
 # WebSocket endpoint для админов
 @router.websocket("/ws/admin/{admin_id}")
 async def websocket_chat_admin(websocket: WebSocket, admin_id: str) -> None:
+    if not await _authorize_websocket(websocket, admin_id, is_admin=True):
+        return
     await manager.connect(websocket, admin_id, is_admin=True)
     try:
         # Отправляем подтверждение подключения
         await websocket.send_text(
             json.dumps({"type": "connection_established", "adminId": admin_id, "timestamp": datetime.now().isoformat()})
         )
+        await _send_initial_state(admin_id)
 
         while True:
             try:
@@ -248,6 +288,19 @@ async def get_chat_detail(
         # Обнуляем счетчик непрочитанных
         await db.execute(models.Chat.__table__.update().where(models.Chat.id == chat_id).values(unread_count=0))
         await db.commit()
+        await manager.push_event(str(chat.user_id), _chat_updated_event(chat, 0))
+    else:
+        # Поддержка прочитала сообщения пользователя
+        await db.execute(
+            models.ChatMessage.__table__.update()
+            .where(models.ChatMessage.chat_id == chat_id)
+            .where(~models.ChatMessage.is_from_admin)
+            .where(~models.ChatMessage.is_read)
+            .values(is_read=True)
+        )
+        await db.commit()
+        await reset_admin_unread_chat(chat_id)
+        await manager.push_event_to_admins(_chat_updated_event(chat, 0))
 
     return chat_data
 
@@ -279,14 +332,20 @@ async def send_message(
     db.add(new_message)
 
     # Обновляем время последнего сообщения в чате
-    await db.execute(
-        models.Chat.__table__.update()
-        .where(models.Chat.id == chat_id)
-        .values(last_message_at=func.now(), unread_count=models.Chat.unread_count + (1 if current_user.isAdmin else 0))
-    )
+    user_unread = (
+        await db.execute(
+            models.Chat.__table__.update()
+            .where(models.Chat.id == chat_id)
+            .values(
+                last_message_at=func.now(), unread_count=models.Chat.unread_count + (1 if current_user.isAdmin else 0)
+            )
+            .returning(models.Chat.unread_count)
+        )
+    ).scalar_one()
 
     await db.commit()
     await db.refresh(new_message)
+    admin_unread = None if current_user.isAdmin else await add_admin_unread_chat(chat_id, 1)
 
     # Отправляем через WebSocket
     ws_message = {
@@ -333,6 +392,18 @@ async def send_message(
             },
         )
 
+    # Строка чата в списках пользователя и поддержки
+    await manager.push_event(
+        str(chat.user_id),
+        _chat_updated_event(chat, user_unread or 0, message_data.message, new_message.created_at),
+    )
+    if manager.has_admin_listeners:
+        if admin_unread is None:
+            admin_unread = (await get_admin_unread_chats(db)).get(str(chat_id), 0)
+        await manager.push_event_to_admins(
+            _chat_updated_event(chat, admin_unread, message_data.message, new_message.created_at)
+        )
+
     # Создаем ChatMessageInDB
     message_response = ChatMessageInDB.model_validate(
         {
@@ -389,6 +460,7 @@ async def create_or_get_chat(
     db.add(new_chat)
     await db.commit()
     await db.refresh(new_chat)
+    await manager.push_event_to_admins(_chat_updated_event(new_chat, 0))
 
     chat_data = ChatInDB.model_validate(
         {
@@ -420,6 +492,8 @@ async def get_all_chats(
         .order_by(desc(models.Chat.last_message_at))
     )
     chats_data = result.all()
+    # Счётчик chats.unread_count — сторона пользователя; поддержке показываются её непрочитанные
+    admin_unread = await get_admin_unread_chats(db)
 
     chat_list = []
     for chat, user in chats_data:
@@ -437,7 +511,7 @@ async def get_all_chats(
                 "id": str(chat.id),
                 "user_id": str(chat.user_id),
                 "is_active": chat.is_active,
-                "unread_count": chat.unread_count,
+                "unread_count": admin_unread.get(str(chat.id), 0),
                 "last_message_at": chat.last_message_at.isoformat() if chat.last_message_at is not None else None,
                 "created_at": chat.created_at.isoformat(),
                 "userName": user.full_name or user.email,
@@ -0,0 +1,35 @@
+"""Раздача загруженных изображений и миниатюр (app/images.py)"""
+
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app.images import MEDIA_TYPES, original_path, thumbnail_path
+
+router = APIRouter()
+
+# Имя файла — хэш содержимого, поэтому ответ не меняется никогда
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_ORIGINAL_RE = re.compile(r"^([0-9a-f]{64})\.(jpg|png|gif|webp)$")
+_THUMBNAIL_RE = re.compile(r"^([0-9a-f]{64})-(\d{1,4})\.webp$")
+
+
+@router.get("/images/{name}", response_class=FileResponse)
+def get_image(name: str, request: Request) -> Response:
+    """Оригинал (<sha256>.<ext>) или миниатюра WebP (<sha256>-<ширина>.webp)"""
+    if match := _THUMBNAIL_RE.match(name):
+        path, media_type = thumbnail_path(match[1], int(match[2])), MEDIA_TYPES["webp"]
+    elif match := _ORIGINAL_RE.match(name):
+        path, media_type = original_path(match[1], match[2]), MEDIA_TYPES[match[2]]
+    else:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{name}"'}
+    # Браузер без immutable (или после принудительного обновления) перепроверяет файл — тело не нужно
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
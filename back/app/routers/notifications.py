@@ -1,19 +1,119 @@
+import asyncio
 import json
+import logging
+import os
 import uuid
-from typing import Optional
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, func, select, update
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select, and_, lambda_stmt, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
 from app.auth import get_current_user
 from app.db import models
-from app.db.database import get_db
-from app.schemas import CustomUser, NotificationInDB, NotificationUpdate
+from app.db.database import AsyncSessionLocal, get_db
+from app.db.notification_partitions import hot_cutoff, retention_cutoff
+from app.metrics import NOTIFICATION_QUEUE_DEPTH, NOTIFICATIONS_COALESCED
+from app.schemas import (
+    CustomUser,
+    NotificationBatchUpdate,
+    NotificationBatchUpdateResult,
+    NotificationInDB,
+    NotificationUpdate,
+)
+from app.unread import add_unread_notifications, get_unread_notifications
 from app.websocket_manager import manager  # Импортируем из отдельного модуля
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Интервал комментариев-heartbeat в SSE: держит соединение через прокси и выявляет отключившихся
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+# Окна группировки уведомлений админам по умолчанию, секунды (переопределяются NOTIFICATION_COALESCE)
+DEFAULT_COALESCE_WINDOWS = {"new_order": 10.0, "chat_message": 5.0}
+# Заголовок и текст сводки по типу; {count} — число сгруппированных уведомлений
+DIGEST_TEMPLATES = {
+    "new_order": ("Новые заказы", "Получено новых заказов: {count}"),
+    "chat_message": ("Новые сообщения", "Новых сообщений от пользователей: {count}"),
+}
+DEFAULT_DIGEST_TEMPLATE = ("Новые уведомления", "Новых уведомлений: {count}")
+# Сколько исходных уведомлений сохраняется в notification_data сводки
+DIGEST_MAX_ITEMS = 20
+
+
+def _user_notifications_stmt(user_id: uuid.UUID, unread_only: bool, limit: int) -> StatementLambdaElement:
+    # Граница по created_at оставляет планировщику одну-две последние партиции
+    cutoff = hot_cutoff()
+    stmt = lambda_stmt(
+        lambda: select(models.Notification).where(
+            models.Notification.user_id == user_id, models.Notification.created_at >= cutoff
+        )
+    )
+    # Ветвление вне лямбд: каждая комбинация кэшируется отдельно
+    if unread_only:
+        stmt += lambda s: s.where(~models.Notification.is_read)
+    stmt += lambda s: s.order_by(models.Notification.created_at.desc()).limit(limit)
+    return stmt
+
+
+def _older_notifications_stmt(user_id: uuid.UUID, unread_only: bool, limit: int) -> Select:
+    """Уведомления старше окна списка: оставшиеся в notifications и перенесённые в архив"""
+    parts = []
+    for model, extra in (
+        (models.Notification, [models.Notification.created_at < hot_cutoff()]),
+        (models.NotificationArchive, []),
+    ):
+        conditions = [model.user_id == user_id, *extra]
+        if unread_only:
+            conditions.append(~model.is_read)
+        parts.append(
+            select(
+                model.id,
+                model.user_id,
+                model.title,
+                model.message,
+                model.type,
+                model.is_read,
+                model.created_at,
+                model.notification_data,
+            ).where(*conditions)
+        )
+    combined = union_all(*parts).subquery()
+    return select(combined).order_by(combined.c.created_at.desc()).limit(limit)
+
+
+def _notification_in_db(row: Union[models.Notification, Row]) -> NotificationInDB:
+    """Схема ответа из ORM-объекта или строки RETURNING"""
+    return NotificationInDB(
+        id=str(row.id),
+        userId=str(row.user_id),
+        title=row.title,
+        message=row.message,
+        type=row.type,
+        isRead=row.is_read,
+        createdAt=row.created_at.isoformat(),
+        notificationData=row.notification_data,
+    )
+
+
+async def push_unread_count(db: Optional[AsyncSession], user_id: str, value: Optional[int] = None) -> None:
+    """Отправить пользователю актуальный счётчик непрочитанных, если он подключён (WebSocket/SSE)"""
+    if not manager.is_connected(user_id):
+        return
+    if value is None:
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                value = await get_unread_notifications(session, user_id)
+        else:
+            value = await get_unread_notifications(db, user_id)
+    await manager.push_event(user_id, {"type": "unread_count", "unreadCount": value})
+
 
 async def create_notification(
     db: AsyncSession,
@@ -24,46 +124,9 @@ async def create_notification(
     notification_data: Optional[dict] = None,
 ) -> models.Notification:
     """Создать уведомление для пользователя"""
-    notification = models.Notification(
-        user_id=uuid.UUID(user_id),
-        title=title,
-        message=message,
-        type=notification_type,
-        notification_data=notification_data or {},
-    )
-
-    db.add(notification)
-    await db.commit()
-    await db.refresh(notification)
-
-    # Отправляем WebSocket уведомление
-    ws_message = {
-        "type": "notification",
-        "data": {
-            "id": str(notification.id),
-            "title": title,
-            "message": message,
-            "type": notification_type,
-            "notification_data": notification_data or {},
-        },
-    }
-    await manager.send_personal_message(json.dumps(ws_message), user_id)
-
-    return notification
-
-
-async def create_notification_for_admins(
-    db: AsyncSession, title: str, message: str, notification_type: str, notification_data: Optional[dict] = None
-) -> None:
-    """Создать уведомление для всех админов"""
-    # Получаем всех админов
-    admin_result = await db.execute(select(models.Profile).filter(models.Profile.is_admin))
-    admins = admin_result.scalars().all()
-
-    # Создаем уведомление для каждого админа
-    for admin in admins:
+    with NOTIFICATION_QUEUE_DEPTH.track_inprogress():
         notification = models.Notification(
-            user_id=admin.id,
+            user_id=uuid.UUID(user_id),
             title=title,
             message=message,
             type=notification_type,
@@ -73,8 +136,9 @@ async def create_notification_for_admins(
         db.add(notification)
         await db.commit()
         await db.refresh(notification)
+        unread = await add_unread_notifications(user_id, 1)
 
-        # Отправляем WebSocket уведомление каждому админу
+        # Отправляем уведомление и новый счётчик через WebSocket/SSE
         ws_message = {
             "type": "notification",
             "data": {
@@ -85,42 +149,197 @@ async def create_notification_for_admins(
                 "notification_data": notification_data or {},
             },
         }
-        await manager.send_to_admin(json.dumps(ws_message), str(admin.id))
+        await manager.push_event(user_id, ws_message)
+        await push_unread_count(db, user_id, unread)
+
+    return notification
+
+
+async def _deliver_to_admins(
+    db: AsyncSession, title: str, message: str, notification_type: str, notification_data: Optional[dict] = None
+) -> None:
+    """Записать уведомление каждому админу одним коммитом и разослать его через WebSocket/SSE"""
+    admin_result = await db.execute(
+        select(models.Profile.id).filter(models.Profile.is_admin, models.Profile.deleted_at.is_(None))
+    )
+    admin_ids = admin_result.scalars().all()
+
+    # Все уведомления рассылки считаются ожидающими доставки, пока не отправлены
+    pending = len(admin_ids)
+    NOTIFICATION_QUEUE_DEPTH.inc(pending)
+    try:
+        notifications = [
+            models.Notification(
+                user_id=admin_id,
+                title=title,
+                message=message,
+                type=notification_type,
+                notification_data=notification_data or {},
+            )
+            for admin_id in admin_ids
+        ]
+        db.add_all(notifications)
+        await db.commit()
+
+        for notification in notifications:
+            unread = await add_unread_notifications(notification.user_id, 1)
+            ws_message = {
+                "type": "notification",
+                "data": {
+                    "id": str(notification.id),
+                    "title": title,
+                    "message": message,
+                    "type": notification_type,
+                    "notification_data": notification_data or {},
+                },
+            }
+            await manager.push_event(str(notification.user_id), ws_message)
+            await push_unread_count(db, str(notification.user_id), unread)
+            NOTIFICATION_QUEUE_DEPTH.dec()
+            pending -= 1
+    finally:
+        NOTIFICATION_QUEUE_DEPTH.dec(pending)
+
+
+def _load_coalesce_windows() -> dict[str, float]:
+    """Окна группировки по типу из NOTIFICATION_COALESCE, например `new_order=10,chat_message=5` (0 — выключить)"""
+    windows = dict(DEFAULT_COALESCE_WINDOWS)
+    for item in os.getenv("NOTIFICATION_COALESCE", "").split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            windows[name.strip()] = float(seconds)
+    return {name: seconds for name, seconds in windows.items() if seconds > 0}
+
+
+@dataclass
+class _AdminNotification:
+    title: str
+    message: str
+    notification_data: Optional[dict]
+
+
+class NotificationCoalescer:
+    """Группировка уведомлений админам одного типа в сводку ("Получено новых заказов: 12")
+
+    Первое уведомление типа отправляется сразу и открывает окно; пришедшие в течение окна
+    копятся и по его окончании уходят одной строкой на админа. Пока поток не иссяк, окно
+    продлевается — под нагрузкой админ получает не больше одного уведомления типа за окно.
+    Буфер у каждого воркера свой.
+    """
+
+    def __init__(self, windows: dict[str, float]) -> None:
+        self.windows = windows
+        self._pending: dict[str, list[_AdminNotification]] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        title: str,
+        message: str,
+        notification_type: str,
+        notification_data: Optional[dict] = None,
+    ) -> None:
+        window = self.windows.get(notification_type)
+        if window is None:
+            await _deliver_to_admins(db, title, message, notification_type, notification_data)
+            return
+
+        pending = self._pending.get(notification_type)
+        if pending is not None:
+            pending.append(_AdminNotification(title, message, notification_data))
+            NOTIFICATIONS_COALESCED.labels(notification_type).inc()
+            return
+
+        self._pending[notification_type] = []
+        self._timers[notification_type] = asyncio.create_task(self._run_window(notification_type, window))
+        await _deliver_to_admins(db, title, message, notification_type, notification_data)
+
+    async def _run_window(self, notification_type: str, window: float) -> None:
+        try:
+            while True:
+                await asyncio.sleep(window)
+                items = self._pending.get(notification_type)
+                if not items:
+                    break
+                self._pending[notification_type] = []
+                try:
+                    await self._flush(notification_type, items)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка отправки сводки уведомлений {notification_type}: {e}")
+        finally:
+            self._pending.pop(notification_type, None)
+            self._timers.pop(notification_type, None)
+
+    async def _flush(self, notification_type: str, items: list[_AdminNotification]) -> None:
+        if len(items) == 1:
+            item = items[0]
+            title, message, notification_data = item.title, item.message, item.notification_data
+        else:
+            title, message = DIGEST_TEMPLATES.get(notification_type, DEFAULT_DIGEST_TEMPLATE)
+            message = message.format(count=len(items))
+            notification_data = {
+                "digest": True,
+                "count": len(items),
+                # Последние элементы сводки — для ссылок из интерфейса
+                "items": [item.notification_data or {} for item in items[-DIGEST_MAX_ITEMS:]],
+            }
+        async with AsyncSessionLocal() as db:
+            await _deliver_to_admins(db, title, message, notification_type, notification_data)
+
+    async def stop(self) -> None:
+        """Отменить окна и отправить накопленное"""
+        timers = list(self._timers.values())
+        pending = {notification_type: items for notification_type, items in self._pending.items() if items}
+        self._pending.clear()
+        for task in timers:
+            task.cancel()
+        for task in timers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Задача, отменённая до первого шага, не доходит до своего finally
+        self._timers.clear()
+        for notification_type, items in pending.items():
+            try:
+                await self._flush(notification_type, items)
+            except Exception as e:
+                logger.error(f"❌ Ошибка отправки сводки уведомлений {notification_type}: {e}")
+
+
+notification_coalescer = NotificationCoalescer(_load_coalesce_windows())
+
+
+async def create_notification_for_admins(
+    db: AsyncSession, title: str, message: str, notification_type: str, notification_data: Optional[dict] = None
+) -> None:
+    """Создать уведомление для всех админов (типы из NOTIFICATION_COALESCE группируются в сводки)"""
+    await notification_coalescer.submit(db, title, message, notification_type, notification_data)
 
 
 @router.get("/api/notifications", response_model=list[NotificationInDB])
 async def get_user_notifications(
     unread_only: bool = False,
     limit: int = 50,
+    older: bool = False,
     current_user: CustomUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ) -> list[NotificationInDB]:
-    """Получить уведомления пользователя"""
-    query = select(models.Notification).filter(models.Notification.user_id == current_user.id)
+    """Получить уведомления пользователя за последние NOTIFICATION_HOT_DAYS; older=true — более старые и архив"""
+    if older:
+        result = await db.execute(_older_notifications_stmt(current_user.id, unread_only, limit))
+        return [_notification_in_db(row) for row in result.all()]
 
-    if unread_only:
-        query = query.filter(~models.Notification.is_read)
-
-    query = query.order_by(models.Notification.created_at.desc()).limit(limit)
-
-    result = await db.execute(query)
+    result = await db.execute(_user_notifications_stmt(current_user.id, unread_only, limit))
     notifications = result.scalars().all()
 
-    notification_list = []
-    for notification in notifications:
-        notification_data = NotificationInDB(
-            id=str(notification.id),
-            userId=str(notification.user_id),
-            title=notification.title,
-            message=notification.message,
-            type=notification.type,
-            isRead=notification.is_read,
-            createdAt=notification.created_at.isoformat(),
-            notificationData=notification.notification_data,
-        )
-        notification_list.append(notification_data)
+    return [_notification_in_db(notification) for notification in notifications]
+
 
-    return notification_list
+async def _apply_read_delta(user_id: uuid.UUID, is_read: bool, changed: int) -> Optional[int]:
+    """Сдвинуть счётчик непрочитанных на число уведомлений, сменивших статус"""
+    return await add_unread_notifications(user_id, -changed if is_read else changed)
 
 
 @router.patch("/api/notifications/{notification_id}", response_model=NotificationInDB)
@@ -131,37 +350,87 @@ async def mark_notification_read(
     db: AsyncSession = Depends(get_db),
 ) -> NotificationInDB:
     """Отметить уведомление как прочитанное"""
-    # Проверяем, что уведомление принадлежит пользователю
+    # Один запрос: CTE блокирует строку пользователя и запоминает прежний статус,
+    # UPDATE меняет его и возвращает строку целиком — по старому статусу сдвигается счётчик
+    notification = models.Notification
+    old = (
+        select(notification.id, notification.created_at, notification.is_read.label("was_read"))
+        .where(
+            notification.id == notification_id,
+            notification.user_id == current_user.id,
+            notification.created_at >= retention_cutoff(),
+        )
+        .with_for_update()
+        .cte("old")
+    )
     result = await db.execute(
-        select(models.Notification).filter(
-            and_(models.Notification.id == notification_id, models.Notification.user_id == current_user.id)
+        update(notification)
+        .where(notification.id == old.c.id, notification.created_at == old.c.created_at)
+        .values(is_read=update_data.isRead)
+        .returning(
+            notification.id,
+            notification.user_id,
+            notification.title,
+            notification.message,
+            notification.type,
+            notification.is_read,
+            notification.created_at,
+            notification.notification_data,
+            old.c.was_read,
         )
+        .execution_options(synchronize_session=False)
     )
-    notification = result.scalars().first()
+    row = result.first()
+    await db.commit()
 
-    if not notification:
+    if row is None:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    # Обновляем статус
-    await db.execute(
-        update(models.Notification).where(models.Notification.id == notification_id).values(is_read=update_data.isRead)
+    if bool(row.was_read) != update_data.isRead:
+        unread = await _apply_read_delta(current_user.id, update_data.isRead, 1)
+        await push_unread_count(db, str(current_user.id), unread)
+
+    return _notification_in_db(row)
+
+
+@router.post("/api/notifications/mark-read", response_model=NotificationBatchUpdateResult)
+async def mark_notifications_read_batch(
+    update_data: NotificationBatchUpdate,
+    current_user: CustomUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> NotificationBatchUpdateResult:
+    """Изменить статус нескольких уведомлений: по списку ids и/или всех не новее upTo"""
+    if not update_data.ids and update_data.upTo is None:
+        raise HTTPException(status_code=400, detail="Either ids or upTo must be provided")
+
+    conditions = [
+        models.Notification.user_id == current_user.id,
+        models.Notification.created_at >= retention_cutoff(),
+        # Только уведомления, у которых статус действительно меняется, — их число и есть дельта счётчика
+        models.Notification.is_read != update_data.isRead,
+    ]
+    if update_data.ids:
+        conditions.append(models.Notification.id.in_(update_data.ids))
+    if update_data.upTo is not None:
+        conditions.append(models.Notification.created_at <= update_data.upTo)
+
+    result = await db.execute(
+        update(models.Notification)
+        .where(*conditions)
+        .values(is_read=update_data.isRead)
+        .returning(models.Notification.id)
+        .execution_options(synchronize_session=False)
     )
+    updated_ids = [str(notification_id) for notification_id in result.scalars().all()]
     await db.commit()
 
-    # Получаем обновленное уведомление
-    updated_result = await db.execute(select(models.Notification).filter(models.Notification.id == notification_id))
-    updated_notification = updated_result.scalars().first()
+    unread = await _apply_read_delta(current_user.id, update_data.isRead, len(updated_ids))
+    if unread is None:
+        unread = await get_unread_notifications(db, current_user.id)
+    if updated_ids:
+        await push_unread_count(db, str(current_user.id), unread)
 
-    return NotificationInDB(
-        id=str(updated_notification.id),
-        userId=str(updated_notification.user_id),
-        title=updated_notification.title,
-        message=updated_notification.message,
-        type=updated_notification.type,
-        isRead=updated_notification.is_read,
-        createdAt=updated_notification.created_at.isoformat(),
-        notificationData=updated_notification.notification_data,
-    )
+    return NotificationBatchUpdateResult(updatedIds=updated_ids, unreadCount=unread)
 
 
 @router.post("/api/notifications/mark-all-read")
@@ -169,12 +438,21 @@ async def mark_all_notifications_read(
     current_user: CustomUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)
 ) -> dict[str, str]:
     """Отметить все уведомления пользователя как прочитанные"""
-    await db.execute(
+    result = await db.execute(
         update(models.Notification)
-        .where(and_(models.Notification.user_id == current_user.id, ~models.Notification.is_read))
+        .where(
+            and_(
+                models.Notification.user_id == current_user.id,
+                models.Notification.created_at >= retention_cutoff(),
+                ~models.Notification.is_read,
+            )
+        )
         .values(is_read=True)
     )
     await db.commit()
+    # Дельта, а не обнуление: уведомление, созданное параллельно, остаётся непрочитанным
+    unread = await add_unread_notifications(current_user.id, -result.rowcount)
+    await push_unread_count(db, str(current_user.id), unread)
 
     return {"message": "All notifications marked as read"}
 
@@ -183,12 +461,44 @@ async def mark_all_notifications_read(
 async def get_unread_count(
     current_user: CustomUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)
 ) -> dict[str, int]:
-    """Получить количество непрочитанных уведомлений"""
-    result = await db.execute(
-        select(func.count(models.Notification.id)).filter(
-            and_(models.Notification.user_id == current_user.id, ~models.Notification.is_read)
-        )
+    """Получить количество непрочитанных уведомлений (счётчик в Redis, COUNT только при промахе)"""
+    return {"unreadCount": await get_unread_notifications(db, current_user.id)}
+
+
+def _sse_message(event_type: str, data: str) -> str:
+    return f"event: {event_type}\ndata: {data}\n\n"
+
+
+@router.get("/api/notifications/stream")
+async def notifications_stream(
+    request: Request, current_user: CustomUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """Server-Sent Events вместо опроса: unread_count, notification и chat_updated (те же, что в WebSocket)"""
+    user_id = str(current_user.id)
+    is_admin = current_user.isAdmin
+    unread = await get_unread_notifications(db, user_id)
+    # Соединение с БД не удерживается на всё время потока
+    await db.close()
+    queue = manager.subscribe(user_id, is_admin)
+
+    async def events() -> AsyncGenerator[str, None]:
+        try:
+            yield "retry: 5000\n\n"
+            yield _sse_message("unread_count", json.dumps({"type": "unread_count", "unreadCount": unread}))
+            while True:
+                try:
+                    event_type, message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _sse_message(event_type, message)
+        finally:
+            manager.unsubscribe(user_id, queue, is_admin)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    count = result.scalar()
-
-    return {"unreadCount": count or 0}
@@ -1,13 +1,14 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.auth import CustomUser, get_current_user
 from app.db import models
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
+from app.db.sales_rollups import apply_orders
 from app.routers.notifications import create_notification_for_admins
 from app.schemas import OrderCreate, OrderDelete, OrderInDB, OrderItemInDB
 
@@ -65,6 +66,8 @@ async def create_order(
             # Обновляем счетчик заказов для продукта
             product.times_ordered += item.quantity
 
+        await db.flush()
+        await apply_orders(db, models.Order.id == new_order.id, 1)
         await db.commit()
 
         # Создаем уведомление для админов о новом заказе
@@ -135,15 +138,9 @@ async def delete_order(
         if db_order.user_id != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this order")
 
-        # Сначала удаляем все элементы заказа
-        order_items_result = await db.execute(select(models.OrderItem).filter(models.OrderItem.order_id == order_id))
-        order_items = order_items_result.scalars().all()
-
-        for item in order_items:
-            await db.delete(item)
-
-        # Затем удаляем сам заказ
-        await db.delete(db_order)
+        await apply_orders(db, models.Order.id == order_id, -1)
+        # Позиции заказа удаляются каскадом (order_items.order_id ON DELETE CASCADE)
+        await db.execute(delete(models.Order).where(models.Order.id == order_id))
         await db.commit()
 
     except Exception as e:
@@ -157,7 +154,7 @@ async def delete_order(
 
 @router.get("/orders", response_model=list[OrderInDB])
 async def get_user_orders(
-    db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db), current_user: CustomUser = Depends(get_current_user)
 ) -> list[OrderInDB]:
     """Получить заказы текущего пользователя"""
     result = await db.execute(
@@ -172,7 +169,7 @@ async def get_user_orders(
 
 @router.get("/orders/{order_id}", response_model=OrderInDB)
 async def get_user_order(
-    order_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user: CustomUser = Depends(get_current_user)
+    order_id: uuid.UUID, db: AsyncSession = Depends(get_read_db), current_user: CustomUser = Depends(get_current_user)
 ) -> OrderInDB:
     """Получить конкретный заказ пользователя"""
     result = await db.execute(
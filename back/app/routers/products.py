@@ -1,18 +1,81 @@
+import json
+import os
 import uuid
+from decimal import Decimal
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import ColumnElement, and_, case, func, lambda_stmt, or_, select, true, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import Select
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
+from app.cache import TTLCache, invalidate_group
+from app.catalog_snapshot import SnapshotData, catalog_snapshot
+from app.compression import CompressedBody
 from app.db import models
-from app.db.database import get_db
-from app.schemas import ProductInDB
+from app.db.database import get_read_db
+from app.invalidation import InvalidationEvent, subscribe
+from app.metrics import CATALOG_SNAPSHOT_REQUESTS
+from app.rate_limit import rate_limit
+from app.schemas import (
+    AttributeValue,
+    CategoryFacet,
+    PriceBucket,
+    ProductAttributeFilter,
+    ProductFacets,
+    ProductInDB,
+    SearchSuggestion,
+)
+from app.search_index import search_index
 
 router = APIRouter()
 
+FACETS_CACHE_TTL = float(os.getenv("FACETS_CACHE_TTL", "60"))
+PRICE_HISTOGRAM_BUCKETS = 10
+# Значения grouping(category_id, bucket) для строк GROUPING SETS
+CATEGORY_ROWS, BUCKET_ROWS = 1, 2
+MAX_ATTRIBUTE_FILTERS = 10
+
+# Ответы хранятся сериализованными и сжатыми: на попадание в кэш не тратится ни JSON, ни gzip/brotli
+facets_cache: TTLCache[CompressedBody] = TTLCache("catalog_facets", group="catalog", ttl=FACETS_CACHE_TTL)
+attributes_cache: TTLCache[CompressedBody] = TTLCache("catalog_attributes", group="catalog", ttl=FACETS_CACHE_TTL)
+
+
+async def _invalidate_catalog_caches(event: InvalidationEvent) -> None:
+    # Изменения с других воркеров: TTL остаётся страховкой на случай потери события
+    invalidate_group("catalog")
+
+
+subscribe("product", _invalidate_catalog_caches)
+subscribe("category", _invalidate_catalog_caches)
+
+ATTRIBUTE_FILTER_DESCRIPTION = (
+    "Фильтр по характеристикам: ключ:значение, несколько значений через | (любое из них). "
+    "Параметр можно повторять, условия по разным ключам объединяются через И"
+)
+
+
+# Горячие запросы карточки товара собираются через lambda_stmt: SQLAlchemy кэширует
+# скомпилированный SQL по коду лямбды, а значения из замыкания подставляются как параметры
+def _product_by_slug_stmt(product_slug: str) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: (
+            select(models.Product)
+            .options(joinedload(models.Product.category))
+            .where(models.Product.slug == product_slug)
+        )
+    )
+
+
+def _product_by_id_stmt(product_id: uuid.UUID) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: (
+            select(models.Product).options(joinedload(models.Product.category)).where(models.Product.id == product_id)
+        )
+    )
+
 
 def _apply_price_filters(query: Select, min_price: Optional[float], max_price: Optional[float]) -> Select:
     """Применить фильтры по цене"""
@@ -25,10 +88,9 @@ def _apply_price_filters(query: Select, min_price: Optional[float], max_price: O
 
 def _apply_stock_and_discount_filters(query: Select, in_stock: Optional[bool], has_discount: Optional[bool]) -> Select:
     """Применить фильтры по наличию и скидке"""
-    if in_stock is not None and in_stock:
-        query = query.filter(models.Product.stock > 0)
-    if has_discount is not None and has_discount:
-        query = query.filter(models.Product.discount_percentage > 0)
+    # Остатки в products не хранятся: все товары каталога считаются доступными, in_stock ничего не отсекает
+    if has_discount:
+        query = query.filter(models.Product.discount > 0)
     return query
 
 
@@ -42,6 +104,36 @@ def _apply_search_filter(query: Select, search_query: Optional[str]) -> Select:
     return query
 
 
+def _catalog_snapshot(endpoint: str, eligible: bool = True) -> Optional[SnapshotData]:
+    """Снимок каталога, если он включён, загружен и может обслужить запрос"""
+    if not catalog_snapshot.enabled:
+        return None
+    snapshot = catalog_snapshot.snapshot if eligible else None
+    CATALOG_SNAPSHOT_REQUESTS.labels(endpoint, "snapshot" if snapshot is not None else "database").inc()
+    return snapshot
+
+
+def _parse_attribute_filters(attributes: Optional[list[str]]) -> dict[str, list[str]]:
+    """attr=ключ:значение1|значение2 -> {ключ: [значения]} в стабильном порядке"""
+    parsed: dict[str, set[str]] = {}
+    for item in attributes or []:
+        key, separator, values = item.partition(":")
+        values_set = {value.strip() for value in values.split("|") if value.strip()}
+        if not separator or not key.strip() or not values_set:
+            raise HTTPException(status_code=400, detail=f"Некорректный фильтр по характеристикам: {item}")
+        parsed.setdefault(key.strip(), set()).update(values_set)
+    if len(parsed) > MAX_ATTRIBUTE_FILTERS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_ATTRIBUTE_FILTERS} характеристик в фильтре")
+    return {key: sorted(values) for key, values in sorted(parsed.items())}
+
+
+def _apply_characteristics_filter(query: Select, attributes: dict[str, list[str]]) -> Select:
+    """Применить фильтр по характеристикам (@> по GIN-индексу ix_products_characteristics)"""
+    for key, values in attributes.items():
+        query = query.filter(or_(*(models.Product.characteristics.contains({key: value}) for value in values)))
+    return query
+
+
 def _apply_sorting(query: Select, sort_by: Optional[str], sort_order: Optional[str]) -> Select:
     """Применить сортировку"""
     if sort_by:
@@ -71,7 +163,10 @@ def _apply_pagination(query: Select, offset: Optional[int], limit: Optional[int]
 
 
 @router.get("/products/bestsellers", response_model=list[ProductInDB])
-async def get_bestsellers(db: AsyncSession = Depends(get_db), limit: int = 10) -> list[ProductInDB]:
+async def get_bestsellers(db: AsyncSession = Depends(get_read_db), limit: int = 10) -> list[ProductInDB]:
+    snapshot = _catalog_snapshot("bestsellers")
+    if snapshot is not None:
+        return snapshot.bestsellers(limit)
     bestsellers = (
         (
             await db.execute(
@@ -87,24 +182,46 @@ async def get_bestsellers(db: AsyncSession = Depends(get_db), limit: int = 10) -
     return list(bestsellers)
 
 
-@router.get("/products/slug/{product_slug}", response_model=ProductInDB)
-async def get_product_by_slug(product_slug: str, db: AsyncSession = Depends(get_db)) -> ProductInDB:
-    product = (
-        await db.execute(
-            select(models.Product)
-            .options(joinedload(models.Product.category))
-            .filter(models.Product.slug == product_slug)
+# Объявлен раньше /products/{product_id}, иначе "suggest" разбирался бы как UUID
+@router.get("/products/suggest", response_model=list[SearchSuggestion])
+async def suggest_products(
+    q: str = Query(..., max_length=100, description="Начало названия товара или категории"),
+    limit: int = Query(8, ge=1, le=20),
+) -> list[SearchSuggestion]:
+    """Подсказки для строки поиска из индекса в памяти (без запросов к БД)"""
+    return [
+        SearchSuggestion(
+            type=item.kind, id=item.id, name=item.name, slug=item.slug, imageUrl=item.image_url, price=item.price
         )
-    ).scalar_one_or_none()
+        for item in search_index.suggest(q, limit)
+    ]
+
+
+@router.get("/products/slug/{product_slug}", response_model=ProductInDB)
+async def get_product_by_slug(product_slug: str, db: AsyncSession = Depends(get_read_db)) -> ProductInDB:
+    snapshot = _catalog_snapshot("product")
+    # Товара может не быть в снимке, если его только что создал другой воркер — тогда идём в БД
+    if snapshot is not None and product_slug in snapshot.by_slug:
+        return snapshot.products[snapshot.by_slug[product_slug]]
+    product = (await db.execute(_product_by_slug_stmt(product_slug))).scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 
-@router.get("/products/category/{category_slug}", response_model=list[ProductInDB])
+def _is_search_request(request: Request) -> bool:
+    return bool(request.query_params.get("searchQuery"))
+
+
+# Лимит только для поисковых запросов: ILIKE по названию и описанию без индекса
+@router.get(
+    "/products/category/{category_slug}",
+    response_model=list[ProductInDB],
+    dependencies=[Depends(rate_limit("catalog_search", when=_is_search_request))],
+)
 async def get_products_by_category_slug(
     category_slug: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     limit: Optional[int] = Query(None, description="Количество товаров для загрузки"),
     offset: Optional[int] = Query(0, description="Смещение для пагинации"),
     search_query: Optional[str] = Query(None, alias="searchQuery", description="Поисковый запрос"),
@@ -115,7 +232,17 @@ async def get_products_by_category_slug(
     category_filter: Optional[str] = Query(None, alias="categoryFilter"),
     in_stock: Optional[bool] = Query(None, alias="inStock"),
     has_discount: Optional[bool] = Query(None, alias="hasDiscount"),
+    attr: Optional[list[str]] = Query(None, description=ATTRIBUTE_FILTER_DESCRIPTION),
 ) -> list[ProductInDB]:
+    attributes = _parse_attribute_filters(attr)
+    # Поиск и фильтр по характеристикам снимок не обслуживает
+    snapshot = _catalog_snapshot("category", eligible=not search_query and not attributes)
+    if snapshot is not None:
+        category_ids = category_filter.split(",") if category_filter else None
+        return snapshot.list_products(
+            category_slug, category_ids, min_price, max_price, has_discount, sort_by, sort_order, offset, limit
+        )
+
     query = select(models.Product).options(joinedload(models.Product.category))
 
     # Фильтрация по категории
@@ -136,6 +263,7 @@ async def get_products_by_category_slug(
     query = _apply_price_filters(query, min_price, max_price)
     query = _apply_stock_and_discount_filters(query, in_stock, has_discount)
     query = _apply_search_filter(query, search_query)
+    query = _apply_characteristics_filter(query, attributes)
     query = _apply_sorting(query, sort_by, sort_order)
     query = _apply_pagination(query, offset, limit)
 
@@ -143,13 +271,209 @@ async def get_products_by_category_slug(
     return list(products)
 
 
-@router.get("/products/{product_id}", response_model=ProductInDB)
-async def get_product_by_id(product_id: uuid.UUID, db: AsyncSession = Depends(get_db)) -> ProductInDB:
-    product = (
-        await db.execute(
-            select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.id == product_id)
+def _parse_category_filter(category_filter: Optional[str]) -> list[uuid.UUID]:
+    try:
+        return sorted({uuid.UUID(item.strip()) for item in category_filter.split(",") if item.strip()})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Некорректный categoryFilter") from e
+
+
+def _category_condition(category_slug: str, category_ids: list[uuid.UUID]) -> ColumnElement[bool]:
+    if category_slug != "all":
+        category_id = select(models.Category.id).where(models.Category.slug == category_slug).scalar_subquery()
+        return models.Product.category_id == category_id
+    if category_ids:
+        return models.Product.category_id.in_(category_ids)
+    return true()
+
+
+def _price_condition(min_price: Optional[float], max_price: Optional[float]) -> ColumnElement[bool]:
+    conditions = []
+    if min_price is not None:
+        conditions.append(models.Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(models.Product.price <= max_price)
+    return and_(true(), *conditions)
+
+
+def _price_bucket_bounds(low: Decimal, high: Decimal, buckets: int) -> list[tuple[Decimal, Decimal]]:
+    if high <= low:
+        return [(low, high)]
+    step = (high - low) / buckets
+    edges = [low + step * i for i in range(buckets)] + [high]
+    cent = Decimal("0.01")
+    return [(edges[i].quantize(cent), edges[i + 1].quantize(cent)) for i in range(buckets)]
+
+
+async def _compute_facets(
+    db: AsyncSession,
+    category_slug: str,
+    category_ids: list[uuid.UUID],
+    search_query: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    in_stock: Optional[bool],
+    has_discount: Optional[bool],
+    attributes: dict[str, list[str]],
+) -> ProductFacets:
+    """Счётчики по категориям, гистограмма цен и число товаров со скидкой одним запросом"""
+    product = models.Product
+    in_category = _category_condition(category_slug, category_ids)
+    in_price = _price_condition(min_price, max_price)
+
+    # Поиск и флаги сужают все фасеты; категория и цена вычисляются флагами, чтобы
+    # счётчики категорий не зависели от выбранных категорий, а гистограмма — от диапазона цен
+    base = select(
+        product.category_id,
+        product.price,
+        product.discount,
+        in_category.label("in_category"),
+        in_price.label("in_price"),
+    )
+    base = _apply_stock_and_discount_filters(base, in_stock, has_discount)
+    base = _apply_search_filter(base, search_query)
+    base = _apply_characteristics_filter(base, attributes).cte("base")
+    bounds = (
+        select(func.min(base.c.price).label("low"), func.max(base.c.price).label("high"))
+        .where(base.c.in_category)
+        .cte("bounds")
+    )
+    bucket = case(
+        (
+            bounds.c.high > bounds.c.low,
+            func.least(
+                func.width_bucket(base.c.price, bounds.c.low, bounds.c.high, PRICE_HISTOGRAM_BUCKETS),
+                PRICE_HISTOGRAM_BUCKETS,
+            ),
+        ),
+        else_=1,
+    ).label("bucket")
+    selected = and_(base.c.in_category, base.c.in_price)
+    result = await db.execute(
+        select(
+            func.grouping(base.c.category_id, bucket).label("grouping"),
+            base.c.category_id,
+            models.Category.name,
+            models.Category.slug,
+            bucket,
+            func.min(bounds.c.low).label("low"),
+            func.max(bounds.c.high).label("high"),
+            func.count().filter(base.c.in_price).label("category_count"),
+            func.count().filter(base.c.in_category).label("bucket_count"),
+            func.count().filter(selected).label("total"),
+            func.count().filter(and_(selected, base.c.discount > 0)).label("discounted"),
+        )
+        .select_from(base.join(bounds, true()).join(models.Category, models.Category.id == base.c.category_id))
+        .group_by(
+            func.grouping_sets(
+                tuple_(base.c.category_id, models.Category.name, models.Category.slug), tuple_(bucket), tuple_()
+            )
+        )
+    )
+
+    facets = ProductFacets(total=0, discounted=0, categories=[], priceHistogram=[])
+    bucket_counts: dict[int, int] = {}
+    for row in result.all():
+        if row.grouping == CATEGORY_ROWS:
+            if row.category_count:
+                facets.categories.append(
+                    CategoryFacet(categoryId=row.category_id, name=row.name, slug=row.slug, count=row.category_count)
+                )
+        elif row.grouping == BUCKET_ROWS:
+            if row.bucket is not None:
+                bucket_counts[row.bucket] = row.bucket_count
+        else:
+            facets.total, facets.discounted = row.total, row.discounted
+            facets.minPrice, facets.maxPrice = row.low, row.high
+
+    if facets.minPrice is not None:
+        bucket_bounds = _price_bucket_bounds(facets.minPrice, facets.maxPrice, PRICE_HISTOGRAM_BUCKETS)
+        facets.priceHistogram = [
+            PriceBucket(priceFrom=low, priceTo=high, count=bucket_counts.get(number, 0))
+            for number, (low, high) in enumerate(bucket_bounds, start=1)
+        ]
+    facets.categories.sort(key=lambda item: (-item.count, item.name))
+    return facets
+
+
+@router.get(
+    "/products/category/{category_slug}/facets",
+    response_model=ProductFacets,
+    dependencies=[Depends(rate_limit("catalog_search", when=_is_search_request))],
+)
+async def get_product_facets(
+    category_slug: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    search_query: Optional[str] = Query(None, alias="searchQuery", description="Поисковый запрос"),
+    min_price: Optional[float] = Query(None, alias="minPrice", description="Минимальная цена"),
+    max_price: Optional[float] = Query(None, alias="maxPrice", description="Максимальная цена"),
+    category_filter: Optional[str] = Query(None, alias="categoryFilter"),
+    in_stock: Optional[bool] = Query(None, alias="inStock"),
+    has_discount: Optional[bool] = Query(None, alias="hasDiscount"),
+    attr: Optional[list[str]] = Query(None, description=ATTRIBUTE_FILTER_DESCRIPTION),
+) -> Response:
+    """Фасеты каталога для боковой панели при тех же фильтрах, что и список товаров"""
+    # categoryFilter учитывается только для "all", как и в списке товаров
+    category_ids = _parse_category_filter(category_filter) if category_slug == "all" and category_filter else []
+    search_query = search_query.strip() if search_query else None
+    attributes = _parse_attribute_filters(attr)
+    # Нормализованный ключ: одинаковые выборки с разным порядком параметров попадают в одну запись
+    key = json.dumps(
+        [
+            category_slug,
+            [str(category_id) for category_id in category_ids],
+            search_query.lower() if search_query else None,
+            min_price,
+            max_price,
+            bool(has_discount),
+            attributes,
+        ]
+    )
+
+    async def load() -> CompressedBody:
+        facets = await _compute_facets(
+            db, category_slug, category_ids, search_query, min_price, max_price, in_stock, has_discount, attributes
+        )
+        return CompressedBody.from_value(facets)
+
+    return (await facets_cache.get_or_load(key, load)).response(request)
+
+
+async def _load_attribute_filters(db: AsyncSession, category_slug: str) -> list[ProductAttributeFilter]:
+    attribute = models.ProductAttribute
+    count = func.sum(attribute.product_count).label("count")
+    query = select(attribute.key, attribute.value, count).group_by(attribute.key, attribute.value)
+    if category_slug != "all":
+        query = query.join(models.Category, models.Category.id == attribute.category_id).where(
+            models.Category.slug == category_slug
         )
-    ).scalar_one_or_none()
+    filters: dict[str, list[AttributeValue]] = {}
+    for key, value, value_count in (
+        await db.execute(query.order_by(attribute.key, count.desc(), attribute.value))
+    ).all():
+        filters.setdefault(key, []).append(AttributeValue(value=value, count=value_count))
+    return [ProductAttributeFilter(key=key, values=values) for key, values in filters.items()]
+
+
+@router.get("/products/category/{category_slug}/attributes", response_model=list[ProductAttributeFilter])
+async def get_product_attributes(
+    category_slug: str, request: Request, db: AsyncSession = Depends(get_read_db)
+) -> Response:
+    """Характеристики категории, по которым можно фильтровать (attr=ключ:значение), с числом товаров"""
+
+    async def load() -> CompressedBody:
+        return CompressedBody.from_value(await _load_attribute_filters(db, category_slug))
+
+    return (await attributes_cache.get_or_load(category_slug, load)).response(request)
+
+
+@router.get("/products/{product_id}", response_model=ProductInDB)
+async def get_product_by_id(product_id: uuid.UUID, db: AsyncSession = Depends(get_read_db)) -> ProductInDB:
+    snapshot = _catalog_snapshot("product")
+    if snapshot is not None and product_id in snapshot.by_id:
+        return snapshot.products[snapshot.by_id[product_id]]
+    product = (await db.execute(_product_by_id_stmt(product_id))).scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
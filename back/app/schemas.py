@@ -1,4 +1,5 @@
 import uuid
+from datetime import date as datetime_date
 from datetime import datetime
 from decimal import Decimal
 from typing import Any, Optional
@@ -140,6 +141,50 @@ class ProductInDB(ProductBase):
     model_config = {"from_attributes": True, "populate_by_name": True}
 
 
+class AttributeValue(BaseModel):
+    value: str
+    count: int
+
+
+class ProductAttributeFilter(BaseModel):
+    key: str
+    values: list[AttributeValue]
+
+
+class SearchSuggestion(BaseModel):
+    type: str  # "product" или "category"
+    id: uuid.UUID
+    name: str
+    slug: str
+    imageUrl: Optional[str] = None
+    price: Optional[Decimal] = None
+
+
+class CategoryFacet(BaseModel):
+    categoryId: uuid.UUID
+    name: str
+    slug: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    # Нижняя граница включительно, верхняя — исключительно (у последнего интервала включительно)
+    priceFrom: Decimal
+    priceTo: Decimal
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    discounted: int
+    minPrice: Optional[Decimal] = None
+    maxPrice: Optional[Decimal] = None
+    # Без учёта выбранных категорий: по ним можно расширить выборку
+    categories: list[CategoryFacet]
+    # Без учёта фильтра по цене: слайдер показывает весь диапазон
+    priceHistogram: list[PriceBucket]
+
+
 # endregion
 
 
@@ -404,4 +449,81 @@ class NotificationUpdate(BaseModel):
     model_config = {"from_attributes": True, "populate_by_name": True}
 
 
+class NotificationBatchUpdate(BaseModel):
+    """Пакетное изменение статуса: уведомления из ids и/или все уведомления не новее upTo"""
+
+    ids: Optional[list[uuid.UUID]] = Field(None, max_length=1000)
+    upTo: Optional[datetime] = Field(None, alias="up_to", serialization_alias="upTo")
+    isRead: bool = Field(True, alias="is_read", serialization_alias="isRead")
+
+    model_config = {"populate_by_name": True}
+
+
+class NotificationBatchUpdateResult(BaseModel):
+    updatedIds: list[str]
+    unreadCount: int
+
+
+# endregion
+
+
+# region Analytics Schemas
+class SalesPoint(BaseModel):
+    date: datetime_date
+    orders: int
+    units: int
+    revenue: Decimal
+
+
+class SalesTotals(BaseModel):
+    orders: int
+    units: int
+    revenue: Decimal
+    averageOrderValue: Decimal
+
+
+class SalesAnalytics(BaseModel):
+    dateFrom: datetime_date
+    dateTo: datetime_date
+    interval: str
+    totals: SalesTotals
+    series: list[SalesPoint]
+
+
+class ProductSales(BaseModel):
+    productId: uuid.UUID
+    name: str
+    categoryId: Optional[uuid.UUID] = None
+    orders: int
+    units: int
+    revenue: Decimal
+
+
+class CategorySales(BaseModel):
+    categoryId: Optional[uuid.UUID] = None
+    name: Optional[str] = None
+    # Сумма по товарам: заказ с двумя товарами категории учитывается дважды
+    orders: int
+    units: int
+    revenue: Decimal
+
+
+# endregion
+
+
+# region Image Schemas
+class ImageThumbnail(BaseModel):
+    width: int
+    url: str
+
+
+class ImageUpload(BaseModel):
+    hash: str
+    # URL оригинала — его и записывают в imageUrl товара или категории
+    url: str
+    contentType: str
+    size: int
+    thumbnails: list[ImageThumbnail]
+
+
 # endregion
@@ -0,0 +1,217 @@
+"""Подсказки поиска по каталогу из индекса в памяти процесса
+
+Индекс — отсортированный массив пар (слово, ключ записи): слова названий и slug товаров
+и категорий. Поиск по префиксу — bisect по массиву, без обращения к Postgres. Каждое слово
+запроса должно быть началом какого-либо слова записи; товары ранжируются по times_ordered.
+
+Индекс загружается при старте и полностью пересобирается раз в SEARCH_INDEX_REFRESH_INTERVAL
+секунд (популярность меняется с каждым заказом). Изменения товаров и категорий через админку
+этого воркера применяются сразу (upsert/remove), изменения других воркеров и в обход
+приложения — по событиям шины инвалидации (app/invalidation.py).
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.invalidation import InvalidationEvent, subscribe
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_REFRESH_INTERVAL = float(os.getenv("SEARCH_INDEX_REFRESH_INTERVAL", "300"))
+MIN_PREFIX_LENGTH = 2
+# Категорий в подсказках не больше этого числа, остальное место — товарам
+MAX_CATEGORY_SUGGESTIONS = 3
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize_words(value: str) -> list[str]:
+    return _WORD_RE.findall(value.lower().replace("ё", "е"))
+
+
+@dataclass(frozen=True, slots=True)
+class Suggestion:
+    kind: str
+    id: uuid.UUID
+    name: str
+    slug: str
+    score: int = 0
+    image_url: Optional[str] = None
+    price: Optional[Decimal] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.id}"
+
+
+def _entry_words(suggestion: Suggestion) -> list[str]:
+    return sorted(set(normalize_words(suggestion.name)) | set(normalize_words(suggestion.slug)))
+
+
+def _product_suggestion(product: models.Product) -> Suggestion:
+    return Suggestion(
+        kind="product",
+        id=product.id,
+        name=product.name,
+        slug=product.slug,
+        score=product.times_ordered or 0,
+        image_url=product.image_url,
+        price=product.price,
+    )
+
+
+def _category_suggestion(category: models.Category) -> Suggestion:
+    return Suggestion(kind="category", id=category.id, name=category.name, slug=category.slug)
+
+
+class SearchIndex:
+    """Префиксный индекс подсказок; все операции синхронные, поэтому атомарны для event loop"""
+
+    def __init__(self, refresh_interval: float = SEARCH_INDEX_REFRESH_INTERVAL) -> None:
+        self.refresh_interval = refresh_interval
+        self._entries: dict[str, Suggestion] = {}
+        self._words: list[tuple[str, str]] = []
+        # Изменения, пришедшие во время пересборки: применяются поверх загруженного снимка
+        self._pending: Optional[dict[str, Optional[Suggestion]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _matching_keys(self, prefix: str) -> set[str]:
+        keys = set()
+        position = bisect.bisect_left(self._words, (prefix, ""))
+        while position < len(self._words) and self._words[position][0].startswith(prefix):
+            keys.add(self._words[position][1])
+            position += 1
+        return keys
+
+    def suggest(self, query: str, limit: int) -> list[Suggestion]:
+        """Записи, у которых каждое слово запроса — начало одного из слов"""
+        words = normalize_words(query)
+        if not words or sum(len(word) for word in words) < MIN_PREFIX_LENGTH:
+            return []
+        # Самый длинный префикс отсекает больше всего, с него и начинаем
+        words.sort(key=len, reverse=True)
+        keys = self._matching_keys(words[0])
+        for word in words[1:]:
+            if not keys:
+                break
+            keys &= self._matching_keys(word)
+
+        matches = [self._entries[key] for key in keys]
+        categories = sorted((item for item in matches if item.kind == "category"), key=lambda item: item.name)
+        products = sorted(
+            (item for item in matches if item.kind == "product"), key=lambda item: (-item.score, item.name)
+        )
+        return (categories[:MAX_CATEGORY_SUGGESTIONS] + products)[:limit]
+
+    def upsert(self, suggestion: Suggestion) -> None:
+        self.remove(suggestion.key)
+        if self._pending is not None:
+            self._pending[suggestion.key] = suggestion
+        self._entries[suggestion.key] = suggestion
+        for word in _entry_words(suggestion):
+            bisect.insort(self._words, (word, suggestion.key))
+
+    def remove(self, key: str) -> None:
+        if self._pending is not None:
+            self._pending[key] = None
+        previous = self._entries.pop(key, None)
+        if previous is None:
+            return
+        for word in _entry_words(previous):
+            position = bisect.bisect_left(self._words, (word, key))
+            if position < len(self._words) and self._words[position] == (word, key):
+                del self._words[position]
+
+    def upsert_product(self, product: models.Product) -> None:
+        self.upsert(_product_suggestion(product))
+
+    def remove_product(self, product_id: uuid.UUID) -> None:
+        self.remove(f"product:{product_id}")
+
+    def upsert_category(self, category: models.Category) -> None:
+        self.upsert(_category_suggestion(category))
+
+    def remove_category(self, category_id: uuid.UUID) -> None:
+        self.remove(f"category:{category_id}")
+
+    async def rebuild(self) -> None:
+        """Загрузить товары и категории из БД и заменить индекс целиком"""
+        started = time.perf_counter()
+        self._pending = {}
+        try:
+            async with AsyncSessionLocal() as db:
+                products = (await db.execute(select(models.Product))).scalars().all()
+                categories = (await db.execute(select(models.Category))).scalars().all()
+            pending = self._pending
+        finally:
+            self._pending = None
+        entries = {item.key: item for item in map(_product_suggestion, products)}
+        entries.update((item.key, item) for item in map(_category_suggestion, categories))
+        for key, item in pending.items():
+            if item is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = item
+        words = sorted((word, key) for key, item in entries.items() for word in _entry_words(item))
+        self._entries, self._words = entries, words
+        logger.info(
+            f"🔎 Индекс подсказок: {len(entries)} записей, {len(words)} слов "
+            f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+
+    async def on_invalidation(self, event: InvalidationEvent) -> None:
+        """Перечитать из БД запись, изменённую в другом месте (запись из apply_local уже в событии)"""
+        if event.id is None:
+            await self.rebuild()
+            return
+        model = models.Product if event.entity == "product" else models.Category
+        item = event.obj
+        if item is None and event.action != "delete":
+            async with AsyncSessionLocal() as db:
+                item = await db.get(model, event.id)
+        if item is None:
+            self.remove(f"{event.entity}:{event.id}")
+        elif event.entity == "product":
+            self.upsert_product(item)
+        else:
+            self.upsert_category(item)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"❌ Ошибка построения индекса подсказок: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+search_index = SearchIndex()
+subscribe("product", search_index.on_invalidation)
+subscribe("category", search_index.on_invalidation)
@@ -0,0 +1,287 @@
+"""Счётчики непрочитанного в Redis, обновляемые инкрементально
+
+- `unread:notifications:{user_id}` — непрочитанные уведомления пользователя. Счётчик
+  создаётся лениво (COUNT из БД при первом чтении) и дальше меняется только на дельты
+  из create_notification / mark_notification_read / mark_all_notifications_read.
+- `unread:admin_chats` — hash chat_id -> сообщения пользователя, не прочитанные поддержкой.
+  Сторона пользователя хранится в колонке chats.unread_count.
+
+Дельты применяются только к существующим ключам, поэтому гонка с ленивой инициализацией
+или недоступный Redis дают расхождение, которое исправляет UnreadReconciler: он периодически
+сверяет счётчики с БД и сбрасывает разошедшиеся (они пересчитаются при следующем чтении).
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Optional, Union
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, lambda_stmt, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.db.notification_partitions import retention_cutoff
+from app.metrics import UNREAD_COUNTER_CORRECTIONS
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+UNREAD_RECONCILE_INTERVAL = float(os.getenv("UNREAD_RECONCILE_INTERVAL", "300"))
+# Неиспользуемые счётчики уведомлений истекают и пересчитываются при следующем чтении
+UNREAD_COUNTER_TTL = int(os.getenv("UNREAD_COUNTER_TTL", str(7 * 24 * 3600)))
+
+NOTIFICATIONS_KEY = "unread:notifications:{user_id}"
+ADMIN_CHATS_KEY = "unread:admin_chats"
+# Служебное поле hash: пустой заполненный hash отличается от отсутствующего
+ADMIN_CHATS_READY_FIELD = "_ready"
+RECONCILE_LOCK_KEY = "unread:reconcile:lock"
+
+# KEYS[1] — счётчик, ARGV[1] — дельта, ARGV[2] — TTL. Несуществующий ключ не создаётся.
+_APPLY_DELTA_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0)
+    value = 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return value
+"""
+
+# KEYS[1] — hash, ARGV[1] — поле, ARGV[2] — дельта. Работает только по заполненному hash.
+_APPLY_HASH_DELTA_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], '_ready') == 0 then
+    return nil
+end
+local value = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if value <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    value = 0
+end
+return value
+"""
+
+_apply_delta = async_redis_client.register_script(_APPLY_DELTA_SCRIPT)
+_apply_hash_delta = async_redis_client.register_script(_APPLY_HASH_DELTA_SCRIPT)
+
+UserId = Union[str, uuid.UUID]
+
+
+def _notifications_key(user_id: UserId) -> str:
+    return NOTIFICATIONS_KEY.format(user_id=user_id)
+
+
+# region Уведомления
+def _unread_count_stmt(user_id: uuid.UUID) -> StatementLambdaElement:
+    cutoff = retention_cutoff()
+    return lambda_stmt(
+        lambda: select(func.count(models.Notification.id)).where(
+            models.Notification.user_id == user_id,
+            models.Notification.created_at >= cutoff,
+            ~models.Notification.is_read,
+        )
+    )
+
+
+async def count_unread_notifications(db: AsyncSession, user_id: UserId) -> int:
+    """COUNT непрочитанных уведомлений пользователя в БД"""
+    result = await db.execute(_unread_count_stmt(uuid.UUID(str(user_id))))
+    return result.scalar() or 0
+
+
+async def get_unread_notifications(db: AsyncSession, user_id: UserId) -> int:
+    """Счётчик из Redis; при промахе — COUNT из БД с сохранением в Redis"""
+    key = _notifications_key(user_id)
+    try:
+        cached = await async_redis_client.get(key)
+    except RedisError as e:
+        logger.warning(f"⚠️  Redis недоступен, счётчик уведомлений считается в БД: {e}")
+        return await count_unread_notifications(db, user_id)
+    if cached is not None:
+        return int(cached)
+
+    count = await count_unread_notifications(db, user_id)
+    try:
+        # NX: дельта, успевшая создать значение раньше, не перезаписывается
+        await async_redis_client.set(key, count, ex=UNREAD_COUNTER_TTL, nx=True)
+    except RedisError as e:
+        logger.warning(f"⚠️  Не удалось сохранить счётчик уведомлений {user_id}: {e}")
+    return count
+
+
+async def add_unread_notifications(user_id: UserId, delta: int) -> Optional[int]:
+    """Изменить счётчик на delta, если он уже инициализирован; новое значение или None"""
+    if delta == 0:
+        return None
+    try:
+        value = await _apply_delta(keys=[_notifications_key(user_id)], args=[delta, UNREAD_COUNTER_TTL])
+    except RedisError as e:
+        # Расхождение исправит сверка
+        logger.warning(f"⚠️  Не удалось обновить счётчик уведомлений {user_id}: {e}")
+        return None
+    return None if value is None else int(value)
+
+
+# endregion
+
+
+# region Чаты (сторона поддержки)
+async def _load_admin_chat_counts(db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(
+        select(models.ChatMessage.chat_id, func.count(models.ChatMessage.id))
+        .where(~models.ChatMessage.is_from_admin, ~models.ChatMessage.is_read)
+        .group_by(models.ChatMessage.chat_id)
+    )
+    return {str(chat_id): count for chat_id, count in result.all()}
+
+
+async def _store_admin_chat_counts(counts: dict[str, int]) -> None:
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(ADMIN_CHATS_KEY)
+        pipe.hset(ADMIN_CHATS_KEY, mapping={ADMIN_CHATS_READY_FIELD: 1, **counts})
+        await pipe.execute()
+
+
+def _decode_admin_chat_counts(cached: dict[bytes, bytes]) -> dict[str, int]:
+    counts = {chat_id.decode(): int(count) for chat_id, count in cached.items()}
+    counts.pop(ADMIN_CHATS_READY_FIELD, None)
+    return counts
+
+
+async def get_admin_unread_chats(db: AsyncSession) -> dict[str, int]:
+    """chat_id -> непрочитанные поддержкой сообщения (только чаты с ненулевым счётчиком)"""
+    try:
+        cached = await async_redis_client.hgetall(ADMIN_CHATS_KEY)
+    except RedisError as e:
+        logger.warning(f"⚠️  Redis недоступен, непрочитанные чаты считаются в БД: {e}")
+        return await _load_admin_chat_counts(db)
+    if cached:
+        return _decode_admin_chat_counts(cached)
+
+    counts = await _load_admin_chat_counts(db)
+    try:
+        await _store_admin_chat_counts(counts)
+    except RedisError as e:
+        logger.warning(f"⚠️  Не удалось сохранить непрочитанные чаты: {e}")
+    return counts
+
+
+async def add_admin_unread_chat(chat_id: UserId, delta: int) -> Optional[int]:
+    """Изменить счётчик чата, если hash заполнен; новое значение или None"""
+    try:
+        value = await _apply_hash_delta(keys=[ADMIN_CHATS_KEY], args=[str(chat_id), delta])
+    except RedisError as e:
+        logger.warning(f"⚠️  Не удалось обновить непрочитанные чата {chat_id}: {e}")
+        return None
+    return None if value is None else int(value)
+
+
+async def reset_admin_unread_chat(chat_id: UserId) -> None:
+    try:
+        await async_redis_client.hdel(ADMIN_CHATS_KEY, str(chat_id))
+    except RedisError as e:
+        logger.warning(f"⚠️  Не удалось сбросить непрочитанные чата {chat_id}: {e}")
+
+
+# endregion
+
+
+class UnreadReconciler:
+    """Периодическая сверка счётчиков непрочитанного с БД (одна сверка на все воркеры)"""
+
+    def __init__(self, interval: float = UNREAD_RECONCILE_INTERVAL) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _reconcile_notifications(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            select(models.Notification.user_id, func.count(models.Notification.id))
+            .where(models.Notification.created_at >= retention_cutoff(), ~models.Notification.is_read)
+            .group_by(models.Notification.user_id)
+        )
+        actual = {str(user_id): count for user_id, count in result.all()}
+
+        corrected = 0
+        prefix = NOTIFICATIONS_KEY.format(user_id="")
+        async for key in async_redis_client.scan_iter(match=f"{prefix}*", count=500):
+            cached = await async_redis_client.get(key)
+            user_id = key.decode().removeprefix(prefix)
+            if cached is not None and int(cached) != actual.get(user_id, 0):
+                # Удаляется, а не перезаписывается: так не теряются дельты, пришедшие после COUNT
+                await async_redis_client.delete(key)
+                corrected += 1
+        return corrected
+
+    async def _reconcile_admin_chats(self, db: AsyncSession) -> int:
+        cached = await async_redis_client.hgetall(ADMIN_CHATS_KEY)
+        if not cached:
+            return 0
+        actual = await _load_admin_chat_counts(db)
+        if _decode_admin_chat_counts(cached) == actual:
+            return 0
+        await async_redis_client.delete(ADMIN_CHATS_KEY)
+        return 1
+
+    async def _reconcile_user_chats(self, db: AsyncSession) -> int:
+        # chats.unread_count — сообщения поддержки, не прочитанные пользователем
+        actual = (
+            select(func.count(models.ChatMessage.id))
+            .where(
+                models.ChatMessage.chat_id == models.Chat.id,
+                models.ChatMessage.is_from_admin,
+                ~models.ChatMessage.is_read,
+            )
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(models.Chat)
+            .where(func.coalesce(models.Chat.unread_count, 0) != actual)
+            .values(unread_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def reconcile_once(self) -> None:
+        # Блокировка на интервал: остальные воркеры пропускают этот цикл
+        if not await async_redis_client.set(RECONCILE_LOCK_KEY, 1, ex=max(int(self.interval), 1), nx=True):
+            return
+        async with AsyncSessionLocal() as db:
+            for kind, reconcile in (
+                ("notifications", self._reconcile_notifications),
+                ("admin_chats", self._reconcile_admin_chats),
+                ("user_chats", self._reconcile_user_chats),
+            ):
+                corrected = await reconcile(db)
+                if corrected:
+                    UNREAD_COUNTER_CORRECTIONS.labels(kind).inc(corrected)
+                    logger.info(f"🔁 Сверка непрочитанного ({kind}): исправлено {corrected}")
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сверки счётчиков непрочитанного: {e}")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+unread_reconciler = UnreadReconciler()
@@ -0,0 +1,177 @@
+"""Фоновое удаление пользователей порциями
+
+DELETE /admin/users/{id} помечает профиль удалённым (profiles.deleted_at) и ставит пользователя
+в очередь `users:purge_queue` (Redis), а UserPurger удаляет его данные порциями по
+USER_PURGE_CHUNK_SIZE строк — каждая порция в отдельной короткой транзакции, поэтому удаление
+активного пользователя не держит блокировки на таблицах. Профиль удаляется последним, вместе
+с остатками, появившимися за время удаления. Помеченные профили подхватываются и без очереди,
+поэтому незавершённое удаление продолжится после перезапуска или сбоя Redis.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import ColumnElement, Select, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cart_store import DIRTY_CARTS_KEY, USER_CART_KEY
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.db.sales_rollups import apply_orders
+from app.invalidation import publish
+from app.metrics import USERS_PURGED
+from app.redis_client import async_redis_client
+from app.unread import NOTIFICATIONS_KEY, reset_admin_unread_chat
+
+logger = logging.getLogger(__name__)
+
+USER_PURGE_INTERVAL = float(os.getenv("USER_PURGE_INTERVAL", "5"))
+USER_PURGE_CHUNK_SIZE = int(os.getenv("USER_PURGE_CHUNK_SIZE", "1000"))
+
+PURGE_QUEUE_KEY = "users:purge_queue"
+PURGE_LOCK_KEY = "users:purge:lock"
+# Блокировка продлевается каждой порцией; после падения воркера очередь подхватит другой
+PURGE_LOCK_TTL = 60
+
+
+async def enqueue_user_purge(user_id: uuid.UUID) -> None:
+    try:
+        await async_redis_client.sadd(PURGE_QUEUE_KEY, str(user_id))
+    except RedisError as e:
+        # Профиль уже помечен удалённым — UserPurger найдёт его в БД
+        logger.warning(f"⚠️  Не удалось поставить пользователя {user_id} в очередь удаления: {e}")
+    user_purger.wake()
+
+
+def _user_chats(user_id: uuid.UUID) -> Select:
+    return select(models.Chat.id).where(models.Chat.user_id == user_id)
+
+
+def _purge_steps(user_id: uuid.UUID) -> list[tuple[type[models.Base], ColumnElement[bool]]]:
+    """Таблицы в порядке удаления (дети раньше родителей) и условие по пользователю"""
+    return [
+        (
+            models.ChatMessage,
+            or_(models.ChatMessage.chat_id.in_(_user_chats(user_id)), models.ChatMessage.sender_id == user_id),
+        ),
+        (models.Chat, models.Chat.user_id == user_id),
+        (models.Notification, models.Notification.user_id == user_id),
+        (models.NotificationArchive, models.NotificationArchive.user_id == user_id),
+        (models.Favourite, models.Favourite.user_id == user_id),
+        (models.CartItem, models.CartItem.user_id == user_id),
+        # Позиции заказов удаляются каскадом (order_items.order_id ON DELETE CASCADE)
+        (models.Order, models.Order.user_id == user_id),
+    ]
+
+
+async def _delete_rows(db: AsyncSession, model: type[models.Base], condition: ColumnElement[bool]) -> int:
+    if model is models.Order:
+        # Удалённые заказы уходят и из агрегатов продаж
+        await apply_orders(db, condition, -1)
+    result = await db.execute(delete(model).where(condition).execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+async def _delete_chunk(db: AsyncSession, model: type[models.Base], condition: ColumnElement[bool], limit: int) -> int:
+    ids = (await db.execute(select(model.id).where(condition).limit(limit))).scalars().all()
+    if not ids:
+        return 0
+    deleted = await _delete_rows(db, model, model.id.in_(ids))
+    await db.commit()
+    return deleted
+
+
+class UserPurger:
+    """Удаление пользователей из очереди (одновременно работает один воркер)"""
+
+    def __init__(self, interval: float = USER_PURGE_INTERVAL, chunk_size: int = USER_PURGE_CHUNK_SIZE) -> None:
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def purge_user(self, user_id: uuid.UUID) -> int:
+        """Удалить данные пользователя и профиль; число удалённых строк"""
+        chat_ids = [str(chat_id) for chat_id in await self._chat_ids(user_id)]
+        total = 0
+        async with AsyncSessionLocal() as db:
+            for model, condition in _purge_steps(user_id):
+                while True:
+                    deleted = await _delete_chunk(db, model, condition, self.chunk_size)
+                    total += deleted
+                    await async_redis_client.expire(PURGE_LOCK_KEY, PURGE_LOCK_TTL)
+                    if deleted < self.chunk_size:
+                        break
+
+            # Последняя транзакция: остатки, созданные пользователем во время удаления, и сам профиль
+            for model, condition in _purge_steps(user_id):
+                total += await _delete_rows(db, model, condition)
+            await db.execute(delete(models.Profile).where(models.Profile.id == user_id))
+            await db.commit()
+        await publish("profile", user_id, "delete")
+
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(NOTIFICATIONS_KEY.format(user_id=user_id), USER_CART_KEY.format(owner_id=user_id))
+            pipe.srem(DIRTY_CARTS_KEY, str(user_id))
+            await pipe.execute()
+        for chat_id in chat_ids:
+            await reset_admin_unread_chat(chat_id)
+        return total
+
+    async def _chat_ids(self, user_id: uuid.UUID) -> list[uuid.UUID]:
+        async with AsyncSessionLocal() as db:
+            return list((await db.execute(_user_chats(user_id))).scalars().all())
+
+    async def _deleted_profiles(self) -> list[uuid.UUID]:
+        """Профили, помеченные удалёнными (в том числе не попавшие в очередь)"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(models.Profile.id).where(models.Profile.deleted_at.is_not(None)))
+            return list(result.scalars().all())
+
+    async def run_once(self) -> None:
+        if not await async_redis_client.set(PURGE_LOCK_KEY, 1, ex=PURGE_LOCK_TTL, nx=True):
+            return
+        try:
+            queued = {uuid.UUID(member.decode()) for member in await async_redis_client.smembers(PURGE_QUEUE_KEY)}
+            for user_id in sorted(queued | set(await self._deleted_profiles()), key=str):
+                deleted = await self.purge_user(user_id)
+                # Из очереди — только после успешного удаления профиля
+                await async_redis_client.srem(PURGE_QUEUE_KEY, str(user_id))
+                USERS_PURGED.inc()
+                logger.info(f"🗑️  Пользователь {user_id} удалён, строк: {deleted}")
+        finally:
+            await async_redis_client.delete(PURGE_LOCK_KEY)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка удаления пользователей: {e}")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+user_purger = UserPurger()
@@ -1,5 +1,13 @@
+import asyncio
+import json
+
 from fastapi import WebSocket
 
+from app.metrics import WEBSOCKET_CONNECTIONS
+
+# Очередь событий SSE-подписки; при переполнении медленный клиент теряет самые старые события
+EVENT_QUEUE_SIZE = 100
+
 
 class ConnectionManager:
     def __init__(self) -> None:
@@ -7,6 +15,10 @@ class ConnectionManager:
         self.active_connections: dict[str, WebSocket] = {}
         # Словарь админских подключений: admin_id -> websocket
         self.admin_connections: dict[str, WebSocket] = {}
+        # Подписки Server-Sent Events: user_id -> очереди (вкладок может быть несколько)
+        self.event_streams: dict[str, set[asyncio.Queue]] = {}
+        self.admin_event_streams: dict[str, set[asyncio.Queue]] = {}
+        self._report_connections()
 
     async def connect(self, websocket: WebSocket, user_id: str, is_admin: bool = False) -> None:
         await websocket.accept()
@@ -14,12 +26,20 @@ class ConnectionManager:
             self.admin_connections[user_id] = websocket
         else:
             self.active_connections[user_id] = websocket
+        self._report_connections()
 
     def disconnect(self, user_id: str, is_admin: bool = False) -> None:
         if is_admin and user_id in self.admin_connections:
             del self.admin_connections[user_id]
         elif user_id in self.active_connections:
             del self.active_connections[user_id]
+        self._report_connections()
+
+    def _report_connections(self) -> None:
+        WEBSOCKET_CONNECTIONS.labels("user").set(len(self.active_connections))
+        WEBSOCKET_CONNECTIONS.labels("admin").set(len(self.admin_connections))
+        streams = (*self.event_streams.values(), *self.admin_event_streams.values())
+        WEBSOCKET_CONNECTIONS.labels("sse").set(sum(len(queues) for queues in streams))
 
     async def send_personal_message(self, message: str, user_id: str) -> None:
         if user_id in self.active_connections:
@@ -53,6 +73,58 @@ class ConnectionManager:
         for admin_id in disconnected_admins:
             self.disconnect(admin_id, is_admin=True)
 
+    def subscribe(self, user_id: str, is_admin: bool = False) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        streams = self.admin_event_streams if is_admin else self.event_streams
+        streams.setdefault(user_id, set()).add(queue)
+        self._report_connections()
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue, is_admin: bool = False) -> None:
+        streams = self.admin_event_streams if is_admin else self.event_streams
+        queues = streams.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del streams[user_id]
+        self._report_connections()
+
+    def is_connected(self, user_id: str) -> bool:
+        return (
+            user_id in self.active_connections
+            or user_id in self.admin_connections
+            or user_id in self.event_streams
+            or user_id in self.admin_event_streams
+        )
+
+    @property
+    def has_admin_listeners(self) -> bool:
+        return bool(self.admin_connections or self.admin_event_streams)
+
+    @staticmethod
+    def _enqueue(queues: set[asyncio.Queue], event_type: str, message: str) -> None:
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event_type, message))
+
+    async def push_event(self, user_id: str, event: dict) -> None:
+        """Событие пользователю во все его каналы: WebSocket (пользовательский и админский) и SSE"""
+        message = json.dumps(event)
+        await self.send_personal_message(message, user_id)
+        await self.send_to_admin(message, user_id)
+        self._enqueue(
+            self.event_streams.get(user_id, set()) | self.admin_event_streams.get(user_id, set()),
+            event["type"],
+            message,
+        )
+
+    async def push_event_to_admins(self, event: dict) -> None:
+        message = json.dumps(event)
+        await self.send_to_all_admins(message)
+        for queues in self.admin_event_streams.values():
+            self._enqueue(queues, event["type"], message)
+
 
 # Глобальный экземпляр менеджера
 manager = ConnectionManager()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест витрины: сценарии покупателей и администратора на asyncio + httpx
+
+Каждый виртуальный пользователь в цикле выбирает сценарий по весам: просмотр категорий,
+поиск, корзина с merge после входа, оформление заказа, опрос уведомлений, чат с поддержкой.
+Администратор параллельно отвечает в чатах. По итогам печатается p50/p95/p99 по каждому
+эндпоинту (шаблону маршрута) и сравнение с сохранённым baseline.
+
+Окружение: backend, поднятый на Postgres и Redis из benchmarks/docker-compose.yml
+(см. make load-test-env), с данными из app/db/seeds.py.
+
+Использование:
+  python -m benchmarks.load_test --users 50 --duration 60
+  python -m benchmarks.load_test --save-baseline            # записать baseline
+  python -m benchmarks.load_test --baseline benchmarks/baseline.json --tolerance 0.25
+Код выхода 1, если p95 какого-либо эндпоинта хуже baseline больше чем на tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+from typing import Optional
+
+import httpx
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Регрессия фиксируется, только если p95 вырос и в процентах, и в абсолютном значении
+MIN_REGRESSION_MS = 5.0
+
+SEARCH_TERMS = ["лопата", "семена", "горшок", "грабли", "шланг", "перчатки", "секатор", "удобрение", "pot", "seed"]
+
+
+class Stats:
+    """Латентности и ошибки по ключу "METHOD /шаблон/маршрута" """
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+
+    def record(self, key: str, duration: float, ok: bool) -> None:
+        self.latencies[key].append(duration * 1000)
+        if not ok:
+            self.errors[key] += 1
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        elapsed = time.perf_counter() - self.started
+        result = {}
+        for key, values in sorted(self.latencies.items()):
+            # quantiles требует минимум две точки
+            cuts = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+            result[key] = {
+                "count": len(values),
+                "errors": self.errors.get(key, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50": round(cuts[49], 2),
+                "p95": round(cuts[94], 2),
+                "p99": round(cuts[98], 2),
+            }
+        return result
+
+
+class ApiClient:
+    """Обёртка над httpx.AsyncClient: каждый запрос замеряется под шаблоном маршрута"""
+
+    def __init__(self, base_url: str, stats: Stats, timeout: float) -> None:
+        self.http = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+        self.stats = stats
+
+    async def request(
+        self, method: str, route: str, path: Optional[str] = None, expected: tuple[int, ...] = (200,), **kwargs: object
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, path or route, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(f"{method} {route}", time.perf_counter() - start, ok=False)
+            return None
+        ok = response.status_code in expected
+        self.stats.record(f"{method} {route}", time.perf_counter() - start, ok=ok)
+        return response if ok else None
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+
+class Catalog:
+    """Категории и товары, загруженные один раз перед началом теста"""
+
+    def __init__(self, categories: list[dict], products: list[dict]) -> None:
+        self.categories = categories
+        self.products = products
+
+    def product(self) -> dict:
+        # Популярные товары просматривают чаще: примерно закон Парето по позиции в выдаче
+        index = min(int(random.paretovariate(1.2)) - 1, len(self.products) - 1)
+        return self.products[index]
+
+
+async def load_catalog(base_url: str) -> Catalog:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        categories = (await client.get("/api/categories")).raise_for_status().json()
+        products = (
+            (await client.get("/api/products/category/all", params={"limit": 500, "sortBy": "price"}))
+            .raise_for_status()
+            .json()
+        )
+    if not categories or not products:
+        raise SystemExit("❌ Каталог пуст: заполните БД (python -m app.db.seeds) перед нагрузочным тестом")
+    return Catalog(categories, products)
+
+
+# region Сценарии покупателя
+async def browse_categories(api: ApiClient, catalog: Catalog) -> None:
+    await api.request("GET", "/api/categories")
+    category = random.choice(catalog.categories)
+    await api.request(
+        "GET",
+        "/api/products/category/{category_slug}",
+        f"/api/products/category/{category['slug']}",
+        params={"limit": 20, "offset": random.choice([0, 0, 0, 20, 40])},
+    )
+    await api.request("GET", "/api/products/bestsellers")
+    product = catalog.product()
+    await api.request("GET", "/api/products/slug/{product_slug}", f"/api/products/slug/{product['slug']}")
+
+
+async def search_products(api: ApiClient, catalog: Catalog) -> None:
+    await api.request(
+        "GET",
+        "/api/products/category/{category_slug}",
+        "/api/products/category/all",
+        params={"searchQuery": random.choice(SEARCH_TERMS), "limit": 20, "sortBy": random.choice(["price", "name"])},
+    )
+    product = catalog.product()
+    await api.request("GET", "/api/products/{product_id}", f"/api/products/{product['id']}")
+
+
+async def cart_with_merge(api: ApiClient, catalog: Catalog) -> None:
+    # Гость набирает корзину локально, после входа она сливается с серверной
+    local_cart = [
+        {"productId": product["id"], "quantity": random.randint(1, 3), "priceSnapshot": str(product["price"])}
+        for product in random.sample(catalog.products, k=min(3, len(catalog.products)))
+    ]
+    await api.request("POST", "/api/cart/merge", json={"localCart": local_cart})
+    await api.request("POST", "/api/cart/add", expected=(201,), json={"productId": catalog.product()["id"]})
+    cart = await api.request("GET", "/api/cart")
+    if cart is not None and cart.json():
+        item = random.choice(cart.json())
+        await api.request(
+            "PATCH", "/api/cart/{item_id}", f"/api/cart/{item['id']}", json={"quantity": random.randint(1, 5)}
+        )
+
+
+async def place_order(api: ApiClient, catalog: Catalog) -> None:
+    cart = await api.request("GET", "/api/cart")
+    items = cart.json() if cart is not None else []
+    if not items:
+        product = catalog.product()
+        items = [
+            {"productId": product["id"], "quantity": 1, "priceSnapshot": product["price"], "name": product["name"]}
+        ]
+    order_items = [
+        {
+            "productId": item["productId"],
+            "quantity": item["quantity"],
+            "priceSnapshot": str(item["priceSnapshot"]),
+            "name": item["name"],
+        }
+        for item in items
+    ]
+    total = sum(Decimal(str(item["priceSnapshot"])) * item["quantity"] for item in order_items)
+    order = await api.request(
+        "POST",
+        "/api/orders",
+        expected=(201,),
+        json={
+            "fullName": "Load Test",
+            "email": "loadtest@example.com",
+            "address": "ул. Садовая, 1",
+            "city": "Москва",
+            "postalCode": "101000",
+            "phone": "+70000000000",
+            "totalAmount": str(total),
+            "orderItems": order_items,
+        },
+    )
+    await api.request("DELETE", "/api/cart", expected=(204,))
+    await api.request("GET", "/api/orders")
+    if order is not None:
+        await api.request("GET", "/api/orders/{order_id}", f"/api/orders/{order.json()['id']}")
+
+
+async def poll_notifications(api: ApiClient, catalog: Catalog) -> None:
+    # Клиент опрашивает счётчик чаще, чем открывает сам список
+    for _ in range(3):
+        await api.request("GET", "/api/notifications/unread-count")
+    notifications = await api.request("GET", "/api/notifications", params={"limit": 20})
+    if notifications is not None and notifications.json():
+        await api.request("POST", "/api/notifications/mark-all-read")
+
+
+async def support_chat(api: ApiClient, catalog: Catalog) -> None:
+    chat = await api.request("POST", "/api/chats")
+    if chat is None:
+        return
+    chat_id = chat.json()["id"]
+    await api.request(
+        "POST",
+        "/api/chats/{chat_id}/messages",
+        f"/api/chats/{chat_id}/messages",
+        json={"chatId": chat_id, "message": f"Вопрос по заказу #{random.randint(1, 9999)}"},
+    )
+    await api.request("GET", "/api/chats/{chat_id}", f"/api/chats/{chat_id}")
+
+
+# сценарий -> вес
+JOURNEYS: dict[Callable[[ApiClient, Catalog], Awaitable[None]], int] = {
+    browse_categories: 40,
+    search_products: 25,
+    poll_notifications: 15,
+    cart_with_merge: 10,
+    place_order: 5,
+    support_chat: 5,
+}
+# endregion
+
+
+async def sign_up_and_in(api: ApiClient, run_id: str, index: int) -> bool:
+    email = f"loadtest-{run_id}-{index}@example.com"
+    password = "loadtest-password"
+    await api.request(
+        "POST",
+        "/api/auth/signup",
+        expected=(201,),
+        json={"email": email, "password": password, "confirmPassword": password},
+    )
+    return await api.request("POST", "/api/auth/signin", json={"email": email, "password": password}) is not None
+
+
+async def run_shopper(
+    base_url: str, stats: Stats, catalog: Catalog, run_id: str, index: int, deadline: float, args: argparse.Namespace
+) -> None:
+    api = ApiClient(base_url, stats, args.timeout)
+    try:
+        if not await sign_up_and_in(api, run_id, index):
+            return
+        journeys = list(JOURNEYS)
+        weights = list(JOURNEYS.values())
+        while time.perf_counter() < deadline:
+            journey = random.choices(journeys, weights)[0]
+            await journey(api, catalog)
+            await asyncio.sleep(random.uniform(0, args.think_time))
+    finally:
+        await api.close()
+
+
+async def run_admin(base_url: str, stats: Stats, deadline: float, args: argparse.Namespace) -> None:
+    api = ApiClient(base_url, stats, args.timeout)
+    try:
+        signed_in = await api.request(
+            "POST", "/api/auth/signin", json={"email": args.admin_email, "password": args.admin_password}
+        )
+        if signed_in is None:
+            print("⚠️  Не удалось войти администратором, сценарий чата поддержки пропущен")
+            return
+        while time.perf_counter() < deadline:
+            chats = await api.request("GET", "/api/admin/chats")
+            for chat in (chats.json() if chats is not None else [])[:5]:
+                chat_id = chat["id"]
+                await api.request("GET", "/api/chats/{chat_id}", f"/api/chats/{chat_id}")
+                await api.request(
+                    "POST",
+                    "/api/chats/{chat_id}/messages",
+                    f"/api/chats/{chat_id}/messages",
+                    json={"chatId": chat_id, "message": "Ответ поддержки"},
+                )
+            await asyncio.sleep(args.think_time * 2)
+    finally:
+        await api.close()
+
+
+def print_report(summary: dict[str, dict[str, float]], baseline: Optional[dict], tolerance: float) -> list[str]:
+    """Печатает таблицу и возвращает список регрессий относительно baseline"""
+    regressions = []
+    print(f"\n{'эндпоинт':<52} {'n':>7} {'err':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}  baseline p95")
+    for key, row in summary.items():
+        line = (
+            f"{key:<52} {row['count']:>7} {row['errors']:>5} {row['rps']:>7} "
+            f"{row['p50']:>8} {row['p95']:>8} {row['p99']:>8}"
+        )
+        previous = (baseline or {}).get(key)
+        if previous:
+            delta = row["p95"] - previous["p95"]
+            regressed = row["p95"] > previous["p95"] * (1 + tolerance) and delta > MIN_REGRESSION_MS
+            line += f"  {previous['p95']:>8} ({delta:+.1f} ms){' ❌' if regressed else ''}"
+            if regressed:
+                regressions.append(f"{key}: p95 {previous['p95']} → {row['p95']} ms")
+        print(line)
+    return regressions
+
+
+async def run_load_test(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    random.seed(args.seed)
+    catalog = await load_catalog(args.base_url)
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:8]
+    deadline = time.perf_counter() + args.duration
+    print(
+        f"🚀 {args.users} пользователей, {args.duration} с, {len(catalog.products)} товаров в выборке → {args.base_url}"
+    )
+
+    tasks = [run_shopper(args.base_url, stats, catalog, run_id, i, deadline, args) for i in range(args.users)]
+    if not args.no_admin:
+        tasks.append(run_admin(args.base_url, stats, deadline, args))
+    await asyncio.gather(*tasks)
+    return stats.summary()
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        print(f"ℹ️  Baseline {path} не найден, сравнение пропущено")
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["endpoints"]
+
+
+def save_baseline(path: str, summary: dict[str, dict[str, float]], args: argparse.Namespace) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"users": args.users, "duration": args.duration, "endpoints": summary}, f, indent=2, ensure_ascii=False
+        )
+    print(f"💾 Baseline сохранён в {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API витрины")
+    parser.add_argument("--base-url", default=os.getenv("LOAD_TEST_BASE_URL", "http://localhost:4000"))
+    parser.add_argument("--users", type=int, default=20, help="Количество виртуальных покупателей")
+    parser.add_argument("--duration", type=float, default=60, help="Длительность теста, секунды")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Максимальная пауза между сценариями, секунды")
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут одного запроса, секунды")
+    parser.add_argument("--admin-email", default=os.getenv("LOAD_TEST_ADMIN_EMAIL", "admin@example.com"))
+    parser.add_argument("--admin-password", default=os.getenv("LOAD_TEST_ADMIN_PASSWORD", "adminpassword"))
+    parser.add_argument("--no-admin", action="store_true", help="Не запускать администратора в чатах")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON с результатами для сравнения")
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты как новый baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимый рост p95 относительно baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load_test(args))
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    regressions = print_report(summary, baseline, args.tolerance)
+    total_errors = sum(row["errors"] for row in summary.values())
+    total_requests = sum(row["count"] for row in summary.values())
+    print(f"\nВсего запросов: {total_requests}, ошибок: {total_errors}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, summary, args)
+    if regressions:
+        print("\n❌ Регрессии относительно baseline:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
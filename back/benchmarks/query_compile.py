@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк накладных расходов на построение и компиляцию горячих SQL-запросов
+
+Сравнивает для каждого запроса три варианта:
+  - select без кэша: запрос строится и компилируется на каждый вызов;
+  - select + кэш компиляции: строится каждый раз, SQL берётся из кэша по ключу;
+  - lambda_stmt: ключ кэша вычисляется по коду лямбды, построение запроса пропускается.
+
+С флагом --db дополнительно выполняет запросы на реальной БД (DATABASE_URL) с выключенным
+и включённым кэшем prepared statements asyncpg.
+
+Использование:
+  python -m benchmarks.query_compile [--iterations 20000] [--db] [--db-iterations 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections.abc import Callable
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.env_setup  # noqa: F401, I001
+from sqlalchemy import func, lambda_stmt, select
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.util import LRUCache
+
+from app.db import models
+from app.db.database import DATABASE_URL, PREPARED_STATEMENT_CACHE_SIZE
+from app.routers.cart import _cart_items_stmt
+from app.routers.notifications import _unread_count_stmt
+from app.routers.products import _product_by_id_stmt, _product_by_slug_stmt
+
+
+def _plain_product_by_slug(product_slug: str) -> ClauseElement:
+    return (
+        select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.slug == product_slug)
+    )
+
+
+def _plain_product_by_id(product_id: uuid.UUID) -> ClauseElement:
+    return select(models.Product).options(joinedload(models.Product.category)).filter(models.Product.id == product_id)
+
+
+def _plain_cart_items(user_id: uuid.UUID) -> ClauseElement:
+    return (
+        select(models.CartItem).options(joinedload(models.CartItem.product)).filter(models.CartItem.user_id == user_id)
+    )
+
+
+def _plain_unread_count(user_id: uuid.UUID) -> ClauseElement:
+    return select(func.count(models.Notification.id)).filter(
+        models.Notification.user_id == user_id, ~models.Notification.is_read
+    )
+
+
+def _plain_profile(profile_id: uuid.UUID) -> ClauseElement:
+    return select(models.Profile).where(models.Profile.id == profile_id)
+
+
+def _lambda_profile(profile_id: uuid.UUID) -> ClauseElement:
+    return lambda_stmt(lambda: select(models.Profile).where(models.Profile.id == profile_id))
+
+
+def _uuid_arg() -> uuid.UUID:
+    return uuid.uuid4()
+
+
+def _slug_arg() -> str:
+    return f"product-{uuid.uuid4().hex[:8]}"
+
+
+# название -> (обычный select, lambda_stmt, генератор аргумента)
+QUERIES: dict[str, tuple[Callable, Callable, Callable]] = {
+    "product by slug": (_plain_product_by_slug, _product_by_slug_stmt, _slug_arg),
+    "product by id": (_plain_product_by_id, _product_by_id_stmt, _uuid_arg),
+    "cart by user": (_plain_cart_items, _cart_items_stmt, _uuid_arg),
+    "unread count": (_plain_unread_count, _unread_count_stmt, _uuid_arg),
+    "current user profile": (_plain_profile, _lambda_profile, _uuid_arg),
+}
+
+
+def _compile_cached(stmt: ClauseElement, dialect: asyncpg_dialect, cache: LRUCache) -> None:
+    # Тот же путь, что проходит Connection.execute(): ключ кэша -> поиск -> компиляция при промахе
+    stmt._compile_w_cache(
+        dialect, compiled_cache=cache, column_keys=[], for_executemany=False, schema_translate_map=None
+    )
+
+
+def _measure(fn: Callable[[], None], iterations: int) -> float:
+    """Среднее время одного вызова, микросекунды"""
+    for _ in range(min(iterations // 10, 1000)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def _bench_query(
+    plain: Callable, with_lambda: Callable, make_arg: Callable, dialect: asyncpg_dialect, iterations: int
+) -> tuple[float, float, float]:
+    args = [make_arg() for _ in range(64)]
+    counter = iter(range(10**12))
+    cache = LRUCache(1000)
+    lambda_cache = LRUCache(1000)
+
+    def next_arg() -> object:
+        return args[next(counter) % len(args)]
+
+    return (
+        _measure(lambda: plain(next_arg()).compile(dialect=dialect), iterations),
+        _measure(lambda: _compile_cached(plain(next_arg()), dialect, cache), iterations),
+        _measure(lambda: _compile_cached(with_lambda(next_arg()), dialect, lambda_cache), iterations),
+    )
+
+
+def run_compile_benchmark(iterations: int) -> None:
+    dialect = asyncpg_dialect()
+    print(f"Построение + компиляция, мкс на запрос ({iterations} итераций)")
+    print(f"{'запрос':<22} {'без кэша':>10} {'select+кэш':>11} {'lambda':>8} {'выигрыш':>8}")
+    for name, (plain, with_lambda, make_arg) in QUERIES.items():
+        uncached, cached, lambda_cached = _bench_query(plain, with_lambda, make_arg, dialect, iterations)
+        print(f"{name:<22} {uncached:>10.1f} {cached:>11.1f} {lambda_cached:>8.1f} {cached / lambda_cached:>7.1f}x")
+
+
+async def _run_db_queries(cache_size: int, iterations: int) -> float:
+    db_engine = create_async_engine(
+        DATABASE_URL, pool_size=1, connect_args={"prepared_statement_cache_size": cache_size}
+    )
+    try:
+        async with db_engine.connect() as conn:
+            product_id = (await conn.execute(select(models.Product.id).limit(1))).scalar()
+            user_id = (await conn.execute(select(models.Profile.id).limit(1))).scalar() or uuid.uuid4()
+            statements = [
+                _product_by_id_stmt(product_id or uuid.uuid4()),
+                _cart_items_stmt(user_id),
+                _unread_count_stmt(user_id),
+                _lambda_profile(user_id),
+            ]
+            start = time.perf_counter()
+            for i in range(iterations):
+                (await conn.execute(statements[i % len(statements)])).all()
+            return (time.perf_counter() - start) / iterations * 1_000_000
+    finally:
+        await db_engine.dispose()
+
+
+async def run_db_benchmark(iterations: int) -> None:
+    cache_size = PREPARED_STATEMENT_CACHE_SIZE or 256
+    print(f"\nВыполнение горячих запросов на БД, мкс на запрос ({iterations} итераций)")
+    without_cache = await _run_db_queries(0, iterations)
+    with_cache = await _run_db_queries(cache_size, iterations)
+    print(f"prepared_statement_cache_size=0: {without_cache:.1f}")
+    print(f"prepared_statement_cache_size={cache_size}: {with_cache:.1f} ({without_cache / with_cache:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк компиляции горячих SQL-запросов")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--db", action="store_true", help="Также выполнить запросы на БД из DATABASE_URL")
+    parser.add_argument("--db-iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    run_compile_benchmark(args.iterations)
+    if args.db:
+        asyncio.run(run_db_benchmark(args.db_iterations))
+
+
+if __name__ == "__main__":
+    main()
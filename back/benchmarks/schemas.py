@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки валидации и сериализации схем ответов (app/schemas.py)
+
+Для каждой схемы и размера выборки (по умолчанию 1/100/10000 строк) измеряются:
+  - validate      — model_validate на каждую строку (как в cart.get_cart, get_user_notifications);
+  - attributes    — model_validate(from_attributes) из ORM-подобных объектов (response_model FastAPI);
+  - construct     — model_construct без валидации;
+  - adapter       — TypeAdapter(list[Schema]).validate_python на весь список;
+  - dump          — model_dump(mode="json", by_alias=True) на каждую модель;
+  - dump_adapter  — TypeAdapter(list[Schema]).dump_python(mode="json", by_alias=True) на весь список.
+
+Результаты можно сохранить как baseline и сравнивать с ним, чтобы оптимизированные пути
+построения ответов (model_construct, TypeAdapter) не деградировали.
+
+Использование:
+  python -m benchmarks.schemas [--sizes 1,100,10000] [--schema ProductInDB]
+  python -m benchmarks.schemas --save-baseline
+  python -m benchmarks.schemas --baseline benchmarks/schemas_baseline.json --tolerance 0.3
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+from collections.abc import Callable
+from datetime import UTC, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from pydantic import BaseModel, TypeAdapter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas import (  # noqa: E402
+    CartItemWithProduct,
+    CategoryInDB,
+    ChatInDB,
+    ChatMessageInDB,
+    NotificationInDB,
+    OrderInDB,
+    ProductInDB,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas_baseline.json")
+NOW = datetime(2025, 6, 1, 12, 0, tzinfo=UTC)
+# Поля JSONB: в ORM-объекте это обычные словари
+JSON_FIELDS = {"characteristics", "notificationData"}
+
+
+# region Фабрики строк: словари в том виде, в каком их собирают обработчики
+def _category_row(i: int) -> dict:
+    return {"id": uuid.uuid4(), "name": f"Категория {i}", "slug": f"category-{i}", "image_url": "/images/c.jpg"}
+
+
+def _product_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "name": f"Товар {i}",
+        "slug": f"product-{i}",
+        "description": "Описание товара",
+        "price": Decimal("1299.90"),
+        "discount": Decimal("10.00") if i % 5 == 0 else None,
+        "characteristics": {"material": "Сталь", "weight": "1.2 кг"},
+        "image_url": "/images/p.jpg",
+        "category_id": uuid.uuid4(),
+        "category": _category_row(i),
+        "created_at": NOW,
+        "updated_at": None,
+        "times_ordered": i,
+        "offline_purchases": 0,
+    }
+
+
+def _cart_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "product_id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "quantity": 1 + i % 4,
+        "price_snapshot": 1299.9,
+        "name": f"Товар {i}",
+        "slug": f"product-{i}",
+        "description": "Описание товара",
+        "imageUrl": "/images/p.jpg",
+        "categoryId": uuid.uuid4(),
+    }
+
+
+def _notification_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": str(uuid.uuid4()),
+        "title": f"Заказ #{i}",
+        "message": "Статус заказа изменён",
+        "type": "order_status",
+        "isRead": i % 3 == 0,
+        "createdAt": NOW.isoformat(),
+        "notificationData": {"orderId": str(uuid.uuid4()), "status": "shipped"},
+    }
+
+
+def _chat_message_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "chat_id": str(uuid.uuid4()),
+        "sender_id": str(uuid.uuid4()),
+        "message": f"Сообщение {i}",
+        "is_from_admin": i % 2 == 1,
+        "is_read": True,
+        "created_at": NOW.isoformat(),
+        "senderName": "Покупатель",
+        "senderEmail": "user@example.com",
+    }
+
+
+def _chat_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "is_active": True,
+        "unread_count": i % 3,
+        "last_message_at": NOW.isoformat(),
+        "created_at": NOW.isoformat(),
+        "userName": "Покупатель",
+        "userEmail": "user@example.com",
+        "lastMessage": "Здравствуйте",
+        # Детальный просмотр чата: сообщения вложены в ответ
+        "messages": [_chat_message_row(j) for j in range(5)],
+    }
+
+
+def _order_row(i: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "status": "pending",
+        "created_at": NOW,
+        "full_name": "Покупатель",
+        "email": "user@example.com",
+        "address": "ул. Садовая, 1",
+        "city": "Москва",
+        "postal_code": "101000",
+        "phone": "+70000000000",
+        "total_amount": Decimal("2599.80"),
+        "order_items": [
+            {
+                "id": uuid.uuid4(),
+                "order_id": uuid.uuid4(),
+                "product_id": uuid.uuid4(),
+                "quantity": 2,
+                "price_snapshot": Decimal("1299.90"),
+                "name": f"Товар {i}",
+                "image_url": None,
+            }
+            for _ in range(3)
+        ],
+    }
+
+
+# endregion
+
+SCHEMAS: dict[str, tuple[type[BaseModel], Callable[[int], dict]]] = {
+    "CategoryInDB": (CategoryInDB, _category_row),
+    "ProductInDB": (ProductInDB, _product_row),
+    "CartItemWithProduct": (CartItemWithProduct, _cart_row),
+    "NotificationInDB": (NotificationInDB, _notification_row),
+    "ChatMessageInDB": (ChatMessageInDB, _chat_message_row),
+    "ChatInDB": (ChatInDB, _chat_row),
+    "OrderInDB": (OrderInDB, _order_row),
+}
+
+
+def _as_object(value: object) -> object:
+    """Словарь -> объект с атрибутами, как строка ORM для from_attributes (JSONB-поля остаются словарями)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: item if key in JSON_FIELDS else _as_object(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_as_object(item) for item in value]
+    return value
+
+
+def _time_per_call(fn: Callable[[], object]) -> float:
+    """Лучшее из трёх повторов время одного вызова fn, микросекунды"""
+    timer = timeit.Timer(fn)
+    # autorange подбирает число вызовов так, чтобы замер занимал не меньше 0.2 с
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number * 1_000_000
+
+
+def bench_schema(schema: type[BaseModel], make_row: Callable[[int], dict], size: int) -> dict[str, float]:
+    rows = [make_row(i) for i in range(size)]
+    objects = [_as_object(row) for row in rows]
+    adapter = TypeAdapter(list[schema])
+    models = adapter.validate_python(rows)
+
+    return {
+        "validate": _time_per_call(lambda: [schema.model_validate(row) for row in rows]),
+        "attributes": _time_per_call(lambda: [schema.model_validate(obj, from_attributes=True) for obj in objects]),
+        "construct": _time_per_call(lambda: [schema.model_construct(**row) for row in rows]),
+        "adapter": _time_per_call(lambda: adapter.validate_python(rows)),
+        "dump": _time_per_call(lambda: [model.model_dump(mode="json", by_alias=True) for model in models]),
+        "dump_adapter": _time_per_call(lambda: adapter.dump_python(models, mode="json", by_alias=True)),
+    }
+
+
+def _format_time(microseconds: float) -> str:
+    if microseconds >= 1000:
+        return f"{microseconds / 1000:.2f} ms"
+    return f"{microseconds:.1f} µs"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки схем ответов")
+    parser.add_argument("--sizes", default="1,100,10000", help="Размеры выборок через запятую")
+    parser.add_argument("--schema", action="append", choices=sorted(SCHEMAS), help="Только указанные схемы")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON с результатами для сравнения")
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты как новый baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Допустимое замедление относительно baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results: dict[str, dict[str, float]] = {}
+    regressions = []
+    variants = ["validate", "attributes", "construct", "adapter", "dump", "dump_adapter"]
+    print(f"{'схема':<22} {'строк':>6} " + " ".join(f"{variant:>13}" for variant in variants))
+    for name in args.schema or SCHEMAS:
+        schema, make_row = SCHEMAS[name]
+        for size in sizes:
+            key = f"{name}[{size}]"
+            results[key] = bench_schema(schema, make_row, size)
+            print(
+                f"{name:<22} {size:>6} " + " ".join(f"{_format_time(results[key][v]):>13}" for v in variants),
+                flush=True,
+            )
+            for variant, value in results[key].items():
+                previous = baseline.get(key, {}).get(variant)
+                if previous and value > previous * (1 + args.tolerance):
+                    regressions.append(f"{key} {variant}: {_format_time(previous)} → {_format_time(value)}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline сохранён в {args.baseline}")
+    if regressions:
+        print("\n❌ Замедление относительно baseline:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,31 @@ from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from decimal import Decimal
 
-import redis
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
 import app.env_setup
-from app.db.database import check_database_connection
-from app.routers import auth, cart, categories, chat, favorites, notifications, orders, products
+from app.cart_store import cart_persister
+from app.catalog_snapshot import catalog_snapshot
+from app.compression import CompressionMiddleware
+from app.db.query_budget import QueryBudgetMiddleware
+from app.health import health_monitor
+from app.images import image_processor
+from app.invalidation import invalidation_listener
+from app.metrics import MetricsMiddleware, mark_process_dead, metrics_access_allowed, render_metrics
+from app.notification_retention import notification_maintenance
+from app.profiling import ProfilingMiddleware
+from app.rate_limit import RateLimitHeadersMiddleware, client_ip
+from app.redis_client import async_redis_client
+from app.routers import auth, cart, categories, chat, favorites, images, notifications, orders, products
 from app.routers.admin import router as admin_router
+from app.routers.notifications import notification_coalescer
+from app.search_index import search_index
+from app.unread import unread_reconciler
+from app.user_purge import user_purger
 
 
 class CustomJsonEncoder(json.JSONEncoder):
@@ -36,14 +52,40 @@ print("REDIS_URL:", "***" if os.getenv("REDIS_URL") else "НЕ ЗАДАН")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    # Проверяем подключение к базе данных при запуске
+    # Проверяем подключение к базе данных и Redis при запуске и дальше в фоне
     print("🔄 Проверка подключения к базе данных...")
-    db_connected = await check_database_connection()
-    if not db_connected:
-        print("⚠️  Предупреждение: Не удалось подключиться к базе данных при запуске")
+    await health_monitor.start()
+    if not health_monitor.ready:
+        print(f"⚠️  Предупреждение: зависимости недоступны при запуске: {health_monitor.status}")
+    # Периодическая сверка счётчиков непрочитанного с БД
+    unread_reconciler.start()
+    # Партиции уведомлений наперёд и перенос старых уведомлений в архив
+    notification_maintenance.start()
+    # Отложенная запись корзин из Redis (CART_STORE=redis)
+    cart_persister.start()
+    # Фоновое удаление пользователей порциями
+    user_purger.start()
+    # Индекс подсказок поиска в памяти: загрузка и периодическая пересборка
+    search_index.start()
+    # Снимок каталога в памяти (CATALOG_SNAPSHOT=true)
+    catalog_snapshot.start()
+    # События инвалидации кэшей от других воркеров и триггеров БД
+    invalidation_listener.start()
     yield
     # Cleanup при завершении приложения
     print("🔄 Завершение работы приложения...")
+    await invalidation_listener.stop()
+    image_processor.stop()
+    await catalog_snapshot.stop()
+    await search_index.stop()
+    await user_purger.stop()
+    await cart_persister.stop()
+    await notification_coalescer.stop()
+    await notification_maintenance.stop()
+    await unread_reconciler.stop()
+    await health_monitor.stop()
+    await async_redis_client.aclose()
+    mark_process_dead()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -73,6 +115,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Заголовки X-RateLimit-* из зависимостей rate_limit, в том числе для маршрутов с собственным Response
+app.add_middleware(RateLimitHeadersMiddleware)
+# Профилирование отдельных запросов администратора (X-Profile: 1); внутри QueryBudgetMiddleware,
+# чтобы видеть его статистику SQL
+app.add_middleware(ProfilingMiddleware)
+# Подсчёт SQL-запросов на каждый HTTP-запрос (режим задается QUERY_BUDGET_MODE)
+app.add_middleware(QueryBudgetMiddleware)
+# Сжатие gzip/brotli; снаружи QueryBudget/Profiling, чтобы сжатие не попадало в их замеры
+app.add_middleware(CompressionMiddleware)
+# Метрики Prometheus (latency по маршрутам); добавляется последним, чтобы учитывать все middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin_router, prefix="/api")
@@ -81,37 +135,35 @@ app.include_router(categories.router, prefix="/api")
 app.include_router(products.router, prefix="/api")
 app.include_router(orders.router, prefix="/api")
 app.include_router(favorites.router, prefix="/api")
+app.include_router(images.router, prefix="/api")
 app.include_router(notifications.router)  # Без префикса, так как уже есть в роутах
 app.include_router(chat.router)  # Без префикса, так как у него есть и API и WebSocket
 
 
 @app.get("/health")
 async def health_check() -> dict[str, str]:
-    db_status = "unknown"
-    redis_status = "unknown"
-
-    # Тест подключения к PostgreSQL через новую функцию
-    try:
-        db_connected = await check_database_connection()
-        db_status = "OK" if db_connected else "Connection failed"
-    except Exception as e:
-        db_status = f"Error: {e}"
-
-    # Тест подключения к Redis
-    try:
-        # Используем REDIS_URL напрямую
-        redis_url = os.getenv("REDIS_URL")
-        if redis_url:
-            r = redis.from_url(redis_url)
-            r.ping()
-            print("Redis: подключение успешно!")
-            redis_status = "OK"
-        else:
-            redis_status = "REDIS_URL not set"
-    except Exception as e:
-        redis_status = f"Error: {e}"
-
-    return {"database": db_status, "redis": redis_status}
+    """Состояние зависимостей из кеша фоновой проверки (без обращения к БД и Redis)"""
+    return dict(health_monitor.status)
+
+
+@app.get("/livez", include_in_schema=False)
+async def liveness() -> dict[str, str]:
+    """Процесс жив и event loop отвечает"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness() -> JSONResponse:
+    """Готовность принимать трафик: последний результат фоновой проверки Postgres и Redis"""
+    return JSONResponse(status_code=200 if health_monitor.ready else 503, content=health_monitor.snapshot())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request) -> Response:
+    """Метрики в формате Prometheus (доступ — METRICS_TOKEN или METRICS_ALLOWED_NETWORKS)"""
+    if not metrics_access_allowed(client_ip(request), request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
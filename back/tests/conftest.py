@@ -0,0 +1,15 @@
+import os
+
+import fakeredis
+import pytest
+
+# Модули app требуют адреса БД и Redis при импорте; соединения создаются лениво,
+# поэтому тестам без БД достаточно любых значений
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://postgres@localhost:5432/garden")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+
+
+@pytest.fixture
+def fake_redis() -> fakeredis.FakeAsyncRedis:
+    """Отдельный Redis в памяти на тест (Lua-скрипты — через lupa)"""
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
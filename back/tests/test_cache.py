@@ -0,0 +1,169 @@
+"""Кэш в памяти процесса: одна загрузка на одновременные промахи, сброс группы отбрасывает начатые загрузки"""
+
+import asyncio
+import types
+from typing import Optional
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import cache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Загрузка, которая завершается только по команде"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error: Optional[BaseException] = None
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"value-{self.calls}"
+
+
+@pytest.fixture(autouse=True)
+def groups(monkeypatch: pytest.MonkeyPatch) -> dict[str, list[cache.TTLCache]]:
+    registered: dict[str, list[cache.TTLCache]] = {}
+    monkeypatch.setattr(cache, "_GROUPS", registered)
+    return registered
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _requests(name: str, result: str) -> float:
+    return REGISTRY.get_sample_value("cache_requests_total", {"cache": name, "result": result}) or 0.0
+
+
+def test_concurrent_misses_share_one_load() -> None:
+    store = cache.TTLCache("test_single_flight", group="test", ttl=60)
+
+    async def scenario() -> None:
+        loader = Loader()
+        requests = [asyncio.create_task(store.get_or_load("key", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+
+        assert await asyncio.gather(*requests) == ["value-1"] * 3
+        assert loader.calls == 1
+        assert await store.get_or_load("key", loader) == "value-1"
+        assert not store._loading
+
+    asyncio.run(scenario())
+    assert [_requests("test_single_flight", result) for result in ("miss", "wait", "hit")] == [1, 2, 1]
+
+
+def test_failed_load_reaches_waiters_and_is_not_cached() -> None:
+    store = cache.TTLCache("test_failed_load", group="test", ttl=60)
+
+    async def scenario() -> None:
+        loader = Loader()
+        loader.error = RuntimeError("db is down")
+        requests = [asyncio.create_task(store.get_or_load("key", loader)) for _ in range(2)]
+        await asyncio.sleep(0)
+        loader.release.set()
+
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(store) == 0 and not store._loading
+
+        loader.error = None
+        assert await store.get_or_load("key", loader) == "value-2"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_load() -> None:
+    store = cache.TTLCache("test_cancelled_waiter", group="test", ttl=60)
+
+    async def scenario() -> None:
+        loader = Loader()
+        first = asyncio.create_task(store.get_or_load("key", loader))
+        waiter = asyncio.create_task(store.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+
+        assert await first == "value-1"
+        assert waiter.cancelled()
+        assert store.get("key") == (True, "value-1")
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_load_drops_stale_value() -> None:
+    store = cache.TTLCache("test_generation", group="catalog_test", ttl=60)
+
+    async def scenario() -> None:
+        stale = Loader()
+        before = asyncio.create_task(store.get_or_load("key", stale))
+        await asyncio.sleep(0)
+        cache.invalidate_group("catalog_test")
+
+        # Запрос после сброса не ждёт загрузку, начатую до него, а загружает заново
+        fresh = Loader()
+        after = asyncio.create_task(store.get_or_load("key", fresh))
+        await asyncio.sleep(0)
+        stale.release.set()
+        assert await before == "value-1"
+        assert store.get("key") == (False, None)
+        assert "key" in store._loading
+
+        fresh.release.set()
+        assert await after == "value-1"
+        assert fresh.calls == 1
+
+    asyncio.run(scenario())
+    assert store.get("key") == (True, "value-1")
+
+
+def test_invalidate_group_clears_only_its_caches() -> None:
+    catalog = cache.TTLCache("test_group_catalog", group="catalog_test", ttl=60)
+    other = cache.TTLCache("test_group_other", group="other_test", ttl=60)
+    catalog.set("key", "catalog")
+    other.set("key", "other")
+
+    cache.invalidate_group("catalog_test")
+    cache.invalidate_group("missing_group")
+
+    assert len(catalog) == 0
+    assert other.get("key") == (True, "other")
+
+
+def test_entries_expire_after_ttl(clock: Clock) -> None:
+    store = cache.TTLCache("test_ttl", group="test", ttl=60)
+    store.set("key", "value")
+
+    clock.now += 59
+    assert store.get("key") == (True, "value")
+    clock.now += 1
+    assert store.get("key") == (False, None)
+    assert len(store) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock: Clock) -> None:
+    store = cache.TTLCache("test_lru", group="test", ttl=60, max_entries=2)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")
+    store.set("c", 3)
+
+    assert [store.get(key)[0] for key in ("a", "b", "c")] == [True, False, True]
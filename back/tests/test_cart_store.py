@@ -0,0 +1,280 @@
+"""Корзины в Redis: атомарное добавление, слияние корзины гостя, отложенная запись под блокировкой с токеном"""
+
+import asyncio
+import json
+import uuid
+from decimal import Decimal
+from typing import Any, Optional
+
+import fakeredis
+import pytest
+from sqlalchemy.sql import Delete, Insert
+
+from app import cart_store
+from app.db import models
+
+USER = cart_store.CartOwner(str(uuid.UUID(int=1)))
+GUEST = cart_store.CartOwner(str(uuid.UUID(int=2)), is_guest=True)
+CATEGORY_ID = uuid.UUID(int=100)
+
+
+def _product(number: int) -> models.Product:
+    return models.Product(
+        id=uuid.UUID(int=1000 + number),
+        name=f"Товар {number}",
+        slug=f"product-{number}",
+        price=Decimal("10.00"),
+        category_id=CATEGORY_ID,
+    )
+
+
+class FakeScalars:
+    def __init__(self, rows: list[Any]) -> None:
+        self.rows = rows
+
+    def unique(self) -> "FakeScalars":
+        return self
+
+    def all(self) -> list[Any]:
+        return self.rows
+
+
+class FakeResult:
+    def __init__(self, rows: list[Any]) -> None:
+        self.rows = rows
+
+    def scalars(self) -> FakeScalars:
+        return FakeScalars(self.rows)
+
+
+class FakeSession:
+    """Отдаёт заданные результаты SELECT по порядку; DELETE и INSERT только запоминает"""
+
+    def __init__(self, *results: list[Any]) -> None:
+        self.results = list(results)
+        self.statements: list[tuple[Any, Optional[list[dict]]]] = []
+        self.committed = False
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+    async def execute(self, statement: Any, params: Optional[list[dict]] = None) -> FakeResult:  # noqa: ANN401
+        self.statements.append((statement, params))
+        if isinstance(statement, (Delete, Insert)):
+            return FakeResult([])
+        return FakeResult(self.results.pop(0))
+
+    async def commit(self) -> None:
+        self.committed = True
+
+
+@pytest.fixture(autouse=True)
+def redis(fake_redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeAsyncRedis:
+    monkeypatch.setattr(cart_store, "async_redis_client", fake_redis)
+    for name, script in (
+        ("_add_item", cart_store.ADD_ITEM_SCRIPT),
+        ("_set_quantity", cart_store.SET_QUANTITY_SCRIPT),
+        ("_release_lock", cart_store.RELEASE_LOCK_SCRIPT),
+    ):
+        monkeypatch.setattr(cart_store, name, fake_redis.register_script(script))
+    return fake_redis
+
+
+def _session(monkeypatch: pytest.MonkeyPatch, session: FakeSession) -> FakeSession:
+    monkeypatch.setattr(cart_store, "AsyncSessionLocal", lambda: session)
+    return session
+
+
+async def _cart(redis: fakeredis.FakeAsyncRedis, owner: cart_store.CartOwner) -> dict[str, dict[str, Any]]:
+    return {item["product_id"]: item for item in cart_store._decode_items(await redis.hgetall(owner.key))}
+
+
+def test_add_item_increments_existing_position_and_marks_user_dirty(redis: fakeredis.FakeAsyncRedis) -> None:
+    product = _product(1)
+
+    async def scenario() -> None:
+        first = await cart_store.add_item(FakeSession([]), USER, product, 2, Decimal("10.00"))
+        second = await cart_store.add_item(FakeSession(), USER, product, 3, Decimal("9.50"))
+
+        assert second["id"] == first["id"]
+        assert (second["quantity"], second["price_snapshot"]) == (5, "9.50")
+        assert await redis.smembers(cart_store.DIRTY_CARTS_KEY) == {USER.owner_id.encode()}
+        assert 0 < await redis.ttl(USER.key) <= cart_store.CART_TTL
+
+    asyncio.run(scenario())
+
+
+def test_guest_cart_is_never_marked_dirty(redis: fakeredis.FakeAsyncRedis) -> None:
+    async def scenario() -> None:
+        db = FakeSession()
+        await cart_store.add_item(db, GUEST, _product(1), 1, Decimal("10.00"))
+        await cart_store.clear(GUEST)
+
+        assert db.statements == []
+        assert await redis.exists(GUEST.key, cart_store.DIRTY_CARTS_KEY) == 0
+
+    asyncio.run(scenario())
+
+
+def test_load_from_db_keeps_positions_written_before_it(redis: fakeredis.FakeAsyncRedis) -> None:
+    product = _product(1)
+    stored = models.CartItem(
+        id=uuid.UUID(int=50), product_id=product.id, quantity=1, price_snapshot=Decimal("10.00"), product=product
+    )
+    other = _product(2)
+    stored_other = models.CartItem(
+        id=uuid.UUID(int=51), product_id=other.id, quantity=4, price_snapshot=Decimal("7.00"), product=other
+    )
+
+    async def scenario() -> None:
+        # Позиция попала в Redis раньше загрузки корзины из cart_items
+        newer = cart_store._item_payload(str(uuid.UUID(int=60)), product, 3, Decimal("10.00"))
+        await redis.hset(USER.key, str(product.id), json.dumps(newer))
+
+        db = FakeSession([stored, stored_other])
+        items = {item["product_id"]: item for item in await cart_store.get_items(db, USER)}
+        assert (items[str(product.id)]["id"], items[str(product.id)]["quantity"]) == (str(uuid.UUID(int=60)), 3)
+        assert items[str(other.id)]["quantity"] == 4
+
+        # Загруженная корзина больше не читается из БД
+        await cart_store.get_items(db, USER)
+        assert len(db.statements) == 1
+
+    asyncio.run(scenario())
+
+
+def test_set_quantity_ignores_replaced_position(redis: fakeredis.FakeAsyncRedis) -> None:
+    product = _product(1)
+
+    async def scenario() -> None:
+        item = await cart_store.add_item(FakeSession([]), USER, product, 1, Decimal("10.00"))
+        updated = await cart_store.set_quantity(FakeSession(), USER, uuid.UUID(item["id"]), 7)
+        assert updated["quantity"] == 7
+        assert await cart_store.set_quantity(FakeSession(), USER, uuid.UUID(int=99), 1) is None
+        assert (await _cart(redis, USER))[str(product.id)]["quantity"] == 7
+
+    asyncio.run(scenario())
+
+
+def test_merge_sums_guest_cart_skips_deleted_products_and_drops_guest_key(redis: fakeredis.FakeAsyncRedis) -> None:
+    kept, deleted, extra = _product(1), _product(2), _product(3)
+
+    async def scenario() -> None:
+        await cart_store.add_item(FakeSession(), GUEST, kept, 2, Decimal("10.00"))
+        await cart_store.add_item(FakeSession(), GUEST, deleted, 1, Decimal("5.00"))
+        await cart_store.add_item(FakeSession([]), USER, kept, 1, Decimal("10.00"))
+
+        # Товары одним запросом; deleted в нём уже нет
+        db = FakeSession([kept, extra])
+        items = await cart_store.merge_items(db, USER, [(extra.id, 1, Decimal("3.00"))], guest=GUEST)
+
+        assert {item["product_id"]: item["quantity"] for item in items} == {str(kept.id): 3, str(extra.id): 1}
+        assert len(db.statements) == 1
+        assert await redis.exists(GUEST.key) == 0
+
+    asyncio.run(scenario())
+
+
+def test_flush_rewrites_user_positions_and_drops_missing_users_and_products(
+    redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    other = cart_store.CartOwner(str(uuid.UUID(int=3)))
+    kept, deleted = _product(1), _product(2)
+
+    async def scenario() -> None:
+        await cart_store.add_item(FakeSession([]), USER, kept, 2, Decimal("10.00"))
+        await cart_store.add_item(FakeSession(), USER, deleted, 1, Decimal("5.00"))
+        await cart_store.add_item(FakeSession([]), other, kept, 1, Decimal("10.00"))
+        # Пользователь other удалён, товар deleted тоже
+        db = _session(monkeypatch, FakeSession([uuid.UUID(USER.owner_id)], [kept.id]))
+
+        assert await cart_store.CartPersister().flush_once() == 2
+
+        inserts = [params for statement, params in db.statements if isinstance(statement, Insert)]
+        assert [(row["user_id"], row["product_id"], row["quantity"]) for row in inserts[0]] == [
+            (uuid.UUID(USER.owner_id), kept.id, 2)
+        ]
+        assert any(isinstance(statement, Delete) for statement, _ in db.statements)
+        assert db.committed
+        assert await redis.exists(cart_store.DIRTY_CARTS_KEY, cart_store.FLUSH_LOCK_KEY) == 0
+
+    asyncio.run(scenario())
+
+
+def test_flush_leaves_expired_cart_untouched(redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def scenario() -> None:
+        # Корзина истекла, а пользователь остался в cart:dirty
+        await redis.sadd(cart_store.DIRTY_CARTS_KEY, USER.owner_id)
+        db = _session(monkeypatch, FakeSession())
+
+        assert await cart_store.CartPersister().flush_once() == 0
+        assert db.statements == []
+
+    asyncio.run(scenario())
+
+
+def test_flush_is_skipped_while_another_worker_holds_lock(
+    redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def scenario() -> None:
+        await cart_store.add_item(FakeSession([]), USER, _product(1), 1, Decimal("10.00"))
+        await redis.set(cart_store.FLUSH_LOCK_KEY, "other-worker")
+        db = _session(monkeypatch, FakeSession())
+
+        assert await cart_store.CartPersister().flush_once() is None
+        assert db.statements == []
+        assert await redis.get(cart_store.FLUSH_LOCK_KEY) == b"other-worker"
+        assert await redis.smembers(cart_store.DIRTY_CARTS_KEY) == {USER.owner_id.encode()}
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_returns_to_queue_and_lock_is_released(
+    redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class BrokenSession(FakeSession):
+        async def commit(self) -> None:
+            raise RuntimeError("connection lost")
+
+    async def scenario() -> None:
+        await cart_store.add_item(FakeSession([]), USER, _product(1), 1, Decimal("10.00"))
+        _session(monkeypatch, BrokenSession([uuid.UUID(USER.owner_id)], [_product(1).id]))
+
+        with pytest.raises(RuntimeError):
+            await cart_store.CartPersister().flush_once()
+        assert await redis.smembers(cart_store.DIRTY_CARTS_KEY) == {USER.owner_id.encode()}
+        assert await redis.exists(cart_store.FLUSH_LOCK_KEY) == 0
+
+    asyncio.run(scenario())
+
+
+def test_lock_taken_over_after_ttl_is_not_released(
+    redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    persister = cart_store.CartPersister()
+
+    async def write_batch(user_ids: list[str]) -> int:
+        # Запись затянулась дольше FLUSH_LOCK_TTL: блокировка истекла и досталась другому воркеру
+        await redis.set(cart_store.FLUSH_LOCK_KEY, "other-worker")
+        return len(user_ids)
+
+    monkeypatch.setattr(persister, "_write_batch", write_batch)
+
+    async def scenario() -> None:
+        await redis.sadd(cart_store.DIRTY_CARTS_KEY, USER.owner_id)
+        assert await persister.flush_once() == 1
+        assert await redis.get(cart_store.FLUSH_LOCK_KEY) == b"other-worker"
+
+    asyncio.run(scenario())
+
+
+def test_guest_cookie_signature() -> None:
+    token = cart_store.sign_guest_id(GUEST.owner_id)
+
+    assert cart_store.verify_guest_token(token) == GUEST.owner_id
+    assert cart_store.verify_guest_token(token[:-1] + ("0" if token[-1] != "0" else "1")) is None
+    assert cart_store.verify_guest_token(f"not-a-uuid.{cart_store._guest_signature('not-a-uuid')}") is None
+    assert cart_store.verify_guest_token(None) is None
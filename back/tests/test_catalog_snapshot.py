@@ -0,0 +1,191 @@
+"""Снимок каталога отдаёт то же, что и запрос к БД в /api/products/category/{slug}
+
+Без ORDER BY и при равных ключах порядок в Postgres не определён, поэтому сравниваются
+последовательности ключей сортировки и множества товаров, а не точный порядок id.
+"""
+
+import asyncio
+import itertools
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+import pytest
+
+from app.catalog_snapshot import CatalogSnapshot, SnapshotData
+from app.schemas import CategoryInDB, ProductInDB
+
+# Регистр, пунктуация и кириллица: здесь порядок строк Python и collation en_US/ru_RU расходятся
+NAMES = ["banana", "Apple", "apple pie", "_archive", "Груша", "арбуз", "Ёлка", "ель", "Берёза", "berry-mix"]
+PRICES = ["10.00", "5.50", "10.00", "99.99", "0.00", "5.50", "42.00", "10.00", "7.25", "150.00"]
+
+CATEGORIES = [
+    CategoryInDB(id=uuid.UUID(int=1), name="Семена", slug="seeds"),
+    CategoryInDB(id=uuid.UUID(int=2), name="Инструменты", slug="tools"),
+]
+
+
+def _collation_key(name: str) -> tuple[str, str]:
+    # Приближение лингвистической collation: сначала без регистра и пунктуации
+    return "".join(ch for ch in name.casefold() if ch.isalnum()), name
+
+
+def _products() -> list[ProductInDB]:
+    created = datetime(2026, 1, 1)
+    return [
+        ProductInDB(
+            id=uuid.UUID(int=100 + i),
+            name=name,
+            slug=f"product-{i}",
+            price=Decimal(price),
+            discount=Decimal("5.00") if i % 3 == 0 else None,
+            category_id=CATEGORIES[i % 2].id,
+            category=CATEGORIES[i % 2],
+            # Две пары с одинаковой датой создания
+            created_at=created + timedelta(days=i // 2 * 2 if i < 4 else i),
+            times_ordered=(i * 7) % 5,
+        )
+        for i, (name, price) in enumerate(zip(NAMES, PRICES, strict=True))
+    ]
+
+
+def _reference(
+    products: list[ProductInDB],
+    name_rank: dict[uuid.UUID, int],
+    category_slug: str,
+    category_ids: Optional[list[str]],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    has_discount: Optional[bool],
+    sort_by: Optional[str],
+    sort_order: str,
+) -> list[ProductInDB]:
+    """Фильтры и сортировка как в SQL-ветке эндпоинта, без пагинации"""
+    rows = products
+    if category_slug != "all":
+        category = next((c for c in CATEGORIES if c.slug == category_slug), None)
+        rows = [p for p in rows if category is not None and p.categoryId == category.id]
+    elif category_ids:
+        rows = [p for p in rows if str(p.categoryId) in category_ids]
+    if max_price is not None:
+        rows = [p for p in rows if p.price <= Decimal(str(max_price))]
+    if min_price is not None:
+        rows = [p for p in rows if p.price >= Decimal(str(min_price))]
+    if has_discount:
+        rows = [p for p in rows if p.discount and p.discount > 0]
+    if sort_by:
+        rows = sorted(rows, key=lambda p: _sort_key(p, sort_by, name_rank), reverse=sort_order == "desc")
+    return rows
+
+
+def _sort_key(product: ProductInDB, sort_by: Optional[str], name_rank: dict[uuid.UUID, int]) -> object:
+    if sort_by == "name":
+        return name_rank[product.id]
+    if sort_by == "price":
+        return product.price
+    return product.createdAt
+
+
+CASES = list(
+    itertools.product(
+        [("all", None), ("seeds", None), ("missing", None), ("all", [str(CATEGORIES[1].id)])],
+        [(None, None), (5.5, None), (None, 10.0), (5.5, 42.0)],
+        [None, True],
+        [None, "name", "price", "createdAt", "popularity"],
+        ["asc", "desc"],
+    )
+)
+
+
+@pytest.mark.parametrize(("category", "price_range", "has_discount", "sort_by", "sort_order"), CASES)
+def test_list_products_matches_sql_semantics(
+    category: tuple, price_range: tuple, has_discount: Optional[bool], sort_by: Optional[str], sort_order: str
+) -> None:
+    products = _products()
+    ordered = sorted(products, key=lambda p: _collation_key(p.name))
+    name_rank = {p.id: rank for rank, p in enumerate(ordered)}
+    snapshot = SnapshotData(products, CATEGORIES, name_rank)
+    expected = _reference(products, name_rank, *category, *price_range, has_discount, sort_by, sort_order)
+
+    for offset, limit in [(0, None), (None, 3), (2, 3), (8, 5)]:
+        page = snapshot.list_products(*category, *price_range, has_discount, sort_by, sort_order, offset, limit)
+        start = offset or 0
+        expected_page = expected[start : start + limit if limit else None]
+        assert len(page) == len(expected_page)
+        if sort_by:
+            assert [_sort_key(p, sort_by, name_rank) for p in page] == [
+                _sort_key(p, sort_by, name_rank) for p in expected_page
+            ]
+        if not offset and not limit:
+            assert {p.id for p in page} == {p.id for p in expected}
+
+
+def test_name_order_follows_database_not_python() -> None:
+    products = _products()
+    ordered = sorted(products, key=lambda p: _collation_key(p.name))
+    assert [p.name for p in ordered] != sorted(NAMES)
+    snapshot = SnapshotData(products, CATEGORIES, {p.id: rank for rank, p in enumerate(ordered)})
+
+    page = snapshot.list_products("all", None, None, None, None, "name", "asc", 0, None)
+
+    assert [p.name for p in page] == [p.name for p in ordered]
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL не задан")
+def test_snapshot_matches_database(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Снимок, загруженный из настоящей БД, против SQL-ветки эндпоинта (только чтение)"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app import catalog_snapshot as snapshot_module
+    from app.routers.products import get_products_by_category_slug
+
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(snapshot_module, "AsyncSessionLocal", session_factory)
+
+    async def compare() -> None:
+        catalog = CatalogSnapshot(enabled=True)
+        await catalog.reload()
+        snapshot = catalog.snapshot
+        assert snapshot is not None
+        slugs = ["all", *list(snapshot.categories_by_slug)[:2]]
+        prices = sorted({float(p.price) for p in snapshot.products})
+        middle = prices[len(prices) // 2] if prices else 0.0
+        async with session_factory() as db:
+            for slug, price_range, sort_by, sort_order, page in itertools.product(
+                slugs,
+                [(None, None), (middle, None), (None, middle)],
+                ["name", "price", "createdAt"],
+                ["asc", "desc"],
+                [(0, None), (5, 20)],
+            ):
+                args = (slug, None, *price_range, None, sort_by, sort_order, *page)
+                from_snapshot = snapshot.list_products(*args)
+                from_db = await get_products_by_category_slug(
+                    slug,
+                    db=db,
+                    limit=page[1],
+                    offset=page[0],
+                    search_query=None,
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    min_price=price_range[0],
+                    max_price=price_range[1],
+                    category_filter=None,
+                    in_stock=None,
+                    has_discount=None,
+                    attr=None,
+                )
+                key = {"name": "name", "price": "price", "createdAt": "created_at"}[sort_by]
+                assert [getattr(p, "createdAt" if key == "created_at" else key) for p in from_snapshot] == [
+                    getattr(p, key) for p in from_db
+                ], args
+        await engine.dispose()
+
+    asyncio.run(compare())
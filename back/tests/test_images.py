@@ -0,0 +1,76 @@
+"""Хранилище изображений: оригинал удаляет только создавшая его загрузка, ошибки декодирования отделены от ошибок диска"""
+
+import io
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app import images
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(images, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _png(width: int = 400, height: int = 300) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 200, 80)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_store_original_reports_only_first_write_as_created() -> None:
+    data = _png()
+
+    digest, created = images.store_original(data, "png")
+    again, created_again = images.store_original(data, "png")
+
+    assert (created, created_again) == (True, False)
+    assert again == digest
+    assert Path(images.original_path(digest, "png")).read_bytes() == data
+
+
+def test_store_original_loses_race_without_replacing(monkeypatch: pytest.MonkeyPatch) -> None:
+    data = _png()
+    digest, _ = images.store_original(data, "png")
+    path = images.original_path(digest, "png")
+    inode = os.stat(path).st_ino
+    # Параллельная загрузка: проверка существования прошла до того, как файл появился
+    monkeypatch.setattr(images.os.path, "exists", lambda _path: False)
+
+    assert images.store_original(data, "png") == (digest, False)
+    assert os.stat(path).st_ino == inode
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")]
+
+
+def test_render_thumbnails_writes_widths_up_to_original() -> None:
+    digest, _ = images.store_original(_png(400, 300), "png")
+
+    widths = images.render_thumbnails(images.original_path(digest, "png"), digest, (160, 320, 640), 80)
+
+    assert widths == [160, 320]
+    with Image.open(images.thumbnail_path(digest, 320)) as thumbnail:
+        assert (thumbnail.format, thumbnail.size) == ("WEBP", (320, 240))
+
+
+@pytest.mark.parametrize("data", [b"\x89PNG\r\n\x1a\nnot really a png", _png()[:200]], ids=["garbage", "truncated"])
+def test_render_thumbnails_decode_error_is_value_error(data: bytes) -> None:
+    digest, _ = images.store_original(data, "png")
+
+    with pytest.raises(ValueError):
+        images.render_thumbnails(images.original_path(digest, "png"), digest, (160,), 80)
+
+
+def test_render_thumbnails_write_error_stays_os_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    digest, _ = images.store_original(_png(), "png")
+
+    def no_space(path: str, write: object, exclusive: bool = False) -> bool:
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(images, "_write_atomic", no_space)
+    with pytest.raises(OSError) as error:
+        images.render_thumbnails(images.original_path(digest, "png"), digest, (160,), 80)
+    assert not isinstance(error.value, ValueError)
@@ -0,0 +1,175 @@
+"""Группировка уведомлений админам: первое сразу, остальные сводкой по окончании окна, окно продлевается под потоком"""
+
+import asyncio
+import types
+from collections.abc import Awaitable
+from typing import Optional
+
+import pytest
+
+from app.routers import notifications
+
+
+class Clock:
+    """Управляемый asyncio.sleep модуля: окно заканчивается только по tick()"""
+
+    def __init__(self) -> None:
+        self.sleeping: list[asyncio.Future] = []
+        self.windows: list[float] = []
+
+    async def sleep(self, seconds: float) -> None:
+        self.windows.append(seconds)
+        future = asyncio.get_running_loop().create_future()
+        self.sleeping.append(future)
+        await future
+
+    async def tick(self) -> None:
+        await self.settle()
+        sleeping, self.sleeping = self.sleeping, []
+        for future in sleeping:
+            if not future.done():
+                future.set_result(None)
+        await self.settle()
+
+    @staticmethod
+    async def settle() -> None:
+        # Дать запущенным задачам окон дойти до следующего sleep
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+
+class Session:
+    async def __aenter__(self) -> "Session":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(notifications, "asyncio", types.SimpleNamespace(**{**vars(asyncio), "sleep": clock.sleep}))
+    return clock
+
+
+@pytest.fixture
+def delivered(monkeypatch: pytest.MonkeyPatch) -> list[tuple]:
+    sent: list[tuple] = []
+
+    async def deliver(
+        db: object, title: str, message: str, notification_type: str, notification_data: Optional[dict] = None
+    ) -> None:
+        sent.append((title, message, notification_type, notification_data))
+
+    monkeypatch.setattr(notifications, "_deliver_to_admins", deliver)
+    monkeypatch.setattr(notifications, "AsyncSessionLocal", Session)
+    return sent
+
+
+def _order(coalescer: notifications.NotificationCoalescer, number: int) -> Awaitable[None]:
+    return coalescer.submit(None, "Новый заказ", f"Заказ #{number}", "new_order", {"orderId": number})
+
+
+def test_type_without_window_is_delivered_immediately(clock: Clock, delivered: list[tuple]) -> None:
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0})
+        await coalescer.submit(None, "Статус", "Заказ отправлен", "order_status")
+        await coalescer.submit(None, "Статус", "Заказ доставлен", "order_status")
+        assert not coalescer._timers
+
+    asyncio.run(scenario())
+    assert [item[1] for item in delivered] == ["Заказ отправлен", "Заказ доставлен"]
+
+
+def test_single_item_in_window_is_sent_as_is(clock: Clock, delivered: list[tuple]) -> None:
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0})
+        await _order(coalescer, 1)
+        await _order(coalescer, 2)
+        assert len(delivered) == 1
+        await clock.tick()
+        assert delivered[1] == ("Новый заказ", "Заказ #2", "new_order", {"orderId": 2})
+        # Следующее окно пустое — таймер завершается, новое уведомление снова уходит сразу
+        await clock.tick()
+        assert not coalescer._timers
+        await _order(coalescer, 3)
+        assert delivered[2][1] == "Заказ #3"
+
+    asyncio.run(scenario())
+    assert clock.windows[0] == 10.0
+
+
+def test_burst_becomes_digest_with_last_items(clock: Clock, delivered: list[tuple]) -> None:
+    burst = notifications.DIGEST_MAX_ITEMS + 5
+
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0})
+        for number in range(burst + 1):
+            await _order(coalescer, number)
+        await clock.tick()
+
+    asyncio.run(scenario())
+    assert len(delivered) == 2
+    title, message, notification_type, data = delivered[1]
+    assert (title, message, notification_type) == ("Новые заказы", f"Получено новых заказов: {burst}", "new_order")
+    assert data["digest"] is True and data["count"] == burst
+    assert [item["orderId"] for item in data["items"]] == list(
+        range(burst + 1 - notifications.DIGEST_MAX_ITEMS, burst + 1)
+    )
+
+
+def test_window_extends_while_stream_continues(clock: Clock, delivered: list[tuple]) -> None:
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0})
+        await _order(coalescer, 1)
+        for number in (2, 3):
+            await _order(coalescer, number)
+        await clock.tick()
+        await _order(coalescer, 4)
+        # Окно ещё открыто: уведомление копится, а не уходит сразу
+        assert len(delivered) == 2
+        await clock.tick()
+        assert len(delivered) == 3 and delivered[2][1] == "Заказ #4"
+
+    asyncio.run(scenario())
+    assert delivered[1][3]["count"] == 2
+
+
+def test_types_have_independent_windows(clock: Clock, delivered: list[tuple]) -> None:
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0, "chat_message": 5.0})
+        await _order(coalescer, 1)
+        await coalescer.submit(None, "Сообщение", "Привет", "chat_message")
+        await _order(coalescer, 2)
+        await coalescer.submit(None, "Сообщение", "Ещё", "chat_message")
+        await coalescer.submit(None, "Сообщение", "И ещё", "chat_message")
+        await clock.tick()
+
+    asyncio.run(scenario())
+    assert [item[1] for item in delivered] == [
+        "Заказ #1",
+        "Привет",
+        "Заказ #2",
+        "Новых сообщений от пользователей: 2",
+    ]
+    assert sorted(clock.windows[:2]) == [5.0, 10.0]
+
+
+def test_stop_flushes_pending_and_cancels_windows(clock: Clock, delivered: list[tuple]) -> None:
+    async def scenario() -> None:
+        coalescer = notifications.NotificationCoalescer({"new_order": 10.0})
+        await _order(coalescer, 1)
+        await _order(coalescer, 2)
+        await _order(coalescer, 3)
+        await coalescer.stop()
+        assert not coalescer._timers and not coalescer._pending
+
+    asyncio.run(scenario())
+    assert [item[1] for item in delivered] == ["Заказ #1", "Получено новых заказов: 2"]
+
+
+def test_windows_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("NOTIFICATION_COALESCE", " new_order = 30 , chat_message=0, order_status=2.5,broken")
+
+    assert notifications._load_coalesce_windows() == {"new_order": 30.0, "order_status": 2.5}
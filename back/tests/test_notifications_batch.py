@@ -0,0 +1,151 @@
+"""Пакетная отметка уведомлений: ids и upTo сужают выборку вместе, счётчик сдвигается на число сменивших статус"""
+
+import asyncio
+import uuid
+from datetime import UTC, datetime
+from typing import Optional
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Update
+
+from app.routers import notifications
+from app.schemas import CustomUser, NotificationBatchUpdate
+
+USER = CustomUser(id=uuid.UUID(int=1), email="user@example.com", isAdmin=False)
+UP_TO = datetime(2026, 10, 1, 12, 0, tzinfo=UTC)
+
+
+class FakeScalars:
+    def __init__(self, ids: list[uuid.UUID]) -> None:
+        self.ids = ids
+
+    def all(self) -> list[uuid.UUID]:
+        return self.ids
+
+
+class FakeResult:
+    def __init__(self, ids: list[uuid.UUID]) -> None:
+        self.ids = ids
+
+    def scalars(self) -> FakeScalars:
+        return FakeScalars(self.ids)
+
+
+class FakeSession:
+    """Запоминает UPDATE и возвращает заданные id как изменённые строки"""
+
+    def __init__(self, updated: list[uuid.UUID]) -> None:
+        self.updated = updated
+        self.statements: list[Update] = []
+        self.committed = False
+
+    async def execute(self, statement: Update) -> FakeResult:
+        self.statements.append(statement)
+        return FakeResult(self.updated)
+
+    async def commit(self) -> None:
+        self.committed = True
+
+
+@pytest.fixture
+def counter(monkeypatch: pytest.MonkeyPatch) -> dict[str, list]:
+    calls: dict[str, list] = {"deltas": [], "pushed": []}
+
+    async def add_unread(user_id: uuid.UUID, delta: int) -> Optional[int]:
+        calls["deltas"].append(delta)
+        return 10 + delta
+
+    async def push(db: object, user_id: str, value: Optional[int] = None) -> None:
+        calls["pushed"].append(value)
+
+    monkeypatch.setattr(notifications, "add_unread_notifications", add_unread)
+    monkeypatch.setattr(notifications, "push_unread_count", push)
+    return calls
+
+
+def _where(statement: Update) -> tuple[str, dict]:
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return str(compiled).split(" WHERE ", 1)[1], compiled.params
+
+
+def _mark(db: FakeSession, **fields: object) -> notifications.NotificationBatchUpdateResult:
+    update_data = NotificationBatchUpdate(**fields)
+    return asyncio.run(notifications.mark_notifications_read_batch(update_data, USER, db))
+
+
+def test_up_to_is_inclusive_and_only_changes_other_status(counter: dict[str, list]) -> None:
+    db = FakeSession([uuid.UUID(int=5), uuid.UUID(int=6)])
+
+    result = _mark(db, upTo=UP_TO)
+
+    where, params = _where(db.statements[0])
+    assert "public.notifications.created_at <= %(created_at_2)s" in where
+    assert params["created_at_2"] == UP_TO
+    assert "public.notifications.is_read != true" in where
+    assert "notifications.id IN" not in where
+    assert db.committed
+    assert result.updatedIds == [str(uuid.UUID(int=5)), str(uuid.UUID(int=6))]
+    assert (counter["deltas"], result.unreadCount, counter["pushed"]) == ([-2], 8, [8])
+
+
+def test_ids_and_up_to_narrow_together(counter: dict[str, list]) -> None:
+    ids = [uuid.UUID(int=5), uuid.UUID(int=7)]
+    db = FakeSession([ids[0]])
+
+    _mark(db, ids=ids, upTo=UP_TO)
+
+    where, params = _where(db.statements[0])
+    assert " AND public.notifications.id IN (" in where
+    assert "public.notifications.created_at <= " in where
+    assert params["user_id_1"] == USER.id
+    assert counter["deltas"] == [-1]
+
+
+def test_mark_unread_raises_counter(counter: dict[str, list]) -> None:
+    db = FakeSession([uuid.UUID(int=5)])
+
+    result = _mark(db, up_to=UP_TO, is_read=False)
+
+    where, _ = _where(db.statements[0])
+    assert "public.notifications.is_read != false" in where
+    assert (counter["deltas"], result.unreadCount) == ([1], 11)
+
+
+def test_nothing_changed_skips_push_and_falls_back_to_count(
+    counter: dict[str, list], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def add_unread(user_id: uuid.UUID, delta: int) -> Optional[int]:
+        return None
+
+    async def count(db: object, user_id: uuid.UUID) -> int:
+        return 4
+
+    monkeypatch.setattr(notifications, "add_unread_notifications", add_unread)
+    monkeypatch.setattr(notifications, "get_unread_notifications", count)
+
+    result = _mark(FakeSession([]), upTo=UP_TO)
+
+    assert (result.updatedIds, result.unreadCount, counter["pushed"]) == ([], 4, [])
+
+
+def test_requires_ids_or_up_to(counter: dict[str, list]) -> None:
+    db = FakeSession([])
+
+    with pytest.raises(HTTPException) as error:
+        _mark(db, ids=[])
+
+    assert error.value.status_code == 400
+    assert db.statements == []
+
+
+def test_schema_accepts_camel_and_snake_case() -> None:
+    snake = NotificationBatchUpdate.model_validate({"up_to": "2026-10-01T12:00:00Z", "is_read": False})
+    camel = NotificationBatchUpdate.model_validate({"upTo": "2026-10-01T12:00:00Z", "isRead": False})
+
+    assert snake == camel
+    assert snake.upTo == UP_TO and snake.isRead is False
+    with pytest.raises(ValidationError):
+        NotificationBatchUpdate(ids=[uuid.uuid4() for _ in range(1001)])
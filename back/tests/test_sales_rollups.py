@@ -0,0 +1,164 @@
+"""Агрегаты продаж: знак дельты на переходах статуса, отменённые заказы не учитываются, поправка пересчёта"""
+
+import asyncio
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+import pytest
+from sqlalchemy import ColumnElement, select, true
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Executable
+
+from app.db import models, sales_rollups
+from app.routers.admin import orders
+from app.schemas import CustomUser, OrderUpdateStatus
+
+ADMIN = CustomUser(id=uuid.UUID(int=1), email="admin@example.com", isAdmin=True)
+ORDER_ID = uuid.UUID(int=7)
+
+
+def _compile(statement: Executable) -> tuple[str, dict[str, Any]]:
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def _order(status: str) -> models.Order:
+    return models.Order(
+        id=ORDER_ID,
+        user_id=uuid.UUID(int=2),
+        total_amount=Decimal("100.00"),
+        status=status,
+        created_at=datetime(2026, 10, 1, 12, 0, tzinfo=UTC),
+        full_name="Покупатель",
+        email="user@example.com",
+        address="Улица, 1",
+        city="Москва",
+        postal_code="101000",
+        phone="+70000000000",
+        order_items=[],
+    )
+
+
+class FakeScalars:
+    def __init__(self, order: models.Order) -> None:
+        self.order = order
+
+    def first(self) -> models.Order:
+        return self.order
+
+
+class FakeResult:
+    def __init__(self, order: models.Order) -> None:
+        self.order = order
+
+    def scalars(self) -> FakeScalars:
+        return FakeScalars(self.order)
+
+
+class FakeSession:
+    """Отдаёт один и тот же заказ и записывает flush/commit в общий журнал"""
+
+    def __init__(self, order: models.Order, journal: list[Any]) -> None:
+        self.order = order
+        self.journal = journal
+
+    async def execute(self, statement: Executable) -> FakeResult:
+        return FakeResult(self.order)
+
+    def add(self, instance: object) -> None:
+        return None
+
+    async def flush(self) -> None:
+        self.journal.append("flush")
+
+    async def commit(self) -> None:
+        self.journal.append("commit")
+
+    async def refresh(self, instance: object) -> None:
+        return None
+
+
+@pytest.fixture
+def journal(monkeypatch: pytest.MonkeyPatch) -> list[Any]:
+    calls: list[Any] = []
+
+    async def apply_orders(db: FakeSession, condition: ColumnElement[bool], sign: int) -> None:
+        # Статус заказа в момент применения дельты: вычитание — до смены, прибавление — после
+        calls.append((sign, db.order.status))
+
+    async def create_notification(**kwargs: Any) -> None:  # noqa: ANN401
+        return None
+
+    monkeypatch.setattr(orders, "apply_orders", apply_orders)
+    monkeypatch.setattr(orders, "create_notification", create_notification)
+    return calls
+
+
+def _change_status(old_status: str, new_status: str, journal: list[Any]) -> None:
+    db = FakeSession(_order(old_status), journal)
+    result = asyncio.run(orders.update_admin_order_status(ORDER_ID, OrderUpdateStatus(status=new_status), db, ADMIN))
+    assert result.status == new_status
+
+
+@pytest.mark.parametrize(
+    ("old_status", "new_status", "expected"),
+    [
+        ("pending", "cancelled", [(-1, "pending"), "commit"]),
+        ("cancelled", "pending", ["flush", (1, "pending"), "commit"]),
+        ("pending", "shipped", ["commit"]),
+        ("cancelled", "cancelled", ["commit"]),
+    ],
+)
+def test_status_transition_applies_signed_delta(
+    old_status: str, new_status: str, expected: list[Any], journal: list[Any]
+) -> None:
+    _change_status(old_status, new_status, journal)
+
+    assert journal == expected
+
+
+@pytest.mark.parametrize(
+    ("status", "counted"), [("pending", True), ("delivered", True), (None, True), ("cancelled", False)]
+)
+def test_is_counted(status: Optional[str], counted: bool) -> None:
+    assert sales_rollups.is_counted(status) is counted
+
+
+@pytest.mark.parametrize("sign", [1, -1])
+def test_deltas_carry_sign_and_skip_excluded_statuses(sign: int) -> None:
+    condition = models.Order.id == ORDER_ID
+    for statement in (
+        sales_rollups._add_daily(sales_rollups._daily_deltas(condition, sign)),
+        sales_rollups._add_products(sales_rollups._product_deltas(condition, sign)),
+    ):
+        sql, params = _compile(statement)
+
+        assert (params["count_1"], params["sum_1"], params["sum_2"]) == (sign, sign, sign)
+        assert "public.orders.status NOT IN (__[POSTCOMPILE_status_1])" in sql
+        assert params["status_1"] == list(sales_rollups.EXCLUDED_STATUSES)
+        assert params["get_byte_2"] == sales_rollups.ROLLUP_SHARDS
+
+
+def test_upsert_adds_delta_to_sharded_row() -> None:
+    condition = models.Order.id == ORDER_ID
+    daily, _ = _compile(sales_rollups._add_daily(sales_rollups._daily_deltas(condition, 1)))
+    products, _ = _compile(sales_rollups._add_products(sales_rollups._product_deltas(condition, 1)))
+
+    assert "ON CONFLICT (day, shard) DO UPDATE SET orders = (public.sales_daily.orders + excluded.orders)" in daily
+    assert "ON CONFLICT (day, product_id, shard) DO UPDATE" in products
+    # Категория не перезаписывается: вычитание должно попасть в ту же строку, что и прибавление
+    assert "category_id = coalesce(public.sales_daily_products.category_id, excluded.category_id)" in products
+
+
+def test_rebuild_correction_is_fresh_minus_current_over_full_join() -> None:
+    daily = models.SalesDaily
+    current = select(daily.day, daily.shard, daily.orders, daily.units, daily.revenue)
+    sql, _ = _compile(sales_rollups._correction(sales_rollups._daily_deltas(true(), 1), current, ("day", "shard")))
+
+    # Строки, пропавшие из заказов, вычитаются целиком; совпавшие с заказами не трогаются
+    assert ") AS fresh FULL OUTER JOIN (" in sql
+    assert "coalesce(fresh.day, current.day) AS day, coalesce(fresh.shard, current.shard) AS shard" in sql
+    assert "coalesce(fresh.orders, %(coalesce_1)s) - coalesce(current.orders, %(coalesce_2)s) AS orders" in sql
+    assert sql.split("\nWHERE ")[-1].count(" != ") == 3
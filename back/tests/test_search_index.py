@@ -0,0 +1,105 @@
+"""Подсказки из префиксного индекса совпадают с полным перебором записей
+
+Перебор — определение из SearchIndex.suggest: каждое слово запроса должно быть началом
+какого-либо слова названия или slug записи; категории по названию, товары по популярности.
+"""
+
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.search_index import (
+    MAX_CATEGORY_SUGGESTIONS,
+    MIN_PREFIX_LENGTH,
+    SearchIndex,
+    Suggestion,
+    _entry_words,
+    normalize_words,
+)
+
+ENTRIES = [
+    Suggestion("category", uuid.UUID(int=1), "Семена овощей", "semena-ovoshchey"),
+    Suggestion("category", uuid.UUID(int=2), "Садовый инструмент", "sadovyy-instrument"),
+    Suggestion("category", uuid.UUID(int=3), "Семена цветов", "semena-tsvetov"),
+    Suggestion("category", uuid.UUID(int=4), "Семенной картофель", "semennoy-kartofel"),
+    Suggestion(
+        "product", uuid.UUID(int=10), "Семена Томатов 'Черный Принц'", "tomat-chernyy-princ", 5, None, Decimal(1)
+    ),
+    Suggestion("product", uuid.UUID(int=11), "Семена Огурцов 'Зозуля'", "ogurcy-zozulya", 12),
+    Suggestion("product", uuid.UUID(int=12), "Ёлка искусственная", "elka-iskusstvennaya", 3),
+    Suggestion("product", uuid.UUID(int=13), "Ель голубая", "el-golubaya", 3),
+    Suggestion("product", uuid.UUID(int=14), "Лопата штыковая Fiskars", "lopata-shtykovaya-fiskars", 0),
+    Suggestion("product", uuid.UUID(int=15), "Лопата совковая Palisad", "lopata-sovkovaya-palisad", 7),
+    Suggestion("product", uuid.UUID(int=16), "Кашпо_подвесное ⌀25см", "kashpo-podvesnoe", 1),
+]
+
+QUERIES = [
+    "се",
+    "семена",
+    "Семена то",
+    "СЕМЕН",
+    "ел",
+    "ёл",
+    "лоп fis",
+    "lopata",
+    "по",
+    "кашпо подв",
+    "25см",
+    "с",
+    "",
+    "  ",
+    "xyz",
+    "семена xyz",
+]
+
+
+def _brute_force(entries: list[Suggestion], query: str, limit: int) -> list[Suggestion]:
+    words = normalize_words(query)
+    if not words or sum(len(word) for word in words) < MIN_PREFIX_LENGTH:
+        return []
+    matches = [
+        entry
+        for entry in entries
+        if all(any(entry_word.startswith(word) for entry_word in _entry_words(entry)) for word in words)
+    ]
+    categories = sorted((e for e in matches if e.kind == "category"), key=lambda e: e.name)
+    products = sorted((e for e in matches if e.kind == "product"), key=lambda e: (-e.score, e.name))
+    return (categories[:MAX_CATEGORY_SUGGESTIONS] + products)[:limit]
+
+
+def _ranking(suggestions: list[Suggestion]) -> list[tuple[str, int, str]]:
+    # Равные по рангу записи могут идти в любом порядке
+    return [(item.kind, -item.score, item.name) for item in suggestions]
+
+
+def _index(entries: list[Suggestion]) -> SearchIndex:
+    index = SearchIndex()
+    for entry in entries:
+        index.upsert(entry)
+    return index
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("limit", [1, 3, 20])
+def test_suggest_matches_brute_force(query: str, limit: int) -> None:
+    index = _index(ENTRIES)
+
+    result = index.suggest(query, limit)
+
+    expected = _brute_force(ENTRIES, query, limit)
+    assert _ranking(result) == _ranking(expected)
+    assert {item.key for item in result} <= {item.key for item in _brute_force(ENTRIES, query, len(ENTRIES))}
+
+
+def test_updates_keep_index_consistent() -> None:
+    index = _index(ENTRIES)
+    renamed = Suggestion("product", uuid.UUID(int=14), "Вилы садовые", "vily-sadovye", 2)
+    index.upsert(renamed)
+    index.remove(f"category:{uuid.UUID(int=2)}")
+    index.remove("product:missing")
+    entries = [renamed if e.key == renamed.key else e for e in ENTRIES if e.id != uuid.UUID(int=2)]
+
+    assert index._words == _index(entries)._words
+    for query in [*QUERIES, "лопата", "вилы", "садов"]:
+        assert _ranking(index.suggest(query, 20)) == _ranking(_brute_force(entries, query, 20))
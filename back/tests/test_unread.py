@@ -0,0 +1,186 @@
+"""Счётчики непрочитанного: Lua-дельты применяются только к инициализированным ключам, сверка сбрасывает разошедшиеся"""
+
+import asyncio
+import uuid
+from typing import Any
+
+import fakeredis
+import pytest
+
+from app import unread
+
+USER = uuid.UUID(int=1)
+OTHER = uuid.UUID(int=2)
+
+
+class FakeResult:
+    def __init__(self, rows: list[tuple[Any, ...]]) -> None:
+        self.rows = rows
+
+    def all(self) -> list[tuple[Any, ...]]:
+        return self.rows
+
+    def scalar(self) -> Any:  # noqa: ANN401
+        return self.rows[0][0] if self.rows else None
+
+
+class FakeSession:
+    """Отдаёт заранее заданные результаты запросов по порядку"""
+
+    def __init__(self, *results: list[tuple[Any, ...]]) -> None:
+        self.results = list(results)
+        self.executed = 0
+
+    async def execute(self, statement: object) -> FakeResult:
+        self.executed += 1
+        return FakeResult(self.results.pop(0))
+
+
+@pytest.fixture(autouse=True)
+def redis(fake_redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeAsyncRedis:
+    monkeypatch.setattr(unread, "async_redis_client", fake_redis)
+    monkeypatch.setattr(unread, "_apply_delta", fake_redis.register_script(unread._APPLY_DELTA_SCRIPT))
+    monkeypatch.setattr(unread, "_apply_hash_delta", fake_redis.register_script(unread._APPLY_HASH_DELTA_SCRIPT))
+    return fake_redis
+
+
+def test_delta_skips_uninitialized_counter(redis: fakeredis.FakeAsyncRedis) -> None:
+    async def scenario() -> None:
+        assert await unread.add_unread_notifications(USER, 1) is None
+        assert await redis.exists(unread._notifications_key(USER)) == 0
+
+    asyncio.run(scenario())
+
+
+def test_delta_updates_counter_refreshes_ttl_and_clamps_at_zero(redis: fakeredis.FakeAsyncRedis) -> None:
+    key = unread._notifications_key(USER)
+
+    async def scenario() -> None:
+        await redis.set(key, 2)
+        assert await unread.add_unread_notifications(USER, 3) == 5
+        assert 0 < await redis.ttl(key) <= unread.UNREAD_COUNTER_TTL
+        assert await unread.add_unread_notifications(USER, -10) == 0
+        assert await redis.get(key) == b"0"
+        assert await unread.add_unread_notifications(USER, 0) is None
+
+    asyncio.run(scenario())
+
+
+def test_first_read_counts_in_db_then_serves_deltas_from_redis() -> None:
+    async def scenario() -> None:
+        db = FakeSession([(3,)])
+        assert await unread.get_unread_notifications(db, USER) == 3
+        assert await unread.add_unread_notifications(USER, 1) == 4
+        assert await unread.get_unread_notifications(db, USER) == 4
+        assert db.executed == 1
+
+    asyncio.run(scenario())
+
+
+def test_lazy_init_does_not_overwrite_value_created_first(redis: fakeredis.FakeAsyncRedis) -> None:
+    async def scenario() -> None:
+        db = FakeSession([(3,)])
+        original_get = redis.get
+
+        async def get_then_race(key: str) -> None:
+            # Между GET-промахом и SET другой воркер успел сохранить свежий COUNT
+            await original_get(key)
+            await redis.set(key, 7)
+
+        redis.get = get_then_race  # type: ignore[method-assign]
+        assert await unread.get_unread_notifications(db, USER) == 3
+        assert await original_get(unread._notifications_key(USER)) == b"7"
+
+    asyncio.run(scenario())
+
+
+def test_admin_chat_hash_deltas_need_ready_marker(redis: fakeredis.FakeAsyncRedis) -> None:
+    chat = str(uuid.UUID(int=10))
+
+    async def scenario() -> None:
+        assert await unread.add_admin_unread_chat(chat, 1) is None
+        assert await redis.exists(unread.ADMIN_CHATS_KEY) == 0
+
+        assert await unread.get_admin_unread_chats(FakeSession([])) == {}
+        assert await unread.add_admin_unread_chat(chat, 2) == 2
+        assert await unread.get_admin_unread_chats(FakeSession()) == {chat: 2}
+        # Обнулившийся чат удаляется из hash, маркер заполненности остаётся
+        assert await unread.add_admin_unread_chat(chat, -2) == 0
+        assert await redis.hgetall(unread.ADMIN_CHATS_KEY) == {unread.ADMIN_CHATS_READY_FIELD.encode(): b"1"}
+
+    asyncio.run(scenario())
+
+
+def test_reconciler_drops_only_diverged_notification_counters(redis: fakeredis.FakeAsyncRedis) -> None:
+    async def scenario() -> None:
+        await redis.set(unread._notifications_key(USER), 2)
+        await redis.set(unread._notifications_key(OTHER), 5)
+        db = FakeSession([(USER, 2), (OTHER, 4)])
+
+        corrected = await unread.UnreadReconciler()._reconcile_notifications(db)
+
+        assert corrected == 1
+        assert await redis.get(unread._notifications_key(USER)) == b"2"
+        assert await redis.exists(unread._notifications_key(OTHER)) == 0
+
+    asyncio.run(scenario())
+
+
+def test_reconciler_treats_missing_db_rows_as_zero(redis: fakeredis.FakeAsyncRedis) -> None:
+    async def scenario() -> None:
+        await redis.set(unread._notifications_key(USER), 0)
+        await redis.set(unread._notifications_key(OTHER), 1)
+
+        corrected = await unread.UnreadReconciler()._reconcile_notifications(FakeSession([]))
+
+        assert corrected == 1
+        assert await redis.exists(unread._notifications_key(USER)) == 1
+        assert await redis.exists(unread._notifications_key(OTHER)) == 0
+
+    asyncio.run(scenario())
+
+
+def test_reconciler_resets_diverged_admin_chat_hash(redis: fakeredis.FakeAsyncRedis) -> None:
+    chat = str(uuid.UUID(int=10))
+    reconciler = unread.UnreadReconciler()
+
+    async def scenario() -> None:
+        await redis.hset(unread.ADMIN_CHATS_KEY, mapping={unread.ADMIN_CHATS_READY_FIELD: 1, chat: 3})
+        assert await reconciler._reconcile_admin_chats(FakeSession([(chat, 3)])) == 0
+        assert await reconciler._reconcile_admin_chats(FakeSession([(chat, 1)])) == 1
+        assert await redis.exists(unread.ADMIN_CHATS_KEY) == 0
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_runs_once_per_interval_across_workers(
+    redis: fakeredis.FakeAsyncRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = []
+
+    class Reconciler(unread.UnreadReconciler):
+        async def _reconcile_notifications(self, db: object) -> int:
+            calls.append("notifications")
+            return 0
+
+        async def _reconcile_admin_chats(self, db: object) -> int:
+            return 0
+
+        async def _reconcile_user_chats(self, db: object) -> int:
+            return 0
+
+    class Session(FakeSession):
+        async def __aenter__(self) -> "Session":
+            return self
+
+        async def __aexit__(self, *exc_info: object) -> None:
+            return None
+
+    monkeypatch.setattr(unread, "AsyncSessionLocal", Session)
+
+    async def scenario() -> None:
+        await Reconciler(interval=60).reconcile_once()
+        await Reconciler(interval=60).reconcile_once()
+
+    asyncio.run(scenario())
+    assert calls == ["notifications"]